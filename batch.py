@@ -0,0 +1,166 @@
+import sys
+import array
+
+import parser
+import modules
+import reducer
+
+#
+# Running one program on many numeral inputs.
+#
+# A parameter sweep such as  equal i j  for every i, j < 100 would
+# otherwise write each input as source text, succ (succ (succ zero)),
+# and parse the program again for every run. run here takes a program
+# that is already loaded, a definition of it and vectors of integers,
+# one vector per argument (lists, array.array or NumPy arrays), and for
+# each position i applies the definition to the Church numerals of the
+# i-th integer of each vector:
+#
+#    name n1 n2 ...     where nk = fn f => fn x => f (... (f x))
+#
+# The numerals are built as terms directly (see parser.numeral), once
+# for each value. The definition is bound to the rest of the program
+# once, and brought to weak head normal form once; every run starts
+# from there.
+# Normal forms are decoded back to integers, or to booleans with kind
+# 'boolean' (see decode), and handed back as one array: a NumPy array
+# when an input was one, an array.array otherwise. NumPy is imported
+# only then.
+#
+#    python3 batch.py [--name NAME] [--kind numeral|boolean] <file> <n>[,<n>...] ...
+#
+#        applies the definition NAME (by default main) of the program of
+#        the file to each argument, a comma separated list of integers,
+#        and prints the decoded results, one per line
+#
+
+# The array.array type codes of the results of each kind.
+CODES = {'numeral': 'q', 'boolean': 'B'}
+
+
+class BatchError(Exception):
+    pass
+
+
+def decode(t, kind='numeral'):
+    """
+    Returns the integer a normal form stands for as a Church numeral,
+    or with kind 'boolean' the truth value it stands for as  true :=
+    fn a => fn b => a  or  false := fn a => fn b => b. Returns None
+    if it stands for none.
+    """
+    if t[0] != 'LM' or t[2][0] != 'LM':
+        return None
+    (f, x) = (t[1], t[2][1])
+    if f == x:
+        return None
+    body = t[2][2]
+    if kind == 'boolean':
+        if body[0] != 'VA':
+            return None
+        return {f: True, x: False}.get(body[1])
+    n = 0
+    while body[0] == 'AP' and body[1] == ['VA', f]:
+        n += 1
+        body = body[2]
+    if body != ['VA', x]:
+        return None
+    return n
+
+
+def function(functions, name='main'):
+    """
+    Returns the definition name of a program, given as its (name, term)
+    definitions, as one closed term: its definitions bound around it as
+    buildTerm binds them around main, brought to weak head normal form.
+    """
+    if name not in [x for (x, t) in functions]:
+        raise BatchError("The program has no definition of '" + name + "'.")
+    defs = functions
+    if name != 'main':
+        defs = [(x, t) for (x, t) in functions if x != 'main'] + [('main', ['VA', name])]
+    t = reducer.buildTerm(parser.pruneFunctions(defs))
+    # The steps a run takes first whatever its arguments; they are
+    # taken once here. Rendering turns the fresh variables back into
+    # names, so the runs can have supplies of their own.
+    return reducer.render(reducer.whnfReduce(t, reducer.Names()))
+
+
+def run(functions, *inputs, name='main', kind='numeral', reduce=reducer.norReduce, stats=None):
+    """
+    Applies the definition name of a program, given as its (name, term)
+    definitions, to the numerals of each position of the vectors inputs,
+    one vector per argument, and returns the decoded results as an
+    array (see above). reduce takes a term to its normal form, rendered;
+    explicit.norReduce will do too. If stats is a dictionary,
+    stats['steps'] counts the steps of all the runs, where reduce counts
+    them. Raises BatchError if the vectors differ in length, an input is
+    negative or a result does not decode.
+    """
+    if kind not in CODES:
+        raise BatchError("Unknown kind '" + kind + "'.")
+    columns = [[int(n) for n in v] for v in inputs]
+    count = len(columns[0]) if columns else 1
+    for c in columns:
+        if len(c) != count:
+            raise BatchError("The input vectors differ in length.")
+    f = function(functions, name)
+    numerals = {}
+    results = []
+    for i in range(count):
+        t = f
+        for c in columns:
+            n = c[i]
+            if n < 0:
+                raise BatchError("Input " + str(i) + " is negative: " + str(n) + ".")
+            if n not in numerals:
+                numerals[n] = parser.numeral(n)
+            t = ['AP', t, numerals[n]]
+        nf = reduce(t, stats)
+        r = decode(nf, kind)
+        if r is None:
+            raise BatchError("Result " + str(i) + " is not a " + kind + ": " + reducer.pretty(nf))
+        results.append(r)
+    if any(type(v).__module__ == 'numpy' for v in inputs):
+        import numpy
+        return numpy.array(results, dtype=numpy.int64 if kind == 'numeral' else numpy.bool_)
+    return array.array(CODES[kind], results)
+
+
+def main(args):
+    name = 'main'
+    kind = 'numeral'
+    rest = []
+    i = 0
+    while i < len(args):
+        if args[i] == '--name':
+            name = args[i+1]
+            i += 2
+        elif args[i] == '--kind':
+            kind = args[i+1]
+            i += 2
+        else:
+            rest.append(args[i])
+            i += 1
+    if len(rest) < 2 or kind not in CODES:
+        print("usage: python3 batch.py [--name NAME] [--kind numeral|boolean] <file> <n>[,<n>...] ...")
+        return
+    rows = [[int(n) for n in a.split(',')] for a in rest[1:]]
+    if any(len(r) != len(rows[0]) for r in rows):
+        print("Every input needs the same number of integers.")
+        return
+    columns = [array.array('q', c) for c in zip(*rows)]
+    try:
+        results = run(modules.load(rest[0]), *columns, name=name, kind=kind)
+    except BatchError as e:
+        print(e.args[0])
+        return
+    except RecursionError:
+        print("The term is too deep to reduce.")
+        return
+    for r in results:
+        print(bool(r) if kind == 'boolean' else r)
+
+
+if __name__ == '__main__':
+    reducer.deep(main, sys.argv[1:])
@@ -0,0 +1,115 @@
+#
+# A parameter sweep through batch.run against writing every input as
+# source text and parsing the program again for it.
+#
+#    python3 benchmarks/bench_batch.py [--size N]
+#
+# The sweep is  equal i j  for every i, j < size. The text route writes
+#
+#    main := equal (succ (... (succ zero))) (succ (... (succ zero)));
+#
+# after the program for each pair, then parses, prunes, binds and
+# reduces it, and decodes the result. batch.run gets the program parsed
+# once and the pairs as two vectors. Both reduce with reducer.norReduce;
+# batch.run is also timed with explicit.norReduce. The inputs column is
+# the time spent making the terms to reduce, the total column the time
+# for the whole sweep. The answers must be the same and true exactly
+# when i = j.
+#
+
+import os
+import sys
+import time
+import array
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import batch
+import parser
+import reducer
+import explicit
+
+PROGRAM = """
+true := fn a => fn b => a;
+false := fn a => fn b => b;
+zero := fn f => fn x => x;
+succ := fn n => fn f => fn x => f (n f x);
+and := fn n => fn m => n m n;
+isZero := fn n => n (fn x => false) true;
+pred := fn n => fn f => fn x => n (fn g => fn h => h (g f)) (fn u => x) (fn u => u);
+minus := fn n => fn m => m pred n;
+equal := fn n => fn m => and (isZero (minus m n)) (isZero (minus n m));
+"""
+
+
+def source(n):
+    return "(succ " * n + "zero" + ")" * n
+
+
+def byText(pairs, times):
+    results = []
+    for (i, j) in pairs:
+        start = time.perf_counter()
+        text = PROGRAM + "main := equal " + source(i) + " " + source(j) + ";\n"
+        t = reducer.buildTerm(parser.pruneFunctions(list(parser.streamDefinitions([text]))))
+        times['build'] += time.perf_counter() - start
+        results.append(batch.decode(reducer.norReduce(t), 'boolean'))
+    return results
+
+
+def building(functions, pairs):
+    # What batch.run does before reducing: bind the function once, then
+    # apply it to numerals built as terms.
+    f = batch.function(functions, 'equal')
+    numerals = {}
+    for (i, j) in pairs:
+        for n in (i, j):
+            if n not in numerals:
+                numerals[n] = parser.numeral(n)
+        t = ['AP', ['AP', f, numerals[i]], numerals[j]]
+
+
+def main(args):
+    size = 12
+    i = 0
+    while i < len(args):
+        if args[i] == '--size':
+            size = int(args[i+1])
+        i += 2
+
+    sys.setrecursionlimit(1000000)
+    pairs = [(i, j) for i in range(size) for j in range(size)]
+    print(str(len(pairs)) + " runs of equal i j, i, j < " + str(size))
+
+    times = {'build': 0.0}
+    start = time.perf_counter()
+    text = byText(pairs, times)
+    slow = time.perf_counter() - start
+
+    functions = list(parser.streamDefinitions([PROGRAM]))
+    start = time.perf_counter()
+    building(functions, pairs)
+    built = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ii = array.array('q', [p[0] for p in pairs])
+    jj = array.array('q', [p[1] for p in pairs])
+    fast = batch.run(functions, ii, jj, name='equal', kind='boolean')
+    mid = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lazy = batch.run(functions, ii, jj, name='equal', kind='boolean', reduce=explicit.norReduce)
+    fastest = time.perf_counter() - start
+
+    expected = [i == j for (i, j) in pairs]
+    for (what, got) in [('text', text), ('batch', fast), ('batch, explicit', lazy)]:
+        if [bool(r) for r in got] != expected:
+            print(what + ": wrong answers")
+    print("%-26s %10s %10s" % ('', 'inputs', 'total'))
+    print("%-26s %10.4f %10.4f" % ('text, parsed per run', times['build'], slow))
+    print("%-26s %10.4f %10.4f" % ('batch.run', built, mid))
+    print("%-26s %10s %10.4f" % ('batch.run, explicit.py', '', fastest))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,73 @@
+#
+# The result cache (cache.py): reducing the test cases, and  power base
+# (Church numeral exponentiation), without it, into an empty cache, and
+# again from the warm cache. A warm run still builds and hashes the
+# term of the program.
+#
+#    python3 benchmarks/bench_cache.py [--strategy S] [--base N] [--power N]
+#
+# The cache lives in a scratch directory and is removed afterwards. A
+# test case that does not load is reported as skipped.
+#
+
+import os
+import sys
+import glob
+import time
+import shutil
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cache
+import modules
+import parser
+
+
+def programs(base, power):
+    yield ('power', [('b', parser.numeral(base)), ('p', parser.numeral(power)), ('main', ['AP', ['VA', 'p'], ['VA', 'b']])])
+    for fname in sorted(glob.glob(os.path.join(ROOT, 'test cases', '*.lc'))):
+        try:
+            functions = modules.load(fname)
+        except (parser.SyntaxError, parser.ParseError, parser.LexError, modules.ModuleError) as e:
+            print("%-12s skipped: %s" % (os.path.basename(fname), e.args[0]))
+            continue
+        yield (os.path.basename(fname), functions)
+
+
+def main(args):
+    strategy = 'normal'
+    base = 4
+    power = 4
+    i = 0
+    while i < len(args):
+        if args[i] == '--strategy':
+            strategy = args[i+1]
+        elif args[i] == '--base':
+            base = int(args[i+1])
+        elif args[i] == '--power':
+            power = int(args[i+1])
+        i += 2
+
+    sys.setrecursionlimit(1000000)
+    scratch = tempfile.mkdtemp()
+    try:
+        c = cache.Cache(scratch)
+        print("%-12s %10s %10s %10s" % ('program', 'no cache', 'cold', 'warm'))
+        for (name, functions) in programs(base, power):
+            times = []
+            for store in [None, c, c]:
+                start = time.perf_counter()
+                (result, cached) = cache.normalForm(functions, strategy, store)
+                times.append(time.perf_counter() - start)
+            if not cached:
+                print(name + ": the warm run missed the cache")
+            print("%-12s %10.4f %10.4f %10.4f" % (name, times[0], times[1], times[2]))
+        print("%d hits, %d misses" % (c.hits, c.misses))
+    finally:
+        shutil.rmtree(scratch)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,138 @@
+#
+# Speed of SML code generation (codegen.py) against the string-adding,
+# recursive code generation it replaced, which is kept below as
+# oldBuildSmlStr.
+#
+#    python3 benchmarks/bench_codegen.py [--defs N] [--depth N] [--runs N] [--no-limit]
+#
+# Two programs:
+#
+#    defs     N definitions  dK := fn f => fn x => f (f x) , and main
+#    deep     one main whose term is  fn x => x (x (... x))  N deep
+#
+# The new code generation is timed building a string (buildSmlStr) and
+# writing into an io.StringIO (writeSml). The old one recurses once per
+# definition and once per level of a term, and fails past the default
+# recursion limit; the limit is raised for it unless --no-limit is
+# given. Where both finish they must give the same text.
+#
+
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import codegen
+
+
+def oldToString(ast):
+    if type(ast) != type([]):
+        return '"' + str(ast) + '"'
+    label = ast[0]
+    if label in ['LM','AP']:
+        e = oldToString(ast[1])
+        ep = oldToString(ast[2])
+        return label + "(" + e + ',' + ep + ')'
+    else:
+        e = oldToString(ast[1])
+        return label + e
+
+def oldBuildSmlStr(functions):
+    s = 'let\n'
+    for i in range(0,len(functions)-1):
+        s += 'val x' + str(i+1) + ' = ' + oldToString(functions[i][0]) + '\n'
+        s += 'val t' + str(i+1) + ' = ' + oldToString(functions[i][1]) + '\n'
+    s += 'val t = ' + oldToString(functions[len(functions)-1][1]) + '\n'
+    s += 'val main = ' + oldBuildMain(functions,0) +'\n'
+    s += 'val value = norReduce main\nin\n   print (pretty value)\nend;'
+    return s
+
+def oldBuildMain(functions, i):
+    if functions[i][0] == 'main':
+        if len(functions) != 1:
+            return 't)'
+        else:
+            return "t"
+    s = 'AP(LM(x' + str(i+1) + ','
+    e = oldBuildMain(functions, i+1)
+    s += e + ',t' + str(i+1)
+    if i == 0:
+        s += ')'
+    else:
+        s += '))'
+    return s
+
+
+def two():
+    return ['LM', 'f', ['LM', 'x', ['AP', ['VA', 'f'], ['AP', ['VA', 'f'], ['VA', 'x']]]]]
+
+
+def programs(defs, depth):
+    functions = [('d' + str(k), two()) for k in range(defs)]
+    functions.append(('main', ['VA', 'd0']))
+    yield ('defs', functions)
+    body = ['VA', 'x']
+    for i in range(depth):
+        body = ['AP', ['VA', 'x'], body]
+    yield ('deep', [('main', ['LM', 'x', body])])
+
+
+def best(f, runs):
+    b = None
+    for i in range(runs):
+        start = time.perf_counter()
+        result = f()
+        elapsed = time.perf_counter() - start
+        if b is None or elapsed < b:
+            b = elapsed
+    return (b, result)
+
+
+def streamed(functions):
+    out = io.StringIO()
+    codegen.writeSml(functions, out.write)
+    return out.getvalue()
+
+
+def main(args):
+    defs = 10000
+    depth = 10000
+    runs = 3
+    limit = True
+    i = 0
+    while i < len(args):
+        if args[i] == '--no-limit':
+            limit = False
+            i += 1
+            continue
+        if args[i] == '--defs':
+            defs = int(args[i+1])
+        elif args[i] == '--depth':
+            depth = int(args[i+1])
+        elif args[i] == '--runs':
+            runs = int(args[i+1])
+        i += 2
+
+    if limit:
+        sys.setrecursionlimit(2 * max(defs, depth) + 1000)
+    print("%-7s %10s %10s %10s %10s" % ('program', 'chars', 'old sec', 'join sec', 'StringIO'))
+    for (name, functions) in programs(defs, depth):
+        (fast, s) = best(lambda: codegen.buildSmlStr(functions), runs)
+        (io_, t) = best(lambda: streamed(functions), runs)
+        try:
+            (slow, old) = best(lambda: oldBuildSmlStr(functions), runs)
+            slow = "%10.4f" % slow
+            if old != s:
+                print(name + ": the old and new code differ")
+        except RecursionError:
+            slow = "%10s" % 'fails'
+        if s != t:
+            print(name + ": buildSmlStr and writeSml differ")
+        print("%-7s %10d %s %10.4f %10.4f" % (name, len(s), slow, fast, io_))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,69 @@
+#
+# Output size and time of the sharing-aware format (dag.py) against
+# pretty, on normal forms full of repeated numerals.
+#
+#    python3 benchmarks/bench_dag.py [--copies N] [--base N] [--power N]
+#
+# The term is  (fn n => fn s => s n n ... n) (power base)  with the
+# given number of copies of n. norReduce reduces each copy on its own,
+# so the normal form holds that many alpha-equivalent numerals, each
+# with its own fresh names. The output of dag.dumps is read back with
+# dag.loads and checked against the normal form up to renaming, as is
+# a small term whose free names hold quotes and backslashes.
+#
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import parser
+import equality
+import dag
+import reducer
+
+
+def main(args):
+    copies = 40
+    base = 4
+    power = 3
+    i = 0
+    while i < len(args):
+        if args[i] == '--copies':
+            copies = int(args[i+1])
+        elif args[i] == '--base':
+            base = int(args[i+1])
+        elif args[i] == '--power':
+            power = int(args[i+1])
+        i += 2
+
+    sys.setrecursionlimit(100000)
+    body = ['VA', 's']
+    for i in range(copies):
+        body = ['AP', body, ['VA', 'n']]
+    term = ['AP', ['LM', 'n', ['LM', 's', body]], ['AP', parser.numeral(power), parser.numeral(base)]]
+    nf = reducer.norReduce(term)
+
+    start = time.perf_counter()
+    tree = reducer.pretty(nf)
+    tt = time.perf_counter() - start
+    start = time.perf_counter()
+    shared = dag.dumps(nf)
+    dt = time.perf_counter() - start
+    start = time.perf_counter()
+    back = dag.loads(shared)
+    lt = time.perf_counter() - start
+    same = equality.alphaEqual(back, nf)
+    odd = ['LM', 'v1', ['AP', ['AP', ['VA', "x'"], ['VA', 'v1']], ['VA', "a\\'b\\"]]]
+    sameOdd = equality.alphaEqual(dag.loads(dag.dumps(odd)), odd)
+
+    print("%-8s %12s %9s" % ('format', 'bytes', 'sec'))
+    print("%-8s %12d %9.4f" % ('pretty', len(tree.encode('utf-8')), tt))
+    print("%-8s %12d %9.4f   (load %.4f sec, round trip %s)" % ('dag', len(shared.encode('utf-8')), dt, lt, 'ok' if same else 'DIFFERS'))
+    print("quoted names: round trip %s" % ('ok' if sameOdd else 'DIFFERS'))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
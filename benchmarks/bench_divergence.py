@@ -0,0 +1,105 @@
+#
+# Divergence detection (divergence.py) against a step budget: how soon
+# a diverging reduction is stopped, and what the detector costs on one
+# that terminates.
+#
+#    python3 benchmarks/bench_divergence.py [--budget N] [--base N] [--power N]
+#
+# The diverging terms are reduced by monitor.norReduce with a limit of
+# budget steps, and by divergence.norReduce:
+#
+#    omega      (fn x => x x)(fn x => x x)          a cycle
+#    omega3     (fn x => x x x)(fn x => x x x)      grows
+#    Y f        the fixed point combinator applied to a free variable
+#    Y          the fixed point combinator alone, growing under fn n
+#
+# For each, the pattern found and the sweep it was found at, then the
+# steps and seconds to find it, against the steps and seconds to use
+# up the budget.
+#
+# The terminating term is  power base  reduced by reducer.norReduce
+# and by divergence.norReduce, which must agree. Most of the difference
+# is the cost of the monitor (see bench_monitor.py).
+#
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import parser
+import divergence
+import equality
+import monitor
+import reducer
+
+
+def selfApply(k):
+    # fn x => x x ... x, with k copies of x.
+    body = ['VA', 'x']
+    for i in range(k-1):
+        body = ['AP', body, ['VA', 'x']]
+    return ['LM', 'x', body]
+
+
+HALF = ['LM', 'm', ['AP', ['VA', 'n'], ['AP', ['VA', 'm'], ['VA', 'm']]]]
+Y = ['LM', 'n', ['AP', HALF, HALF]]
+
+
+def terms():
+    yield ('omega', ['AP', selfApply(2), selfApply(2)])
+    yield ('omega3', ['AP', selfApply(3), selfApply(3)])
+    yield ('Y f', ['AP', Y, ['VA', 'f']])
+    yield ('Y', Y)
+
+
+def main(args):
+    budget = 2000
+    base = 4
+    power = 4
+    i = 0
+    while i < len(args):
+        if args[i] == '--budget':
+            budget = int(args[i+1])
+        elif args[i] == '--base':
+            base = int(args[i+1])
+        elif args[i] == '--power':
+            power = int(args[i+1])
+        i += 2
+
+    sys.setrecursionlimit(1000000)
+    print("%-7s %13s %10s %8s %10s %8s" % ('term', 'found', 'det steps', 'det sec', 'bud steps', 'bud sec'))
+    for (name, t) in terms():
+        start = time.perf_counter()
+        try:
+            divergence.norReduce(t)
+            found = ('none', 0, 0)
+        except divergence.Divergence as e:
+            found = (e.kind + "/" + str(e.period), e.sweep, e.steps)
+        fast = time.perf_counter() - start
+
+        start = time.perf_counter()
+        m = monitor.Monitor(maxSteps=budget)
+        try:
+            monitor.norReduce(t, m)
+        except monitor.GrowthLimit:
+            pass
+        slow = time.perf_counter() - start
+        print("%-7s %13s %10d %8.4f %10d %8.4f" % (name, found[0] + " @" + str(found[1]), found[2], fast, m.steps, slow))
+
+    t = ['AP', parser.numeral(base), parser.numeral(power)]
+    start = time.perf_counter()
+    plain = reducer.norReduce(t)
+    slow = time.perf_counter() - start
+    start = time.perf_counter()
+    watched = divergence.norReduce(t)
+    fast = time.perf_counter() - start
+    if not equality.alphaEqual(plain, watched):
+        print("power: the normal forms differ")
+    print("power %d %d: %.4f sec plain, %.4f sec with the detector" % (base, power, slow, fast))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
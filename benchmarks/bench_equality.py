@@ -0,0 +1,74 @@
+#
+# Deciding whether two terms are equal: convertible (equality.py),
+# which compares head normal forms from the top down, against reducing
+# both terms to normal form and comparing those with alphaEqual.
+#
+#    python3 benchmarks/bench_equality.py [--base N] [--power N]
+#
+# The pairs, with P the Church numeral power  power^base:
+#
+#    same       fn s => s P P         and  itself
+#    last       fn s => s P P         and  fn s => s P P'   (P' = P + 1)
+#    arity      fn s => s P P         and  fn s => s P
+#    head       fn s => s P P         and  fn s => fn t => t P P
+#
+# The last three are unequal. Only in the last pair does the difference
+# sit at the bottom of the normal forms.
+#
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import parser
+import equality
+import reducer
+
+
+SUCC = ['LM', 'n', ['LM', 'f', ['LM', 'x', ['AP', ['VA', 'f'], ['AP', ['AP', ['VA', 'n'], ['VA', 'f']], ['VA', 'x']]]]]]
+
+
+def pairs(base, power):
+    p = ['AP', parser.numeral(base), parser.numeral(power)]
+    q = ['AP', SUCC, p]
+    both = ['LM', 's', ['AP', ['AP', ['VA', 's'], p], p]]
+    yield ('same', both, ['LM', 's', ['AP', ['AP', ['VA', 's'], p], p]])
+    yield ('last', both, ['LM', 's', ['AP', ['AP', ['VA', 's'], p], q]])
+    yield ('arity', both, ['LM', 's', ['AP', ['VA', 's'], p]])
+    yield ('head', both, ['LM', 's', ['LM', 't', ['AP', ['AP', ['VA', 't'], p], p]]])
+
+
+def main(args):
+    base = 4
+    power = 4
+    i = 0
+    while i < len(args):
+        if args[i] == '--base':
+            base = int(args[i+1])
+        elif args[i] == '--power':
+            power = int(args[i+1])
+        i += 2
+
+    sys.setrecursionlimit(1000000)
+    print("%-7s %6s %10s %8s %10s %8s" % ('pair', 'equal', 'nf steps', 'nf sec', 'hnf steps', 'hnf sec'))
+    for (name, t1, t2) in pairs(base, power):
+        start = time.perf_counter()
+        s1 = {}
+        s2 = {}
+        full = equality.alphaEqual(reducer.norReduce(t1, s1), reducer.norReduce(t2, s2))
+        slow = time.perf_counter() - start
+
+        start = time.perf_counter()
+        stats = {}
+        lazy = equality.convertible(t1, t2, stats)
+        fast = time.perf_counter() - start
+        if full != lazy:
+            print(name + ": the two methods disagree")
+        print("%-7s %6s %10d %8.4f %10d %8.4f" % (name, lazy, s1.get('steps', 0) + s2.get('steps', 0), slow, stats.get('steps', 0), fast))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
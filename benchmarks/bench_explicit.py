@@ -0,0 +1,93 @@
+#
+# The explicit substitution backend (explicit.py) against norReduce.
+#
+#    python3 benchmarks/bench_explicit.py [--size N] [--times N] [--base N] [--power N]
+#
+# The programs are the test cases, then
+#
+#    discard    times (fn v => false B v) x    with B a balanced tree of
+#               applications of v, of size N, that false throws away
+#    power      power base   (Church numeral exponentiation)
+#
+# Each of the times applications of  fn v => false B v  makes norReduce
+# substitute into a copy of all of B before false throws it away;
+# explicit.py never does, and only compiles B once. The table gives the
+# beta steps and seconds of each backend and whether their normal forms
+# agree up to renaming. A test case that does not load is reported as
+# skipped.
+#
+
+import os
+import sys
+import glob
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import parser
+import modules
+import reducer
+import equality
+import explicit
+
+
+def tree(n):
+    # A balanced tree of n applications of v.
+    if n <= 1:
+        return ['VA', 'v']
+    return ['AP', tree(n // 2), tree(n - n // 2)]
+
+
+FALSE = ['LM', 'a', ['LM', 'b', ['VA', 'b']]]
+
+
+def programs(size, times, base, power):
+    for fname in sorted(glob.glob(os.path.join(ROOT, 'test cases', '*.lc'))):
+        try:
+            functions = modules.load(fname)
+        except (parser.SyntaxError, parser.ParseError, parser.LexError, modules.ModuleError) as e:
+            print("%-10s skipped: %s" % (os.path.basename(fname), e.args[0]))
+            continue
+        yield (os.path.basename(fname), reducer.buildTerm(parser.pruneFunctions(functions)))
+    body = ['AP', ['AP', FALSE, tree(size)], ['VA', 'v']]
+    yield ('discard', ['AP', ['AP', parser.numeral(times), ['LM', 'v', body]], ['VA', 'x']])
+    yield ('power', ['AP', parser.numeral(power), parser.numeral(base)])
+
+
+def timed(f, t, stats):
+    start = time.perf_counter()
+    nf = f(t, stats)
+    return (nf, time.perf_counter() - start)
+
+
+def main(args):
+    size = 10000
+    times = 20
+    base = 4
+    power = 4
+    i = 0
+    while i < len(args):
+        if args[i] == '--size':
+            size = int(args[i+1])
+        elif args[i] == '--times':
+            times = int(args[i+1])
+        elif args[i] == '--base':
+            base = int(args[i+1])
+        elif args[i] == '--power':
+            power = int(args[i+1])
+        i += 2
+
+    sys.setrecursionlimit(1000000)
+    print("%-10s %9s %9s %9s %9s %6s" % ('program', 'nor steps', 'nor sec', 'es steps', 'es sec', 'agree'))
+    for (name, t) in programs(size, times, base, power):
+        s1 = {}
+        s2 = {}
+        (n1, slow) = timed(reducer.norReduce, t, s1)
+        (n2, fast) = timed(explicit.norReduce, t, s2)
+        print("%-10s %9d %9.4f %9d %9.4f %6s" % (name, s1.get('steps', 0), slow, s2.get('steps', 0), fast,
+                                                 equality.alphaEqual(n1, n2)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,125 @@
+#
+# Answering a question about the head of a result: reducer.hnf and
+# reducer.whnf, which stop at head and weak head normal form, against
+# reducer.norReduce, which reduces everything.
+#
+#    python3 benchmarks/bench_lazy.py [--base N] [--power N] [--runs N]
+#
+# The query is whether  equal P P  is true, with P the Church numeral
+# power  power^base  and equal from test cases/equal.lc, so that the
+# answer is  fn x => fn y => x  and its head is the outer binder. Only
+# the head is looked at; with whnf the body of the lambda is forced
+# once, to reach the second binder.
+#
+# A second row forces hnf all the way with Lazy.term, which must give
+# the normal form norReduce gives.
+#
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import parser
+import equality
+import reducer
+
+
+def lam(xs, t):
+    for x in reversed(xs):
+        t = ['LM', x, t]
+    return t
+
+
+def app(*ts):
+    t = ts[0]
+    for u in ts[1:]:
+        t = ['AP', t, u]
+    return t
+
+
+def v(x):
+    return ['VA', x]
+
+
+TRUE = lam(['x', 'y'], v('x'))
+FALSE = lam(['x', 'y'], v('y'))
+PRED = lam(['n', 'f', 'x'], app(v('n'), lam(['g', 'h'], app(v('h'), app(v('g'), v('f')))),
+                                 lam(['u'], v('x')), lam(['u'], v('u'))))
+MINUS = lam(['n', 'm'], app(v('m'), PRED, v('n')))
+ISZERO = lam(['n'], app(v('n'), lam(['z'], FALSE), TRUE))
+AND = lam(['n', 'm'], app(v('n'), v('m'), v('n')))
+EQUAL = lam(['n', 'm'], app(AND, app(ISZERO, app(MINUS, v('m'), v('n'))),
+                                 app(ISZERO, app(MINUS, v('n'), v('m')))))
+
+
+def isTrue(lazy):
+    # Whether the Lazy is  fn x => fn y => x , looking no further.
+    if lazy.body is not None:
+        x = lazy.binders[0]
+        lazy = lazy.body.force()
+        if lazy.body is None or lazy.body.force().head != x:
+            return False
+        return True
+    return len(lazy.binders) == 2 and not lazy.args and lazy.head == lazy.binders[0]
+
+
+def best(f, runs):
+    b = None
+    for i in range(runs):
+        start = time.perf_counter()
+        result = f()
+        elapsed = time.perf_counter() - start
+        if b is None or elapsed < b:
+            b = elapsed
+    return (b, result)
+
+
+def main(args):
+    base = 2
+    power = 3
+    runs = 3
+    i = 0
+    while i < len(args):
+        if args[i] == '--base':
+            base = int(args[i+1])
+        elif args[i] == '--power':
+            power = int(args[i+1])
+        elif args[i] == '--runs':
+            runs = int(args[i+1])
+        i += 2
+
+    sys.setrecursionlimit(1000000)
+    p = app(parser.numeral(power), parser.numeral(base))
+    term = app(EQUAL, p, p)
+
+    def full():
+        stats = {}
+        return (equality.alphaEqual(reducer.norReduce(term, stats), TRUE), stats)
+
+    def head():
+        stats = {}
+        return (isTrue(reducer.hnf(term, stats)), stats)
+
+    def weak():
+        stats = {}
+        return (isTrue(reducer.whnf(term, stats)), stats)
+
+    nf = equality.deBruijn(reducer.norReduce(term))
+
+    def forced():
+        stats = {}
+        t = reducer.hnf(term, stats).term()
+        return (equality.deBruijn(reducer.render(t)) == nf, stats)
+
+    print("equal %d^%d %d^%d" % (base, power, base, power))
+    print("%-18s %6s %9s %9s" % ('evaluation', 'answer', 'steps', 'sec'))
+    for (name, f) in [('norReduce', full), ('hnf', head), ('whnf', weak), ('hnf, forced', forced)]:
+        (sec, (answer, stats)) = best(f, runs)
+        print("%-18s %6s %9d %9.4f" % (name, answer, stats.get('steps', 0), sec))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,74 @@
+#
+# Lexing speed: lexer.TokenStream, which chomps the source a character
+# at a time, against lexer.RegexTokenStream, which matches whole tokens
+# with one compiled pattern. Both must give the same tokens, kinds,
+# lines and columns.
+#
+#    python3 benchmarks/bench_lexer.py [--copies N] [--runs N]
+#
+# The source is the test cases, each definition renamed apart, repeated
+# copies times, with a comment and a string import between copies.
+#
+
+import os
+import sys
+import glob
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import lexer
+
+
+def program(copies):
+    cases = []
+    for fname in sorted(glob.glob(os.path.join(ROOT, 'test cases', '*.lc'))):
+        f = open(fname, "r")
+        cases.append(f.read())
+        f.close()
+    parts = []
+    for i in range(copies):
+        parts.append('(* copy ' + str(i) + ' *)\nimport "copy' + str(i) + '.lc";\n')
+        for src in cases:
+            parts.append(src.replace(':=', str(i) + ' :=') + '\n')
+    return ''.join(parts)
+
+
+def best(f, runs):
+    b = None
+    for i in range(runs):
+        start = time.perf_counter()
+        result = f()
+        elapsed = time.perf_counter() - start
+        if b is None or elapsed < b:
+            b = elapsed
+    return (b, result)
+
+
+def main(args):
+    copies = 20
+    runs = 3
+    i = 0
+    while i < len(args):
+        if args[i] == '--copies':
+            copies = int(args[i+1])
+        elif args[i] == '--runs':
+            runs = int(args[i+1])
+        i += 2
+
+    src = program(copies)
+    (slow, a) = best(lambda: lexer.TokenStream(src), runs)
+    (fast, b) = best(lambda: lexer.RegexTokenStream(src), runs)
+    if (a.tokens, a.kinds, a.lines, a.columns) != (b.tokens, b.kinds, b.lines, b.columns):
+        print("the two lexers disagree")
+    n = len(b.tokens)
+    print("%d characters, %d tokens" % (len(src), n))
+    print("%-18s %9s %12s" % ('lexer', 'sec', 'tokens/sec'))
+    print("%-18s %9.4f %12.0f" % ('TokenStream', slow, n / slow))
+    print("%-18s %9.4f %12.0f" % ('RegexTokenStream', fast, n / fast))
+    print("speedup %.1fx" % (slow / fast))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,84 @@
+#
+# Cost of growth monitoring (monitor.py): reducer.norReduce against
+# monitor.norReduce, and against finding the size and depth by walking
+# the whole term after every sweep.
+#
+#    python3 benchmarks/bench_monitor.py [--base N] [--power N] [--runs N]
+#
+# The term is  power base  (Church numeral exponentiation). All three
+# reductions take the same steps; the monitored ones must agree on the
+# largest size and depth reached.
+#
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import parser
+import monitor
+import reducer
+
+
+def walked(t):
+    # Sizes the term after every sweep by walking it.
+    names = reducer.Names()
+    (maxSize, maxDepth) = monitor.measure(t)
+    while reducer.isR(t):
+        t = reducer.reduce(t, None, None, names)
+        (size, depth) = monitor.measure(t)
+        maxSize = max(maxSize, size)
+        maxDepth = max(maxDepth, depth)
+    return (maxSize, maxDepth)
+
+
+def best(f, runs):
+    b = None
+    for i in range(runs):
+        start = time.perf_counter()
+        result = f()
+        elapsed = time.perf_counter() - start
+        if b is None or elapsed < b:
+            b = elapsed
+    return (b, result)
+
+
+def main(args):
+    base = 4
+    power = 4
+    runs = 5
+    i = 0
+    while i < len(args):
+        if args[i] == '--base':
+            base = int(args[i+1])
+        elif args[i] == '--power':
+            power = int(args[i+1])
+        elif args[i] == '--runs':
+            runs = int(args[i+1])
+        i += 2
+
+    sys.setrecursionlimit(1000000)
+    term = ['AP', parser.numeral(power), parser.numeral(base)]
+    (plain, nf) = best(lambda: reducer.norReduce(term), runs)
+
+    def monitored():
+        m = monitor.Monitor()
+        monitor.norReduce(term, m)
+        return m
+    (fast, m) = best(monitored, runs)
+    (slow, sizes) = best(lambda: walked(term), runs)
+
+    print("%d^%d: %d steps, %d sweeps, max size %d, max depth %d, %d fresh variables"
+          % (base, power, m.steps, m.sweeps, m.maxSize, m.maxDepth, m.fresh))
+    print("%-22s %9s %9s" % ('reduction', 'sec', 'overhead'))
+    print("%-22s %9.4f %9s" % ('norReduce', plain, '-'))
+    print("%-22s %9.4f %8.0f%%" % ('monitored', fast, 100.0 * (fast - plain) / plain))
+    print("%-22s %9.4f %8.0f%%" % ('walk after each sweep', slow, 100.0 * (slow - plain) / plain))
+    if sizes[0] < m.maxSize or sizes[1] > m.maxDepth:
+        print("the monitor missed a peak: walked", sizes)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
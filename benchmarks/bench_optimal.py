@@ -0,0 +1,130 @@
+#
+# Compares the interaction net backend (optimal.py) with norReduce.
+#
+#    python3 benchmarks/bench_optimal.py [--sweeps N] [--interactions N] [--height N]
+#
+# For every file in "test cases/" and for generated exponent towers
+# (2 2 ... 2, which normalize to the Church numeral for a tower of
+# powers of two) it prints the beta steps norReduce takes, the
+# interactions the net performs (and how many of them are beta), the
+# interaction rate, and whether both backends agree up to renaming.
+# Terms the net cannot read back (see optimal.Unsound) are reported as
+# such. Exits with status 1 if the backends disagree on any term.
+#
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import equality
+import parser
+import reducer
+import optimal
+
+
+def parseFile(fname):
+    f = open(fname, "r")
+    src = f.read()
+    f.close()
+    functions = []
+    tks = parser.TokenStream(src, filename=fname)
+    parser.parseTerm(tks, functions)
+    tks.checkEOF()
+    return reducer.buildTerm(functions)
+
+
+def cappedReduce(t, stats, sweeps):
+    """
+    norReduce with a bound on the number of sweeps, since some of the
+    test cases (fibrec) have no normal form.
+    """
+    stats['sweeps'] = 0
+    stats['steps'] = 0
+    while reducer.isR(t):
+        if stats['sweeps'] >= sweeps:
+            return None
+        stats['sweeps'] += 1
+        t = reducer.reduce(t, stats)
+    return t
+
+
+def compare(name, term, sweeps, interactions, withNor=True):
+    """
+    Prints one row of the table. Returns False if both backends gave a
+    result and they differ, True otherwise.
+    """
+    nor = None
+    ns = {}
+    nt = 0.0
+    if withNor:
+        start = time.perf_counter()
+        try:
+            nor = cappedReduce(term, ns, sweeps)
+        except RecursionError:
+            nor = None
+        nt = time.perf_counter() - start
+    ostats = {}
+    gaveUp = 'net gave up'
+    try:
+        opt = optimal.optReduce(term, ostats, interactions)
+    except optimal.Unsound:
+        opt = None
+        gaveUp = 'net unsound'
+    except optimal.ReductionLimit:
+        opt = None
+    if nor is None:
+        steps = '-'
+    else:
+        steps = str(ns['steps'])
+    if opt is None:
+        print("%-14s %10s %10s %10s %12s %9.3f %9s  %s" % (name, steps, '-', '-', '-', nt, '-', gaveUp))
+        return True
+    if nor is None:
+        agree = 'n/a'
+    elif equality.alphaEqual(nor, opt):
+        agree = 'yes'
+    else:
+        agree = 'NO'
+    print("%-14s %10s %10d %10d %12.0f %9.3f %9.3f  %s" % (name, steps, ostats['interactions'], ostats['beta'], ostats['rate'], nt, ostats['seconds'], agree))
+    return agree != 'NO'
+
+
+def main(args):
+    sweeps = 500
+    interactions = 1000000
+    height = 4
+    i = 0
+    while i < len(args):
+        if args[i] == '--sweeps':
+            sweeps = int(args[i+1])
+        elif args[i] == '--interactions':
+            interactions = int(args[i+1])
+        elif args[i] == '--height':
+            height = int(args[i+1])
+        i += 2
+
+    sys.setrecursionlimit(100000)
+    print("%-14s %10s %10s %10s %12s %9s %9s  %s" % ('term', 'nor steps', 'net inter', 'net beta', 'inter/sec', 'nor sec', 'net sec', 'agree'))
+    agreed = True
+    folder = os.path.join(ROOT, "test cases")
+    for fname in sorted(os.listdir(folder)):
+        if not fname.endswith('.lc'):
+            continue
+        try:
+            term = parseFile(os.path.join(folder, fname))
+        except (parser.SyntaxError, parser.ParseError, parser.LexError) as e:
+            print("%-14s parse error: %s" % (fname, e.args[0]))
+            continue
+        agreed = compare(fname, term, sweeps, interactions) and agreed
+    for h in range(2, height+1):
+        # Past height 3 the normal form has 2^16 applications and is
+        # too deep for the recursive reducer.
+        agreed = compare("tower " + str(h), parser.tower(2, h), sweeps, interactions, h <= 3) and agreed
+    return 0 if agreed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,76 @@
+#
+# Speedup of parNorReduce (parallel.py) over norReduce as the number of
+# worker processes grows.
+#
+#    python3 benchmarks/bench_parallel.py [--width N] [--height N] [--cores N]
+#
+# The benchmark term is a wide tuple  fn s => s T1 T2 ... Tw  whose
+# components are exponent towers 2 2 ... 2 n, with n = 3 or 4 and
+# height numerals in all. It is reduced once with norReduce and then
+# with parNorReduce on 1, 2, 4, ... up to the number of cores, and the
+# wall clock time and speedup of each run is printed.
+#
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import multiprocessing
+
+import parser
+import reducer
+import equality
+import parallel
+
+
+def wide(width, height):
+    t = ['VA', 's']
+    for i in range(width):
+        # Vary the innermost numeral so the components differ.
+        t = ['AP', t, ['AP', parser.tower(2, height-1), parser.numeral(3 + i % 2)]]
+    return ['LM', 's', t]
+
+
+def main(args):
+    width = 8
+    height = 3
+    cores = os.cpu_count() or 1
+    i = 0
+    while i < len(args):
+        if args[i] == '--width':
+            width = int(args[i+1])
+        elif args[i] == '--height':
+            height = int(args[i+1])
+        elif args[i] == '--cores':
+            cores = int(args[i+1])
+        i += 2
+
+    sys.setrecursionlimit(100000)
+    term = wide(width, height)
+    start = time.perf_counter()
+    stats = {}
+    expected = reducer.norReduce(term, stats)
+    base = time.perf_counter() - start
+    print("norReduce: %d steps, %.3f sec" % (stats['steps'], base))
+    print("%6s %10s %9s %8s" % ('cores', 'pieces', 'sec', 'speedup'))
+    n = 1
+    while True:
+        pool = multiprocessing.Pool(n)
+        stats = {}
+        start = time.perf_counter()
+        result = parallel.parNorReduce(term, n, stats, pool)
+        elapsed = time.perf_counter() - start
+        pool.close()
+        pool.join()
+        assert equality.alphaEqual(result, expected)
+        print("%6d %10d %9.3f %8.2f" % (n, stats.get('pieces', 0), elapsed, base / elapsed))
+        if n >= cores:
+            break
+        n = min(2*n, cores)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
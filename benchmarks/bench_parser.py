@@ -0,0 +1,134 @@
+#
+# Parsing speed of parser.parseTerm against the recursive descent
+# parser it replaced, which is kept below as oldParseTerm.
+#
+#    python3 benchmarks/bench_parser.py [--length N] [--depth N] [--runs N]
+#
+# Three programs, each a single definition of main:
+#
+#    names    f x1 x2 ... xN                          (N arguments)
+#    spine    n (fn g => fn h => h (g f)) (fn u => x) ...   (N arguments)
+#    nested   ((( ... (a b) ... )))                   (depth parentheses)
+#
+# Each program is lexed once; every run parses its tokens again from
+# the start, so only parsing is timed. The old parser only handles the
+# first shape, and is reported as failing on the others.
+#
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import parser
+
+
+def oldParseTerm(tokens, functions):
+    if tokens.nextIsName():
+        x = tokens.eatName()
+        if tokens.next() == '(':
+            tokens.eat('(')
+            e = oldParseTerm(tokens, functions)
+            tokens.eat(')')
+            x = ['AP', ['VA',x], e]
+        elif tokens.nextIsName():
+            x = ['VA', x]
+            while tokens.nextIsName():
+                e = tokens.eatName()
+                x = ['AP', x, ['VA', e]]
+            if tokens.next() not in [')', ';', 'eof']:
+                x = ['AP', ['VA', x], oldParseTerm(tokens, functions)]
+        elif tokens.next() == ':=':
+            tokens.eat(':=')
+            e = oldParseTerm(tokens, functions)
+            functions.append((x,e))
+            tokens.eat(';')
+            if tokens.next() != 'eof':
+                oldParseTerm(tokens, functions)
+            x = None
+        elif tokens.next() in [')',";"]:
+            if tokens.next() == ')':
+                tokens.eat(')')
+            x = ['VA', x]
+        return x
+    elif tokens.next() == '(':
+        tokens.eat('(')
+        e = oldParseTerm(tokens,functions)
+        if tokens.next() == ')':
+            tokens.eat(')')
+        else:
+            oldParseTerm(tokens, functions)
+        if tokens.next() != ';' and tokens.next() != ')':
+            return ['AP', e,oldParseTerm(tokens, functions)]
+        return e
+    elif tokens.next() == "fn":
+        tokens.eat('fn')
+        name = tokens.eatName()
+        tokens.eat('=>')
+        e = oldParseTerm(tokens, functions)
+        return ['LM', name, e]
+
+
+def programs(length, depth):
+    args = ' '.join('x' + str(i) for i in range(length))
+    yield ('names', "main := f " + args + ";")
+    args = ' '.join(['(fn g => fn h => h (g f))', '(fn u => x)'] * (length // 2))
+    yield ('spine', "main := n " + args + ";")
+    yield ('nested', "main := " + '(' * depth + "a b" + ')' * depth + ";")
+
+
+def timeParse(parse, stream, runs):
+    """
+    Returns the best time of parsing the stream's tokens, or None if
+    the parse fails.
+    """
+    best = None
+    for i in range(runs):
+        stream.pos = 0
+        functions = []
+        start = time.perf_counter()
+        try:
+            parse(stream, functions)
+            stream.checkEOF()
+        except (parser.SyntaxError, parser.ParseError, RecursionError, IndexError, TypeError):
+            return None
+        elapsed = time.perf_counter() - start
+        if len(functions) != 1:
+            return None
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main(args):
+    length = 2000
+    depth = 2000
+    runs = 5
+    i = 0
+    while i < len(args):
+        if args[i] == '--length':
+            length = int(args[i+1])
+        elif args[i] == '--depth':
+            depth = int(args[i+1])
+        elif args[i] == '--runs':
+            runs = int(args[i+1])
+        i += 2
+
+    print("%-8s %8s %10s %14s %10s %14s" % ('program', 'tokens', 'old sec', 'old tokens/s', 'new sec', 'new tokens/s'))
+    for (name, src) in programs(length, depth):
+        stream = parser.TokenStream(src)
+        count = stream.numTokens()
+        row = [name, count]
+        for parse in (oldParseTerm, parser.parseTerm):
+            elapsed = timeParse(parse, stream, runs)
+            if elapsed is None:
+                row += ['fails', '-']
+            else:
+                row += ['%.4f' % elapsed, '%.0f' % (count / elapsed)]
+        print("%-8s %8d %10s %14s %10s %14s" % tuple(row))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,130 @@
+#
+# Load generator for the reduction service (server.py).
+#
+#    python3 benchmarks/bench_server.py [--clients N] [--requests N] [--workers N] [--file F]
+#
+# Starts the service on a Unix socket in this process, then opens
+# the given number of client connections, each sending its requests
+# one after the other. Prints the p50 and p99 latency from sending a
+# request to receiving its result, and the requests per second over
+# the whole run. Before that it checks that requests whose ids look
+# like the service's own messages, and lines longer than server.LIMIT,
+# are answered; it exits with status 1 if one is not.
+#
+
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import server
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = int(round(p / 100.0 * (len(values) - 1)))
+    return values[k]
+
+
+async def client(path, src, requests, latencies, failures):
+    (reader, writer) = await asyncio.open_unix_connection(path)
+    for i in range(requests):
+        start = time.perf_counter()
+        writer.write((json.dumps({'id': i, 'op': 'reduce', 'source': src}) + '\n').encode('utf-8'))
+        await writer.drain()
+        while True:
+            event = json.loads(await reader.readline())
+            if event['event'] in ('accepted', 'progress'):
+                continue
+            if event['event'] == 'result':
+                latencies.append(time.perf_counter() - start)
+            else:
+                failures.append(event)
+            break
+    writer.close()
+
+
+async def answer(path, line):
+    """
+    Sends one request line and returns the event that ends it, or None
+    if none comes within ten seconds or the connection fails first.
+    """
+    (reader, writer) = await asyncio.open_unix_connection(path)
+    try:
+        writer.write(line)
+        await writer.drain()
+        while True:
+            event = json.loads(await asyncio.wait_for(reader.readline(), 10))
+            if event['event'] not in ('accepted', 'progress'):
+                return event
+    except (asyncio.TimeoutError, ConnectionError, ValueError):
+        return None
+    finally:
+        writer.close()
+
+
+async def check(path, src):
+    """
+    Returns the checks that failed (see above).
+    """
+    failed = []
+    for rid in ('cancel', 'job', None):
+        event = await answer(path, (json.dumps({'id': rid, 'source': src}) + '\n').encode('utf-8'))
+        if event is None or event['event'] != 'result' or event['id'] != rid:
+            failed.append("request id " + json.dumps(rid) + ": " + str(event))
+    event = await answer(path, b'x' * (server.LIMIT + 1) + b'\n')
+    if event is None or event['event'] != 'error':
+        failed.append("long line: " + str(event))
+    return failed
+
+
+async def run(args):
+    clients = 8
+    requests = 25
+    workers = None
+    fname = os.path.join(ROOT, "test1.lc")
+    i = 0
+    while i < len(args):
+        if args[i] == '--clients':
+            clients = int(args[i+1])
+        elif args[i] == '--requests':
+            requests = int(args[i+1])
+        elif args[i] == '--workers':
+            workers = int(args[i+1])
+        elif args[i] == '--file':
+            fname = args[i+1]
+        i += 2
+    f = open(fname, "r")
+    src = f.read()
+    f.close()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.sock')
+    service = server.Service(workers)
+    srv = await server.listen(service, path)
+    failed = await check(path, src)
+    latencies = []
+    failures = []
+    start = time.perf_counter()
+    await asyncio.gather(*[client(path, src, requests, latencies, failures) for c in range(clients)])
+    elapsed = time.perf_counter() - start
+    srv.close()
+    await srv.wait_closed()
+    service.stop()
+    os.unlink(path)
+
+    print("%d clients x %d requests of %s on %d workers" % (clients, requests, os.path.basename(fname), service.size))
+    print("p50 %.2f ms   p99 %.2f ms   %.1f requests/sec   %d failed" % (
+        1000 * percentile(latencies, 50), 1000 * percentile(latencies, 99),
+        len(latencies) / elapsed, len(failures)))
+    for f in failed:
+        print("check failed: " + f)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(run(sys.argv[1:])))
@@ -0,0 +1,75 @@
+#
+# Cold start of the command line: how long  python3 parser.py <file>
+# takes in a fresh interpreter, over and above starting the interpreter
+# itself, and how long importing each of the library modules takes.
+#
+#    python3 benchmarks/bench_startup.py [--runs N] [--budget MS] [file]
+#
+# Each figure is the best of runs fresh processes, in milliseconds,
+# less the best time of  python3 -c pass . The command line runs in a
+# scratch directory, so its reducable.txt does not touch the one here.
+# The file defaults to test cases/fibrec.lc. If the command line takes
+# longer than the budget the benchmark says so and exits with status 1.
+#
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ['lexer', 'codegen', 'parser', 'reducer', 'modules', 'equality']
+
+
+def best(cmd, cwd, runs):
+    b = None
+    for i in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=cwd, stdout=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - start
+        if b is None or elapsed < b:
+            b = elapsed
+    return b
+
+
+def main(args):
+    runs = 10
+    budget = 100.0
+    fname = os.path.join(ROOT, 'test cases', 'fibrec.lc')
+    i = 0
+    while i < len(args):
+        if args[i] == '--runs':
+            runs = int(args[i+1])
+            i += 2
+        elif args[i] == '--budget':
+            budget = float(args[i+1])
+            i += 2
+        else:
+            fname = os.path.abspath(args[i])
+            i += 1
+
+    scratch = tempfile.mkdtemp()
+    try:
+        base = best([sys.executable, '-c', 'pass'], scratch, runs)
+        print("%-24s %9s" % ('cold start', 'ms'))
+        print("%-24s %9.1f" % ('python3 -c pass', 1000 * base))
+        for m in MODULES:
+            sec = best([sys.executable, '-c', 'import ' + m], ROOT, runs)
+            print("%-24s %9.1f" % ('import ' + m, 1000 * (sec - base)))
+        cli = best([sys.executable, os.path.join(ROOT, 'parser.py'), fname], scratch, runs)
+        cli = 1000 * (cli - base)
+        print("%-24s %9.1f" % ('parser.py ' + os.path.basename(fname), cli))
+    finally:
+        if os.path.exists(os.path.join(scratch, 'reducable.txt')):
+            os.remove(os.path.join(scratch, 'reducable.txt'))
+        os.rmdir(scratch)
+    if cli > budget:
+        print("over the budget of %.0f ms" % budget)
+        sys.exit(1)
+    print("within the budget of %.0f ms" % budget)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
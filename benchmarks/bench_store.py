@@ -0,0 +1,108 @@
+#
+# Peak memory of reducing with the array-backed store (store.py)
+# against the nested lists of reducer.py.
+#
+#    python3 benchmarks/bench_store.py [--width N] [--base N] [--power N]
+#
+# The term is a wide tuple  fn s => s T1 ... Tw  whose components are
+# the powers  power base  (Church numeral exponentiation, base^power
+# applications each). Each backend runs in a child process of its own,
+# which reports how far its peak resident set size (ru_maxrss) grew
+# during the reduction, the size of the normal form as a tree and the
+# time taken.
+#
+
+import os
+import sys
+import time
+import resource
+import threading
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import parser
+import reducer
+import store
+
+
+def wide(width, base, power):
+    t = ['VA', 's']
+    for i in range(width):
+        t = ['AP', t, ['AP', parser.numeral(power), parser.numeral(base)]]
+    return ['LM', 's', t]
+
+
+def treeSize(t):
+    n = 0
+    todo = [t]
+    while todo:
+        t = todo.pop()
+        n += 1
+        if t[0] == 'AP':
+            todo.append(t[1])
+            todo.append(t[2])
+        elif t[0] == 'LM':
+            todo.append(t[2])
+    return n
+
+
+def child(mode, width, base, power):
+    term = wide(width, base, power)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if mode == 'list':
+        result = reducer.norReduce(term)
+    else:
+        st = store.TermStore()
+        n = st.compact(st.norReduce(st.load(term)))
+    elapsed = time.perf_counter() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    if mode == 'list':
+        nodes = treeSize(result)
+        extra = ''
+    else:
+        nodes = st.size(n)
+        extra = ' store %d nodes %d bytes' % (st.count, st.nbytes())
+    print("%d %d %.3f%s" % (rss, nodes, elapsed, extra))
+
+
+def main(args):
+    width = 200
+    base = 5
+    power = 4
+    mode = None
+    i = 0
+    while i < len(args):
+        if args[i] == '--width':
+            width = int(args[i+1])
+        elif args[i] == '--base':
+            base = int(args[i+1])
+        elif args[i] == '--power':
+            power = int(args[i+1])
+        elif args[i] == '--child':
+            mode = args[i+1]
+        i += 2
+
+    if mode is not None:
+        # The list reducer recurses once per level of the term; give it
+        # a deep enough stack.
+        sys.setrecursionlimit(1000000)
+        threading.stack_size(512 * 1024 * 1024)
+        t = threading.Thread(target=child, args=(mode, width, base, power))
+        t.start()
+        t.join()
+        return
+
+    print("%-6s %12s %12s %10s %9s" % ('store', 'RSS grew kB', 'nf nodes', 'B/node', 'sec'))
+    for mode in ('list', 'array'):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode,
+                              '--width', str(width), '--base', str(base), '--power', str(power)],
+                             stdout=subprocess.PIPE, universal_newlines=True).stdout.split()
+        (rss, nodes, elapsed) = (int(out[0]), int(out[1]), float(out[2]))
+        print("%-6s %12d %12d %10.1f %9.3f %s" % (mode, rss, nodes, 1024.0 * rss / nodes, elapsed, ' '.join(out[3:])))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,102 @@
+#
+# Streaming parsing: parser.streamDefinitions over a file mapped into
+# memory a piece at a time, against reading the whole file, lexing it
+# with RegexTokenStream and parsing it with parseTerm.
+#
+#    python3 benchmarks/bench_stream.py [--defs N] [--chunk N]
+#
+# The program is N definitions  dK := fn f => fn x => f (... (f x)) ;
+# with a main at the end. Each definition is dropped as soon as it is
+# counted, as a stage that handles definitions one at a time would. The
+# table gives the time until the first definition is in hand, the total
+# time, and the largest amount of memory in use at once (from a second,
+# traced run). Both must give the same number of definitions.
+#
+
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import lexer
+import parser
+
+
+def write(path, defs):
+    f = open(path, "w")
+    for k in range(defs):
+        f.write('d' + str(k) + ' := fn f => fn x => ' + 'f (' * (k % 20) + 'x' + ')' * (k % 20) + ';\n')
+    f.write('main := d0;\n')
+    f.close()
+
+
+def whole(path, chunk):
+    f = open(path, "r")
+    src = f.read()
+    f.close()
+    functions = []
+    tks = lexer.RegexTokenStream(src, filename=path)
+    parser.parseTerm(tks, functions, [])
+    tks.checkEOF()
+    for d in functions:
+        yield d
+
+
+def streamed(path, chunk):
+    return parser.streamDefinitions(lexer.mapChunks(path, chunk), path, [])
+
+
+def run(f, path, chunk):
+    start = time.perf_counter()
+    first = None
+    n = 0
+    for d in f(path, chunk):
+        if first is None:
+            first = time.perf_counter() - start
+        n += 1
+    return (first, time.perf_counter() - start, n)
+
+
+def peak(f, path, chunk):
+    tracemalloc.start()
+    for d in f(path, chunk):
+        pass
+    p = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return p
+
+
+def main(args):
+    defs = 20000
+    chunk = lexer.CHUNK
+    i = 0
+    while i < len(args):
+        if args[i] == '--defs':
+            defs = int(args[i+1])
+        elif args[i] == '--chunk':
+            chunk = int(args[i+1])
+        i += 2
+
+    (fd, path) = tempfile.mkstemp(suffix='.lc')
+    os.close(fd)
+    try:
+        write(path, defs)
+        print("%d definitions, %d bytes, pieces of %d" % (defs + 1, os.path.getsize(path), chunk))
+        print("%-10s %10s %10s %12s" % ('parse', 'first sec', 'total sec', 'peak MB'))
+        counts = []
+        for (name, f) in [('whole', whole), ('streamed', streamed)]:
+            (first, total, n) = run(f, path, chunk)
+            counts.append(n)
+            print("%-10s %10.4f %10.4f %12.1f" % (name, first, total, peak(f, path, chunk) / 1e6))
+        if counts[0] != counts[1]:
+            print("the two parses disagree:", counts)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,260 @@
+import sys
+import mmap
+import array
+import struct
+
+import reducer
+
+#
+# Binary format for terms.
+#
+# A term is stored as its nodes in post-order, so the subterms of a
+# node always come before it and the root is the last node. Each node
+# takes two 32-bit integers, a tag and an argument:
+#
+#    VA   tag 0, the index of its name in the string table
+#    LM   tag 1, the index of its bound name; the body is the node
+#         just before it
+#    AP   tag 2, the index of its left subterm; the right subterm is
+#         the node just before it
+#
+# Names are kept once each in a string table: an array of S+1 offsets
+# followed by the UTF-8 bytes of all the names.
+#
+# The whole thing is laid out as
+#
+#    header   magic 'LCT1', byte order, node count N, string count S,
+#             size of the name bytes (struct HEADER)
+#    nodes    2*N int32
+#    offsets  S+1 uint32
+#    names    UTF-8 bytes
+#
+# and TermView reads it in place, through a memoryview of a bytes
+# object or of an mmap'd file, without copying the node array.
+#
+
+VA = 0
+LM = 1
+AP = 2
+
+MAGIC = b'LCT1'
+HEADER = struct.Struct('<4sBxxxIII')
+LITTLE = 0
+BIG = 1
+
+
+class FormatError(Exception):
+    pass
+
+
+def encode(term):
+    """
+    Builds the node array and string table of a term, which may come
+    straight from parseTerm (see reducer.fromParser).
+    """
+    nodes = array.array('i')
+    strings = {}
+    names = []
+
+    def intern(x):
+        k = strings.get(x)
+        if k is None:
+            k = len(names)
+            strings[x] = k
+            names.append(x)
+        return k
+
+    # Each entry is a term, how far it has been written (0: not
+    # started, 1: left subterm written, 2: all subterms written) and,
+    # for an AP, the position of its left subterm.
+    work = [(term, 0, 0)]
+    while work:
+        (t, state, left) = work.pop()
+        while t[0] == 'VA' and type(t[1]) == type([]):
+            t = t[1]
+        if t[0] == 'VA':
+            nodes.append(VA)
+            nodes.append(intern(t[1]))
+        elif t[0] == 'LM':
+            if state == 0:
+                work.append((t, 2, 0))
+                work.append((t[2], 0, 0))
+            else:
+                nodes.append(LM)
+                nodes.append(intern(t[1]))
+        elif state == 0:
+            work.append((t, 1, 0))
+            work.append((t[1], 0, 0))
+        elif state == 1:
+            work.append((t, 2, len(nodes) // 2 - 1))
+            work.append((t[2], 0, 0))
+        else:
+            nodes.append(AP)
+            nodes.append(left)
+    return (nodes, names)
+
+
+def dumps(term):
+    """
+    Returns the binary encoding of a term as bytes.
+    """
+    (nodes, names) = encode(term)
+    data = [x.encode('utf-8') for x in names]
+    offsets = array.array('I', [0])
+    for d in data:
+        offsets.append(offsets[-1] + len(d))
+    order = LITTLE if sys.byteorder == 'little' else BIG
+    header = HEADER.pack(MAGIC, order, len(nodes) // 2, len(names), offsets[-1])
+    return header + nodes.tobytes() + offsets.tobytes() + b''.join(data)
+
+
+def dump(term, f):
+    """
+    Writes the binary encoding of a term to a file opened in binary
+    mode.
+    """
+    f.write(dumps(term))
+
+
+class TermView:
+
+    def __init__(self, buf):
+        """
+        Wraps a buffer (bytes, bytearray, memoryview or mmap) holding
+        an encoded term. The node array and offsets are read through
+        memoryview casts of the buffer itself; only the names that are
+        asked for are decoded.
+        """
+        mv = memoryview(buf)
+        if len(mv) < HEADER.size:
+            mv.release()
+            raise FormatError("Truncated header.")
+        (magic, order, n, s, size) = HEADER.unpack_from(mv, 0)
+        start = HEADER.size
+        mid = start + 8*n
+        end = mid + 4*(s+1)
+        if magic != MAGIC:
+            mv.release()
+            raise FormatError("Not an encoded term.")
+        if len(mv) < end + size:
+            mv.release()
+            raise FormatError("Truncated term.")
+        native = LITTLE if sys.byteorder == 'little' else BIG
+        if order == native:
+            self.nodes = mv[start:mid].cast('i')
+            self.offsets = mv[mid:end].cast('I')
+        else:
+            # Written on a machine of the other byte order; this is the
+            # one case where the arrays are copied.
+            self.nodes = array.array('i', mv[start:mid].tobytes())
+            self.nodes.byteswap()
+            self.offsets = array.array('I', mv[mid:end].tobytes())
+            self.offsets.byteswap()
+        self.names = mv[end:end+size]
+        self.buffer = mv
+        self.count = n
+        self.root = n - 1
+        self.cache = {}
+
+    def tag(self, i):
+        return self.nodes[2*i]
+
+    def arg(self, i):
+        return self.nodes[2*i+1]
+
+    def name(self, k):
+        x = self.cache.get(k)
+        if x is None:
+            if not 0 <= k < len(self.offsets) - 1:
+                raise FormatError("No name " + str(k) + ".")
+            try:
+                x = bytes(self.names[self.offsets[k]:self.offsets[k+1]]).decode('utf-8')
+            except UnicodeDecodeError:
+                raise FormatError("Name " + str(k) + " is not UTF-8.")
+            self.cache[k] = x
+        return x
+
+    def toTerm(self, i=None):
+        """
+        Builds the list form of the term rooted at node i (the whole
+        term by default). Nodes are visited in storage order, which is
+        post-order, so the subterms of each node are on top of a stack
+        when it is reached.
+        """
+        if i is None:
+            i = self.root
+        if self.count == 0:
+            raise FormatError("Empty term.")
+        if not 0 <= i < self.count:
+            raise FormatError("No node " + str(i) + ".")
+        # Only the nodes of the subterm at i are needed: they form the
+        # run that ends at i. Find where it starts by counting the
+        # subterms still missing while walking back from i.
+        first = i
+        need = 1
+        while need > 0:
+            if first < 0:
+                raise FormatError("Node " + str(i) + " is missing subterms.")
+            tag = self.tag(first)
+            need -= 1
+            if tag == LM:
+                need += 1
+            elif tag == AP:
+                need += 2
+            first -= 1
+        out = []
+        for j in range(first+1, i+1):
+            tag = self.tag(j)
+            if tag == VA:
+                out.append(['VA', self.name(self.arg(j))])
+            elif tag == LM:
+                out.append(['LM', self.name(self.arg(j)), out.pop()])
+            elif tag == AP:
+                right = out.pop()
+                out.append(['AP', out.pop(), right])
+            else:
+                raise FormatError("Bad node tag " + str(tag) + ".")
+        return out[0]
+
+    def release(self):
+        """
+        Drops the memoryviews, so that an mmap behind them can be
+        closed.
+        """
+        for v in (self.nodes, self.offsets, self.names, self.buffer):
+            if isinstance(v, memoryview):
+                v.release()
+
+
+def loads(buf):
+    """
+    Decodes a term from a buffer written by dumps.
+    """
+    view = TermView(buf)
+    try:
+        return view.toTerm()
+    finally:
+        view.release()
+
+
+def load(fname):
+    """
+    Decodes a term from a file written by dump, reading it through an
+    mmap of the file.
+    """
+    f = open(fname, 'rb')
+    m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        t = loads(m)
+    finally:
+        m.close()
+        f.close()
+    return t
+
+
+def dumpFunctions(functions):
+    """
+    Encodes the definitions gathered by parseTerm as the single term
+    built by reducer.buildTerm.
+    """
+    return dumps(reducer.buildTerm(functions))
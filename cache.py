@@ -0,0 +1,285 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import tempfile
+
+import parser
+import modules
+import reducer
+import equality
+
+#
+# A cache of normal forms on disk.
+#
+# A result is stored under a key made from three things: the program,
+# the strategy that reduced it and the version of the engine. The
+# program is taken after parsing, pruning and binding its definitions
+# around main (reducer.buildTerm), and written in de Bruijn form
+# (equality.deBruijn), so programs that differ only in layout, in
+# comments, in unused definitions or in the names of bound variables
+# and definitions share a result. The sml strategy is the exception:
+# reduc.sml names its fresh variables after the binders they replace,
+# so what it prints depends on those names, and its key keeps them.
+# The version is a hash of the source of the engine that the strategy
+# runs, so changing the reducer makes the results it gave before
+# unreachable.
+#
+# Strategies (see STRATEGIES):
+#
+#    normal    reducer.norReduce
+#    eta       reducer.norReduce with the eta pass, beta-eta normal form
+#    sml       reduc.sml, through codegen.runSml; the result is what
+#              sml prints
+#
+# Each result is a small JSON file named by its key in the cache
+# directory. Files are written to a temporary name and renamed into
+# place, so that processes sharing the directory never read half a
+# file. A hit touches the file's modification time, and a store evicts
+# the files least recently touched until the directory is back under
+# its size cap. A file that vanishes or cannot be read is a miss.
+#
+#    python3 cache.py [--no-cache] [--strategy S] [--dir DIR] [--max-bytes N] <file> ...
+#
+#        prints the normal form of each program, and whether it came
+#        from the cache
+#
+
+# Where results go unless a directory is given; $LC_CACHE overrides it.
+DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "lc-results")
+
+# The default size cap, in bytes.
+MAX_BYTES = 64 * 1024 * 1024
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# strategy -> the files whose source is its engine.
+STRATEGIES = {
+    'normal': ['reducer.py'],
+    'eta': ['reducer.py'],
+    'sml': ['reduc.sml', 'codegen.py'],
+}
+
+_versions = {}
+
+
+class SmlError(Exception):
+    pass
+
+
+def version(strategy):
+    """
+    Returns the engine version of a strategy: a hash of its source.
+    """
+    v = _versions.get(strategy)
+    if v is None:
+        h = hashlib.sha256()
+        for name in STRATEGIES[strategy]:
+            f = open(os.path.join(HERE, name), "rb")
+            h.update(f.read())
+            f.close()
+        v = h.hexdigest()[:16]
+        _versions[strategy] = v
+    return v
+
+
+def key(t, strategy):
+    """
+    Returns the cache key of the term t reduced by strategy.
+    """
+    h = hashlib.sha256()
+    h.update((strategy + "\0" + version(strategy) + "\0").encode())
+    if strategy == 'sml':
+        # The de Bruijn code with the name of each binder after it,
+        # which gives back the term exactly.
+        code = []
+        for (label, x) in equality.walk(t):
+            if label == 'LM':
+                code.append(equality.LAMBDA)
+                code.append(x)
+            elif label == 'AP':
+                code.append(equality.APPLY)
+            elif label == 'IX' or label == 'VA':
+                code.append(x)
+    else:
+        code = equality.deBruijn(t)
+    # Names start with a letter or _, so no name reads as an index.
+    h.update(" ".join(str(c) for c in code).encode())
+    return h.hexdigest()
+
+
+class Cache:
+
+    def __init__(self, directory=None, maxBytes=MAX_BYTES):
+        if directory is None:
+            directory = os.environ.get("LC_CACHE", DIRECTORY)
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, k):
+        return os.path.join(self.directory, k + ".json")
+
+    def get(self, k):
+        """
+        Returns the entry stored under k, or None.
+        """
+        p = self.path(k)
+        try:
+            f = open(p, "r")
+            try:
+                entry = json.load(f)
+            finally:
+                f.close()
+            os.utime(p)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if type(entry) != dict or entry.get('key') != k:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, k, entry):
+        """
+        Stores entry, a dictionary, under k, and evicts what the size
+        cap calls for.
+        """
+        entry = dict(entry)
+        entry['key'] = k
+        (fd, tmp) = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            f = os.fdopen(fd, "w")
+            json.dump(entry, f)
+            f.close()
+            os.replace(tmp, self.path(k))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used results until the directory is
+        under its size cap.
+        """
+        files = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, name))
+            total += st.st_size
+        if total <= self.maxBytes:
+            return
+        files.sort()
+        for (mtime, size, name) in files:
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+
+def reduce(t, strategy, functions=None):
+    """
+    Reduces t by strategy, without the cache, and returns the result
+    as text. The sml strategy needs the definitions of the program;
+    raises SmlError if sml exits with a non-zero status.
+    """
+    if strategy == 'normal':
+        return reducer.pretty(reducer.norReduce(t))
+    if strategy == 'eta':
+        return reducer.pretty(reducer.norReduce(t, None, True))
+    import codegen
+    out = tempfile.TemporaryFile()
+    try:
+        status = codegen.runSml(functions, stdout=out)
+        out.seek(0)
+        result = out.read().decode()
+        if status != 0:
+            raise SmlError("sml exited with status " + str(status) + ":\n" + result)
+        return result
+    finally:
+        out.close()
+
+
+def normalForm(functions, strategy='normal', cache=None):
+    """
+    Returns (result, cached) for a program given as its (name, term)
+    definitions: the result of reducing it by strategy, as text, and
+    whether it came from cache. Without a cache, always reduces. A
+    reduction that fails raises (see reduce) and stores nothing.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError("Unknown strategy '" + strategy + "'.")
+    functions = parser.pruneFunctions(functions)
+    t = reducer.buildTerm(functions)
+    if cache is None:
+        return (reduce(t, strategy, functions), False)
+    k = key(t, strategy)
+    entry = cache.get(k)
+    if entry is not None:
+        return (entry['result'], True)
+    start = time.perf_counter()
+    result = reduce(t, strategy, functions)
+    cache.put(k, {'strategy': strategy, 'version': version(strategy), 'result': result,
+                  'seconds': time.perf_counter() - start})
+    return (result, False)
+
+
+def main(args):
+    useCache = True
+    strategy = 'normal'
+    directory = None
+    maxBytes = MAX_BYTES
+    files = []
+    i = 0
+    while i < len(args):
+        if args[i] == '--no-cache':
+            useCache = False
+            i += 1
+        elif args[i] == '--strategy':
+            strategy = args[i+1]
+            i += 2
+        elif args[i] == '--dir':
+            directory = args[i+1]
+            i += 2
+        elif args[i] == '--max-bytes':
+            maxBytes = int(args[i+1])
+            i += 2
+        else:
+            files.append(args[i])
+            i += 1
+    if not files or strategy not in STRATEGIES:
+        print("usage: python3 cache.py [--no-cache] [--strategy normal|eta|sml] [--dir DIR] [--max-bytes N] <file> ...")
+        return
+    cache = Cache(directory, maxBytes) if useCache else None
+    for fname in files:
+        try:
+            (result, cached) = normalForm(modules.load(fname), strategy, cache)
+        except SmlError as e:
+            print("[" + fname + "]")
+            print(e.args[0])
+            continue
+        except RecursionError:
+            print("[" + fname + "]")
+            print("The term is too deep to reduce.")
+            continue
+        print("[" + fname + (", cached]" if cached else "]"))
+        print(result)
+
+
+if __name__ == '__main__':
+    reducer.deep(main, sys.argv[1:])
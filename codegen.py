@@ -0,0 +1,141 @@
+import os
+
+#
+# Code generation: writes a parsed program as the SML program that
+# scripter.py appends to reduc.sml and runs. The program is a list of
+# (name, term) definitions, main last, as pruneFunctions leaves it;
+# buildSmlStr binds each term in turn and reduces main.
+#
+# The SML is written a piece at a time through a write function, by
+# loops with explicit stacks rather than recursion, so that the time
+# taken is linear in the size of the output and no depth of term or
+# number of definitions runs into the recursion limit. buildSmlStr and
+# toString join the pieces into a string; writeSml sends them to any
+# file object, and runSml to the standard input of sml itself, after
+# reduc.sml, without building the whole program in memory.
+#
+#    python3 parser.py --sml <file>     runs a program this way
+#
+
+# The SML reducer that the generated code is appended to.
+PRELUDE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reduc.sml")
+
+
+def quoted(x):
+    return '"' + str(x) + '"'
+
+
+def writeTerm(ast, write):
+    """
+    Writes a term in the prefix notation of the SML datatype, as
+    LM("x",...), AP(...,...) and VA"x".
+    """
+    if type(ast) != type([]):
+        write(quoted(ast))
+        return
+    # Entries are terms still to write, or text ready to write.
+    work = [ast]
+    while work:
+        t = work.pop()
+        if type(t) != type([]):
+            write(t)
+            continue
+        label = t[0]
+        if label in ['LM','AP']:
+            write(label + "(")
+            work.append(')')
+            work.append(piece(t[2]))
+            work.append(',')
+            work.append(piece(t[1]))
+        else:
+            write(label)
+            work.append(piece(t[1]))
+
+
+def piece(t):
+    # What writeTerm pushes for a part of a term: the text itself for a
+    # name or a variable, so that those are written in one go.
+    if type(t) != type([]):
+        return quoted(t)
+    if t[0] == 'VA' and type(t[1]) != type([]):
+        return 'VA' + quoted(t[1])
+    return t
+
+
+def toString(ast):
+    out = []
+    writeTerm(ast, out.append)
+    return ''.join(out)
+
+
+def writeMain(functions, write, i=0):
+    """
+    Writes main applied under the definitions from the i-th on: each
+    one is a lambda over the rest, applied to the term defined.
+    """
+    k = i
+    while functions[k][0] != 'main':
+        k += 1
+    for j in range(i, k):
+        write('AP(LM(x' + str(j+1) + ',')
+    if len(functions) != 1:
+        write('t)')
+    else:
+        write('t')
+    for j in range(k-1, i-1, -1):
+        if j == 0:
+            write(',t1)')
+        else:
+            write(',t' + str(j+1) + '))')
+
+
+def buildMain(functions, i):
+    out = []
+    writeMain(functions, out.append, i)
+    return ''.join(out)
+
+
+def writeSml(functions, write):
+    """
+    Writes the SML of a program with the write function of a file or
+    a list.
+    """
+    write('let\n')
+    for i in range(0,len(functions)-1):
+        write('val x' + str(i+1) + ' = ' + quoted(functions[i][0]) + '\n')
+        write('val t' + str(i+1) + ' = ')
+        writeTerm(functions[i][1], write)
+        write('\n')
+    write('val t = ')
+    writeTerm(functions[len(functions)-1][1], write)
+    write('\n')
+    write('val main = ')
+    writeMain(functions, write)
+    write('\n')
+    write('val value = norReduce main\nin\n   print (pretty value)\nend;')
+
+
+def buildSmlStr(functions):
+    out = []
+    writeSml(functions, out.append)
+    return ''.join(out)
+
+
+def runSml(functions, command="sml", prelude=PRELUDE, stdout=None):
+    """
+    Runs a program through the SML reducer: starts command, feeds it
+    the prelude and then the SML of the program as it is written, and
+    waits for it. Its output goes to stdout, a file, if given. Returns
+    its exit status.
+    """
+    import subprocess
+    proc = subprocess.Popen([command], stdin=subprocess.PIPE, stdout=stdout, universal_newlines=True)
+    try:
+        f = open(prelude, "r")
+        proc.stdin.write(f.read())
+        f.close()
+        writeSml(functions, proc.stdin.write)
+        proc.stdin.write('\n')
+    finally:
+        proc.stdin.close()
+    return proc.wait()
@@ -0,0 +1,243 @@
+import re
+
+import equality
+
+#
+# Sharing-aware text format for terms.
+#
+# pretty writes a term out as a tree, so a subterm that occurs many
+# times (the copies of an argument that a reduction substituted, say)
+# is printed in full at every occurrence. Here equal subterms are
+# merged first, and every closed subterm used more than once is
+# written once, under a name, and referred to by that name afterwards:
+#
+#    #1 = LM(v1,LM(v2,AP(VA'v1',AP(VA'v1',VA'v2'))))
+#    LM(v1,AP(AP(VA'v1',#1),#1))
+#
+# Subterms that are equal up to the names of their bound variables are
+# merged too: share keys each subterm on its de Bruijn form, in one
+# pass over the term, so the copies of a numeral that a reduction gave
+# different fresh names become one node. Binders are named when the
+# term is written, after their depth below the nearest enclosing closed
+# subterm. The term read back is therefore equal to the original up to
+# renaming of bound variables.
+#
+# Each term is written in the prefix notation of toString, plus #n for
+# a shared node. Inside VA'...' a quote or a backslash is written after
+# a backslash, so free names such as the x' render gives read back. Definitions come before their uses and the last line
+# is the term itself. loads reads this back into the list form of
+# reducer.py, with each shared node built once and shared by all its
+# uses, so the term is no bigger in memory than the text.
+#
+
+
+class FormatError(Exception):
+    pass
+
+
+def share(t):
+    """
+    Merges the subterms of t that are equal up to the names of their
+    bound variables, in one pass. Returns (table, uses, loose, free):
+    the node table, a list of entries in post-order, the number of
+    uses of each entry, the highest de Bruijn index free in each entry
+    (negative for a closed one) and the set of names free in t. An
+    entry is one of
+
+        ('VA', x, None)     the free variable x
+        ('IX', i, None)     the variable bound by the i-th lambda out
+        ('LM', k, None)     a lambda whose body is entry k
+        ('AP', k1, k2)      an application
+    """
+    table = []
+    index = {}
+    loose = []
+    free = set()
+    out = []
+    for (label, x) in equality.walk(t):
+        if label == 'IX':
+            key = ('IX', x, None)
+            i = x
+        elif label == 'VA':
+            free.add(x)
+            key = ('VA', x, None)
+            i = -1
+        elif label == 'lm':
+            b = out.pop()
+            key = ('LM', b, None)
+            i = loose[b] - 1
+        elif label == 'ap':
+            b = out.pop()
+            a = out.pop()
+            key = ('AP', a, b)
+            i = loose[a] if loose[a] > loose[b] else loose[b]
+        else:
+            continue
+        k = index.get(key)
+        if k is None:
+            k = len(table)
+            index[key] = k
+            table.append(key)
+            loose.append(i)
+        out.append(k)
+
+    uses = [0] * len(table)
+    uses[-1] = 1
+    for (label, a, b) in table:
+        if label == 'AP':
+            uses[a] += 1
+            uses[b] += 1
+        elif label == 'LM':
+            uses[a] += 1
+    return (table, uses, loose, free)
+
+
+def write(t, out):
+    """
+    Writes t to the file out in the format above.
+    """
+    (table, uses, loose, free) = share(t)
+    prefix = 'v'
+    while any(x.startswith(prefix) for x in free):
+        prefix += 'v'
+    names = {}
+    root = len(table) - 1
+
+    def render(k):
+        # Renders node k, inlining the nodes that have no name. The
+        # binder at depth d below the nearest closed node is named
+        # prefix + str(d + 1), so a closed node reads the same wherever
+        # it is used.
+        parts = []
+        work = [(k, 0)]
+        while work:
+            (k, depth) = work.pop()
+            if type(k) == type(''):
+                parts.append(k)
+                continue
+            if k in names:
+                parts.append(names[k])
+                continue
+            if loose[k] < 0:
+                depth = 0
+            (label, a, b) = table[k]
+            if label == 'VA':
+                parts.append("VA'" + a.replace("\\", "\\\\").replace("'", "\\'") + "'")
+            elif label == 'IX':
+                parts.append("VA'" + prefix + str(depth - a) + "'")
+            elif label == 'LM':
+                parts.append("LM(" + prefix + str(depth + 1) + ",")
+                work.append((')', 0))
+                work.append((a, depth + 1))
+            else:
+                parts.append("AP(")
+                work.append((')', 0))
+                work.append((b, depth))
+                work.append((',', 0))
+                work.append((a, depth))
+        return ''.join(parts)
+
+    # Only closed nodes get a name: an open one reads differently under
+    # binders at different depths.
+    for k in range(len(table)):
+        if k != root and uses[k] > 1 and loose[k] < 0 and table[k][0] in ('LM', 'AP'):
+            name = '#' + str(len(names) + 1)
+            out.write(name + " = " + render(k) + "\n")
+            names[k] = name
+    out.write(render(root) + "\n")
+
+
+def dumps(t):
+    """
+    Returns t in the format above as a string.
+    """
+    parts = []
+
+    class Collect:
+        def write(self, s):
+            parts.append(s)
+
+    write(t, Collect())
+    return ''.join(parts)
+
+
+TOKEN = re.compile(r"\s*(?:(AP\(|LM\()|VA'((?:[^'\\]|\\.)*)'|(#\d+)|([,)=])|([^\s,()=#']+))")
+ESCAPE = re.compile(r"\\(.)")
+
+
+def loads(text):
+    """
+    Reads a term written by write or dumps.
+    """
+    defs = {}
+    term = None
+    for line in text.split('\n'):
+        if line.strip() == '':
+            continue
+        m = re.match(r"\s*(#\d+)\s*=", line)
+        if m is not None:
+            defs[m.group(1)] = parseLine(line[m.end():], defs)
+        else:
+            if term is not None:
+                raise FormatError("More than one term line.")
+            term = parseLine(line, defs)
+    if term is None:
+        raise FormatError("No term.")
+    return term
+
+
+def load(fname):
+    f = open(fname, "r")
+    text = f.read()
+    f.close()
+    return loads(text)
+
+
+def parseLine(s, defs):
+    # A stack of nodes waiting for their subterms, each with the
+    # number of subterms it still needs.
+    stack = []
+    result = None
+    pos = 0
+    while pos < len(s):
+        m = TOKEN.match(s, pos)
+        if m is None or m.end() == pos:
+            if s[pos:].strip() == '':
+                break
+            raise FormatError("Bad input at '" + s[pos:pos+20] + "'.")
+        pos = m.end()
+        (open_, var, ref, punct, name) = m.groups()
+        t = None
+        if open_ == 'AP(':
+            stack.append(['AP', None, None])
+        elif open_ == 'LM(':
+            stack.append(['LM', None, None])
+        elif var is not None:
+            t = ['VA', ESCAPE.sub(r"\1", var)]
+        elif ref is not None:
+            if ref not in defs:
+                raise FormatError("Use of " + ref + " before its definition.")
+            t = defs[ref]
+        elif name is not None:
+            if not stack or stack[-1][0] != 'LM' or stack[-1][1] is not None:
+                raise FormatError("Unexpected name '" + name + "'.")
+            stack[-1][1] = name
+        elif punct == ')':
+            if not stack or stack[-1][2] is None:
+                raise FormatError("Unexpected ')'.")
+            t = stack.pop()
+        # A ',' only separates; the slots say where the next term goes.
+        if t is not None:
+            if not stack:
+                if result is not None:
+                    raise FormatError("Extra input after the term.")
+                result = t
+            elif stack[-1][0] == 'AP' and stack[-1][1] is None:
+                stack[-1][1] = t
+            elif stack[-1][2] is None:
+                stack[-1][2] = t
+            else:
+                raise FormatError("Too many subterms.")
+    if stack or result is None:
+        raise FormatError("Incomplete term.")
+    return result
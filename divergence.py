@@ -0,0 +1,262 @@
+import sys
+
+import parser
+import modules
+import reducer
+import monitor
+import equality
+
+#
+# Divergence detection for reductions.
+#
+# norReduce here reduces a term the way monitor.norReduce does, which
+# keeps its size and any limits on the reduction, and hands the term of
+# every sweep to a Detector. The detector remembers the last few terms
+# and their sizes, compares them by an alpha-invariant hash (see shape)
+# and raises Divergence when it sees one of two patterns:
+#
+#    cycle    the term is one it had a few sweeps before, up to the
+#             names of bound variables, as  (fn x => x x)(fn x => x x)
+#             is after one step. Sweeps are deterministic, so the
+#             reduction would go round for ever.
+#
+#    growth   the term holds the one p sweeps before it, under the same
+#             leading binders, and has the same number of nodes more
+#             than it as that one had, for several periods in a row,
+#             as in  Y f  which gives f (Y f), f (f (Y f)), ...  This
+#             is a pattern, not a proof: a context that kept a copy of
+#             the old term could still throw it away later. repeats
+#             sets how long the pattern must last before it is
+#             reported.
+#
+# Divergence carries the kind of pattern, the sweep and the step at
+# which it was found, and its period in sweeps.
+#
+#    python3 divergence.py <file> [--window N] [--repeats N] [--max-steps N]
+#
+#        reduces the program of the file, printing its normal form, or
+#        why the reduction was stopped
+#
+
+
+class Divergence(Exception):
+
+    def __init__(self, kind, sweep, steps, period, size, runs=1):
+        self.kind = kind        # 'cycle' or 'growth'
+        self.sweep = sweep      # the sweep at which it was found
+        self.steps = steps      # the steps taken by then
+        self.period = period    # in sweeps
+        self.size = size        # of the term then
+        self.runs = runs        # the periods the pattern lasted
+        if kind == 'cycle':
+            what = ("The term of sweep " + str(sweep) + " is that of sweep " + str(sweep - period) +
+                    " up to renaming")
+        else:
+            what = ("Each term from sweep " + str(sweep - (runs - 1) * period) + " to sweep " + str(sweep) +
+                    " holds the one " + str(period) + " sweep(s) before it, and is bigger (size " +
+                    str(size) + " now)")
+        Exception.__init__(self, what + "; stopped at step " + str(steps) + ".")
+
+
+def shape(t):
+    """
+    Returns (k, h, size, hashes) for t: the number of lambdas it starts
+    with, an alpha-invariant hash of the body under them, the number of
+    nodes of t and the set of the hashes of every subterm of the body.
+    A variable is hashed by its de Bruijn index, so a subterm that uses
+    the leading binders hashes the same wherever it sits in the body,
+    as long as no other binder lies between it and them.
+    """
+    k = 0           # the leading lambdas
+    inner = 0       # the lambdas of the body open at the node
+    body = False    # whether the walk is past the leading lambdas
+    n = 0           # nodes of the body
+    hashes = set()
+    out = []
+    for (label, x) in equality.walk(t):
+        if label == 'LM':
+            if body:
+                inner += 1
+            else:
+                k += 1
+            continue
+        body = True
+        if label == 'AP':
+            continue
+        elif label == 'lm':
+            if inner == 0:
+                # The body is done; the rest closes the leading lambdas.
+                break
+            inner -= 1
+            h = hash(('L', out.pop()))
+        elif label == 'ap':
+            h2 = out.pop()
+            h = hash(('A', out.pop(), h2))
+        elif label == 'IX':
+            h = hash(('V', x))
+        else:
+            h = hash(('F', x))
+        n += 1
+        hashes.add(h)
+        out.append(h)
+    return (k, out[0], k + n, hashes)
+
+
+def prefix(t, nodes=64):
+    """
+    Returns the de Bruijn code (see equality.deBruijn) of the first
+    nodes nodes of t, in prefix order: a quick check that two terms
+    may be equal up to renaming.
+    """
+    return equality.deBruijn(t, nodes)
+
+
+class Seen:
+    """
+    A term the Detector has seen, with what it has worked out about it.
+    """
+    __slots__ = ('term', 'size', 'runs', 'start', 'shape')
+
+    def __init__(self, term, size):
+        self.term = term
+        self.size = size
+        # period p -> (d, n): the size has gone up by d every p sweeps
+        # for the last n periods, up to this term.
+        self.runs = {}
+        self.start = None       # its prefix, once needed
+        self.shape = None       # its shape, once needed
+
+    def prefix(self):
+        if self.start is None:
+            self.start = prefix(self.term)
+        return self.start
+
+    def hashed(self):
+        if self.shape is None:
+            self.shape = shape(self.term)
+        return self.shape
+
+
+class Detector:
+    """
+    Watches the terms of a reduction, one per sweep, for the patterns
+    above. It remembers the last window terms, and reports growth once
+    it has lasted repeats periods, so the period of a growth it can see
+    is at most window / repeats sweeps. Terms are hashed (see shape)
+    only when their sizes allow a pattern: for a cycle, an earlier term
+    of the same size that starts the same way (see prefix); for growth,
+    a size going up by the same amount period after period.
+    """
+
+    def __init__(self, window=32, repeats=3):
+        self.window = window
+        self.repeats = repeats
+        self.recent = {}        # sweep -> Seen
+
+    def holds(self, sweep, before):
+        """
+        Whether the term of sweep holds the term of the sweep before,
+        under the same leading binders.
+        """
+        (k, h, size, hashes) = self.recent[sweep].hashed()
+        (oldK, oldH, oldSize, oldHashes) = self.recent[before].hashed()
+        return k == oldK and oldH in hashes
+
+    def check(self, t, sweep, steps=0, size=None):
+        """
+        Takes the term t of a sweep, with its size if known, raising
+        Divergence if it completes a pattern.
+        """
+        if size is None:
+            size = monitor.measure(t)[0]
+        seen = Seen(t, size)
+        self.recent[sweep] = seen
+        self.recent.pop(sweep - self.window - 1, None)
+        for before in range(max(0, sweep - self.window), sweep):
+            old = self.recent.get(before)
+            if old is None:
+                continue
+            period = sweep - before
+            if old.size == size:
+                if old.prefix() == seen.prefix() and equality.alphaEqual(old.term, t):
+                    raise Divergence('cycle', sweep, steps, period, size)
+            elif old.size < size:
+                (delta, run) = old.runs.get(period, (0, 0))
+                run = run + 1 if delta == size - old.size else 1
+                seen.runs[period] = (size - old.size, run)
+                if run >= self.repeats and sweep - self.repeats * period in self.recent:
+                    for j in range(self.repeats):
+                        if not self.holds(sweep - j * period, sweep - (j+1) * period):
+                            break
+                    else:
+                        raise Divergence('growth', sweep, steps, period, size, self.repeats)
+        # A shape holds a set as big as its term. Drop the older ones;
+        # they are worked out again if needed.
+        old = self.recent.get(sweep - self.window // self.repeats - 1)
+        if old is not None:
+            old.shape = None
+
+
+def norReduce(t, detector=None, watch=None):
+    """
+    Reduces t as reducer.norReduce does, with a monitor.Monitor, watch
+    (by default one without limits), keeping the size of the term and
+    any limits on the reduction, and a Detector, detector (by default a
+    new one), watching the term of each sweep. Returns the normal form
+    rendered. Raises Divergence if the detector finds a pattern, and
+    monitor.GrowthLimit if a limit is passed; watch.term then holds the
+    term reached, unrendered.
+    """
+    if detector is None:
+        detector = Detector()
+    if watch is None:
+        watch = monitor.Monitor()
+    names = reducer.Names()
+    (size, depth) = monitor.measure(t)
+    watch.term = t
+    watch.start(size, depth)
+    detector.check(t, 0, 0, size)
+    while reducer.isR(t):
+        try:
+            (t, size, depth) = monitor.reduce(t, watch, names)
+        finally:
+            watch.fresh = names.counter
+        watch.term = t
+        watch.swept(size, depth)
+        detector.check(t, watch.sweeps, watch.steps, size)
+    return reducer.render(t)
+
+
+def main(args):
+    window = 32
+    repeats = 3
+    maxSteps = None
+    files = []
+    i = 0
+    while i < len(args):
+        if args[i] == '--window':
+            window = int(args[i+1])
+            i += 2
+        elif args[i] == '--repeats':
+            repeats = int(args[i+1])
+            i += 2
+        elif args[i] == '--max-steps':
+            maxSteps = int(args[i+1])
+            i += 2
+        else:
+            files.append(args[i])
+            i += 1
+    if len(files) != 1:
+        print("usage: python3 divergence.py <file> [--window N] [--repeats N] [--max-steps N]")
+        return
+    t = reducer.buildTerm(parser.pruneFunctions(modules.load(files[0])))
+    try:
+        print(reducer.pretty(norReduce(t, Detector(window, repeats), monitor.Monitor(maxSteps=maxSteps))))
+    except (Divergence, monitor.GrowthLimit) as e:
+        print(e.args[0])
+    except RecursionError:
+        print("The term is too deep to reduce.")
+
+
+if __name__ == '__main__':
+    reducer.deep(main, sys.argv[1:])
@@ -0,0 +1,193 @@
+import sys
+import itertools
+
+import parser
+import modules
+import reducer
+
+#
+# Equality of terms.
+#
+# alphaEqual compares two terms up to the names of their bound
+# variables, in one pass over each: both are written in de Bruijn form
+# (see deBruijn) and the codes compared. The code is also a key for
+# caching normal forms. walk, which deBruijn is built on, gives the
+# nodes of a term with de Bruijn indices to the other modules that
+# need them.
+#
+# convertible decides whether two terms have the same normal form
+# without computing either unless they are equal. It brings both to
+# head normal form,
+#
+#    fn x1 => ... fn xn => h M1 ... Mk
+#
+# and compares n, the head h and k. Terms whose head normal forms
+# differ there are not equal, whatever their arguments reduce to, so
+# the answer is False at once. Otherwise the arguments are compared
+# the same way, pair by pair, and the first difference found anywhere
+# ends the comparison. Only when the terms are equal does this reduce
+# both all the way. A term without a normal form makes it run forever,
+# as norReduce does.
+#
+# With a multiprocessing pool, equal instead normalizes the two terms
+# at the same time, in two workers, and compares the normal forms.
+#
+#    python3 equality.py <file 1> <file 2>
+#
+#        says whether the main terms of the two programs are equal
+#
+
+# The codes of a lambda and of an application. Neither is a name.
+LAMBDA = '\\'
+APPLY = '@'
+
+# What walk yields on entering and on leaving an application.
+ENTER_AP = ('AP', None)
+LEAVE_AP = ('ap', None)
+
+# The codes of the nodes walk enters, but for variables.
+CODES = {'AP': APPLY, 'LM': LAMBDA}
+
+
+def walk(t):
+    """
+    Walks t in prefix order, yielding its nodes with de Bruijn indices
+    as pairs: ('LM', x) on entering a lambda that binds x and ('lm', x)
+    on leaving it, ('AP', None) on entering an application and ('ap',
+    None) once both its parts are walked, ('IX', i) for a variable
+    bound by the i-th lambda out from it (0 for the nearest) and ('VA',
+    x) for a free variable x. Prefix codes use the entries, bottom-up
+    builders the exits. Nothing past the last pair taken is walked.
+    """
+    levels = {}     # name -> the depths of the binders of it in scope
+    depth = 0
+    # Entries are terms, or the pair to yield on leaving one.
+    work = [t]
+    while work:
+        t = work.pop()
+        if type(t) == tuple:
+            if t[0] == 'lm':
+                levels[t[1]].pop()
+                depth -= 1
+            yield t
+            continue
+        label = t[0]
+        if label == 'AP':
+            yield ENTER_AP
+            work.append(LEAVE_AP)
+            work.append(t[2])
+            work.append(t[1])
+        elif label == 'LM':
+            yield ('LM', t[1])
+            levels.setdefault(t[1], []).append(depth)
+            depth += 1
+            work.append(('lm', t[1]))
+            work.append(t[2])
+        else:
+            bound = levels.get(t[1])
+            if bound:
+                yield ('IX', depth - bound[-1] - 1)
+            else:
+                yield ('VA', t[1])
+
+
+def deBruijn(t, nodes=None):
+    """
+    Returns the de Bruijn code of t as a tuple, in prefix order: LAMBDA
+    for a lambda, APPLY for an application, the number of lambdas
+    between a bound variable and its binder, and the name of a free
+    variable. Two terms have the same code if and only if they are
+    equal up to the names of bound variables. If nodes is given, only
+    the code of the first nodes nodes is made.
+    """
+    code = (CODES.get(label, x) for (label, x) in walk(t) if label != 'lm' and label != 'ap')
+    if nodes is not None:
+        code = itertools.islice(code, nodes)
+    return tuple(code)
+
+
+def alphaEqual(t1, t2):
+    """
+    Whether t1 and t2 are equal up to the names of bound variables.
+    """
+    return deBruijn(t1) == deBruijn(t2)
+
+
+def convertible(t1, t2, stats=None):
+    """
+    Whether t1 and t2 have the same normal form, comparing their head
+    normal forms from the top and stopping at the first difference.
+    If stats is a dictionary, stats['steps'] counts the reduction
+    steps taken on both sides.
+    """
+    names = reducer.Names()
+    # Entries are (term, env, term, env, depth): env maps the names of
+    # the binders in scope to their depth.
+    work = [(t1, {}, t2, {}, 0)]
+    while work:
+        (a, ea, b, eb, depth) = work.pop()
+        (xs, ha, argsA) = spine(reducer.headReduce(a, names, stats))
+        (ys, hb, argsB) = spine(reducer.headReduce(b, names, stats))
+        if len(xs) != len(ys) or len(argsA) != len(argsB):
+            return False
+        if xs:
+            ea = dict(ea)
+            eb = dict(eb)
+            for i in range(len(xs)):
+                ea[xs[i]] = depth + i
+                eb[ys[i]] = depth + i
+            depth += len(xs)
+        if ea.get(ha, ha) != eb.get(hb, hb):
+            return False
+        for i in range(len(argsA)-1, -1, -1):
+            work.append((argsA[i], ea, argsB[i], eb, depth))
+    return True
+
+
+def spine(t):
+    """
+    Splits a head normal form into its binders, its head variable and
+    its arguments, first argument first.
+    """
+    xs = []
+    while t[0] == 'LM':
+        xs.append(t[1])
+        t = t[2]
+    args = []
+    while t[0] == 'AP':
+        args.append(t[2])
+        t = t[1]
+    args.reverse()
+    return (xs, t[1], args)
+
+
+def _normalize(code):
+    # Runs in a worker of equal.
+    import parallel
+    return parallel.flatten(reducer.norReduce(parallel.unflatten(code)))
+
+
+def equal(t1, t2, stats=None, pool=None):
+    """
+    Whether t1 and t2 have the same normal form. Without a pool this
+    is convertible; with a multiprocessing pool both normal forms are
+    computed at the same time, one per worker, and compared.
+    """
+    if pool is None:
+        return convertible(t1, t2, stats)
+    # Imported here: it pulls in multiprocessing, which only a pool needs.
+    import parallel
+    (c1, c2) = pool.map(_normalize, [parallel.flatten(t1), parallel.flatten(t2)])
+    return alphaEqual(parallel.unflatten(c1), parallel.unflatten(c2))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("usage: python3 equality.py <file 1> <file 2>")
+    else:
+        (t1, t2) = [reducer.buildTerm(parser.pruneFunctions(modules.load(f))) for f in sys.argv[1:]]
+        stats = {}
+        if convertible(t1, t2, stats):
+            print("equal (" + str(stats.get('steps', 0)) + " steps)")
+        else:
+            print("different (" + str(stats.get('steps', 0)) + " steps)")
@@ -0,0 +1,213 @@
+import sys
+import time
+
+import parser
+import modules
+import reducer
+import equality
+
+#
+# Explicit substitution backend.
+#
+# replace in reducer.py substitutes into the whole body of a redex when
+# it is contracted, including parts that are thrown away later, such as
+# the branch of  true a b  or  false a b  that is not taken. Here a
+# substitution is never carried out on its own. A term is paired with
+# an environment, the substitution still to be made in it, and the two
+# travel together as a closure (λσ style, with de Bruijn indices):
+#
+#    (fn x => M) N          becomes   M with environment  N . env
+#    (M N) with env         becomes   M with env, applied to N with env
+#    the variable i, env    becomes   the i-th closure of env
+#
+# The environment only reaches a part of the term when that part is
+# looked at: by the machine in whnf when the part is at the head of the
+# term, or by norReduce when it reads the normal form back, going under
+# lambdas and into the arguments of a head variable. A closure that is
+# never looked at is dropped as it stands.
+#
+# Closures are Thunks. The first time one is brought to weak head normal
+# form the result is kept in it, so an argument used many times is
+# reduced once (call by need). Reading back goes leftmost outermost, so
+# norReduce finds a normal form whenever reducer.norReduce does.
+#
+#    python3 explicit.py <file>     prints the normal form of a program
+#                                   and the counts of its reduction
+#
+
+#
+# Terms are compiled into tuples:
+#
+#    ('V', i)          the variable bound by the i-th lambda out (from 0)
+#    ('F', x)          the free variable x
+#    ('L', body, x)    a lambda; x is the name it had, for reading back
+#    ('A', t1, t2)     an application
+#
+# Weak head normal forms are:
+#
+#    ('clo', L, env)        the lambda L (an 'L' tuple) under env
+#    ('neu', h, args)       the variable h applied to the Thunks args,
+#                           first argument first
+#
+# An environment is None or a pair (Thunk, environment), innermost
+# binder first.
+#
+
+
+class Thunk:
+    __slots__ = ('term', 'env', 'value', 'normal')
+
+    def __init__(self, term, env, value=None):
+        self.term = term
+        self.env = env
+        self.value = value      # its weak head normal form, once known
+        self.normal = None      # its normal form, once read back
+
+
+def compile(t):
+    """
+    Compiles a term in the nested list form into tuples with de Bruijn
+    indices.
+    """
+    out = []
+    for (label, x) in equality.walk(t):
+        if label == 'IX':
+            out.append(('V', x))
+        elif label == 'VA':
+            out.append(('F', x))
+        elif label == 'lm':
+            out.append(('L', out.pop(), x))
+        elif label == 'ap':
+            t2 = out.pop()
+            out.append(('A', out.pop(), t2))
+    return out[0]
+
+
+def whnf(thunk, stats=None):
+    """
+    Brings a Thunk to weak head normal form and returns the form, with
+    a machine that holds the arguments met on the way to the head on a
+    stack. Every Thunk entered on the way is given its form too, when
+    the machine reaches it.
+    """
+    if thunk.value is not None:
+        return thunk.value
+    term = thunk.term
+    env = thunk.env
+    stack = []      # arguments, the first one on top
+    marks = [(thunk, 0)]    # Thunks being evaluated, with the stack height then
+    steps = 0
+    forced = 0
+    while True:
+        label = term[0]
+        if label == 'A':
+            stack.append(Thunk(term[2], env))
+            term = term[1]
+            continue
+        if label == 'L':
+            while marks and marks[-1][1] == len(stack):
+                marks.pop()[0].value = ('clo', term, env)
+            if not stack:
+                value = ('clo', term, env)
+                break
+            # A beta step: the argument goes into the environment.
+            steps += 1
+            env = (stack.pop(), env)
+            term = term[1]
+            continue
+        if label == 'V':
+            for i in range(term[1]):
+                env = env[1]
+            th = env[0]
+            v = th.value
+            if v is None:
+                forced += 1
+                marks.append((th, len(stack)))
+                term = th.term
+                env = th.env
+                continue
+            if v[0] == 'clo':
+                term = v[1]
+                env = v[2]
+                continue
+            (head, args) = (v[1], v[2])
+        else:
+            (head, args) = (term[1], [])
+        # A variable at the head: every Thunk still open is that
+        # variable applied to the arguments above its mark.
+        while marks:
+            (th, h) = marks.pop()
+            th.value = ('neu', head, args + stack[h:][::-1])
+        value = ('neu', head, args + stack[::-1])
+        break
+    if stats is not None:
+        stats['steps'] = stats.get('steps', 0) + steps
+        stats['forced'] = stats.get('forced', 0) + forced
+    return value
+
+
+def readBack(thunk, names, stats=None):
+    """
+    Returns the normal form of a Thunk in the nested list form, with
+    tagged variables from names for the binders it goes under.
+    """
+    root = [None]
+    # Entries are (Thunk, the list to put its normal form in, index).
+    work = [(thunk, root, 0)]
+    while work:
+        (th, parent, i) = work.pop()
+        if th.normal is not None:
+            parent[i] = th.normal
+            if stats is not None:
+                stats['shared'] = stats.get('shared', 0) + 1
+            continue
+        v = whnf(th, stats)
+        if v[0] == 'clo':
+            lam = v[1]
+            x = names.fresh(lam[2])
+            node = ['LM', x, None]
+            body = Thunk(lam[1], (Thunk(None, None, ('neu', x, [])), v[2]))
+            work.append((body, node, 2))
+        else:
+            node = ['VA', v[1]]
+            for a in v[2]:
+                node = ['AP', node, None]
+                work.append((a, node, 2))
+        th.normal = node
+        parent[i] = node
+    return root[0]
+
+
+def norReduce(t, stats=None):
+    """
+    Reduces t to normal form through explicit substitutions and returns
+    the normal form rendered. If stats is a dictionary it receives the
+    beta steps taken ('steps'), the closures brought to weak head normal
+    form ('forced'), the normal forms of closures used more than once
+    ('shared') and the time taken ('seconds').
+    """
+    start = time.perf_counter()
+    names = reducer.Names()
+    nf = readBack(Thunk(compile(t), None), names, stats)
+    if stats is not None:
+        stats['seconds'] = time.perf_counter() - start
+    return reducer.render(nf)
+
+
+def main(args):
+    if len(args) != 1:
+        print("usage: python3 explicit.py <file>")
+        return
+    t = reducer.buildTerm(parser.pruneFunctions(modules.load(args[0])))
+    stats = {}
+    try:
+        print(reducer.pretty(norReduce(t, stats)))
+    except RecursionError:
+        print("The term is too deep to reduce.")
+        return
+    print("steps " + str(stats.get('steps', 0)) + ", forced " + str(stats.get('forced', 0)) +
+          ", shared " + str(stats.get('shared', 0)) + ", " + "%.4f" % stats['seconds'] + " sec")
+
+
+if __name__ == '__main__':
+    reducer.deep(main, sys.argv[1:])
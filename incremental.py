@@ -0,0 +1,233 @@
+import os
+import sys
+import time
+
+import parser
+import modules
+import reducer
+
+#
+# Incremental evaluation of .lc programs.
+#
+# A Program keeps, for each  name := term;  statement of a file, its
+# source text, its parsed term, the definitions it refers to and, once
+# computed, its normal form. When the file is edited, update() splits
+# the new source into statements again and only the statements whose
+# text changed are lexed and parsed. The cached normal forms of those
+# definitions, and of every definition that depends on them directly
+# or through others, are dropped; everything else is kept.
+#
+# The normal form of a definition is computed from the normal forms of
+# the definitions it refers to, each bound around it by a redex, the
+# way buildMain binds them around main. This gives the same result as
+# reducing the whole program, except that a definition without a normal
+# form is reduced (forever) even if it would be discarded unused.
+#
+#    python3 incremental.py <file>      watches the file and prints the
+#                                       normal form of main after each
+#                                       change
+#
+
+
+def splitStatements(src):
+    """
+    Splits source text into statements, each ending with its ';'.
+    A ';' inside a string literal or a (* *) comment does not end a
+    statement. Trailing text without a ';' is kept as a last statement
+    so that the parser can report it.
+    """
+    statements = []
+    start = 0
+    i = 0
+    n = len(src)
+    while i < n:
+        c = src[i]
+        if c == '"':
+            i += 1
+            while i < n and src[i] != '"':
+                if src[i] == '\\':
+                    i += 1
+                i += 1
+        elif src.startswith('(*', i):
+            end = src.find('*)', i+2)
+            i = n if end < 0 else end + 1
+        elif c == ';':
+            statements.append(src[start:i+1])
+            start = i + 1
+        i += 1
+    if src[start:].strip() != '':
+        statements.append(src[start:])
+    return statements
+
+
+def parseStatement(text, filename="STDIN"):
+    """
+    Lexes and parses one  name := term;  statement, returning the
+    name and the term in the list form of reducer.py.
+    """
+    functions = []
+    tks = parser.TokenStream(text, filename)
+    parser.parseTerm(tks, functions)
+    tks.checkEOF()
+    if len(functions) != 1:
+        raise parser.ParseError("Expected one definition in '" + text.strip() + "'.")
+    (name, term) = functions[0]
+    return (name, reducer.fromParser(term))
+
+
+class Program:
+
+    def __init__(self, filename="STDIN"):
+        """
+        Builds an empty program. Load source into it with update().
+        """
+        self.filename = filename
+        self.texts = []      # the statement texts, in order
+        self.names = []      # the name each statement defines
+        self.terms = {}      # name -> parsed term
+        self.sources = {}    # name -> statement text it was parsed from
+        self.deps = {}       # name -> names of earlier definitions it uses
+        self.normal = {}     # name -> cached normal form, unrendered
+        self.parses = 0
+        # One supply for every reduction, so the fresh variables of a
+        # cached normal form never meet equal ones made later.
+        self.fresh = reducer.Names()
+
+    def update(self, src):
+        """
+        Replaces the program's source. Returns the set of definitions
+        whose cached normal form was dropped.
+        """
+        texts = [s.strip() for s in splitStatements(src)]
+        parsed = {}
+        for name in self.names:
+            parsed[self.sources[name]] = name
+        names = []
+        terms = {}
+        sources = {}
+        changed = set()
+        for text in texts:
+            name = parsed.get(text)
+            if name is None:
+                (name, term) = parseStatement(text, self.filename)
+                self.parses += 1
+                changed.add(name)
+            else:
+                term = self.terms[name]
+            if name in terms:
+                raise parser.ParseError("Definition of '" + name + "' is repeated.")
+            names.append(name)
+            terms[name] = term
+            sources[name] = text
+
+        # A definition also changes when it moves past one it uses or
+        # is removed, since that changes what its names refer to.
+        deps = {}
+        defined = set()
+        for name in names:
+            deps[name] = reducer.freeVars(terms[name]) & defined
+            if name not in self.deps or deps[name] != self.deps[name]:
+                changed.add(name)
+            defined.add(name)
+
+        self.texts = texts
+        self.names = names
+        self.terms = terms
+        self.sources = sources
+        self.deps = deps
+        return self.invalidate(changed)
+
+    def invalidate(self, changed):
+        """
+        Drops the normal forms of the given definitions and of all
+        definitions that depend on them. Returns the dropped names.
+        """
+        users = {}
+        for name in self.names:
+            for d in self.deps[name]:
+                users.setdefault(d, []).append(name)
+        dropped = set()
+        todo = list(changed)
+        while todo:
+            name = todo.pop()
+            if name in dropped:
+                continue
+            dropped.add(name)
+            todo.extend(users.get(name, []))
+        for name in list(self.normal):
+            if name in dropped or name not in self.terms:
+                del self.normal[name]
+        return dropped
+
+    def normalForm(self, name='main', stats=None):
+        """
+        Returns the normal form of a definition, rendered, reducing
+        only what is not cached. If stats is a dictionary, the steps and
+        sweeps of every reduction done are added to it, and 'reductions'
+        counts the definitions that had to be reduced. Raises
+        modules.ModuleError if the program has no definition of name.
+        """
+        if name not in self.terms:
+            raise modules.ModuleError("The program has no definition of '" + name + "'.")
+        # Reduce the dependencies first, in program order, without
+        # recursing once per definition.
+        needed = set()
+        todo = [name]
+        while todo:
+            x = todo.pop()
+            if x in needed or x in self.normal:
+                continue
+            needed.add(x)
+            todo.extend(self.deps[x])
+        for x in self.names:
+            if x in needed:
+                t = self.terms[x]
+                for d in self.deps[x]:
+                    t = ['AP', ['LM', d, t], self.normal[d]]
+                if stats is not None:
+                    stats['reductions'] = stats.get('reductions', 0) + 1
+                # Cached normal forms are kept unrendered: rendering them
+                # here would rename them again each time they are used.
+                while reducer.isR(t):
+                    if stats is not None:
+                        stats['sweeps'] = stats.get('sweeps', 0) + 1
+                    t = reducer.reduce(t, stats, None, self.fresh)
+                self.normal[x] = t
+        return reducer.render(self.normal[name])
+
+
+def watch(fname, interval=0.5):
+    """
+    Prints the normal form of main of a file, and again every time the
+    file changes.
+    """
+    program = Program(fname)
+    mtime = None
+    while True:
+        m = os.path.getmtime(fname)
+        if m != mtime:
+            mtime = m
+            f = open(fname, "r")
+            src = f.read()
+            f.close()
+            try:
+                start = time.perf_counter()
+                dropped = program.update(src)
+                stats = {}
+                value = program.normalForm('main', stats)
+                elapsed = time.perf_counter() - start
+                print("[" + fname + ": " + str(len(dropped)) + " changed, " + str(stats.get('reductions', 0)) + " reduced, " + "%.3f" % elapsed + "s]")
+                print(reducer.pretty(value))
+            except (parser.SyntaxError, parser.ParseError, parser.LexError) as e:
+                print("Syntax error during parse.")
+                print(e.args[0])
+            except modules.ModuleError as e:
+                print(e.args[0])
+        time.sleep(interval)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("usage: python3 incremental.py <file>")
+    else:
+        watch(sys.argv[1])
@@ -0,0 +1,579 @@
+import io
+import os
+import array
+
+#
+# The lexical analyzer of parser.py: TokenStream turns source text into
+# tokens, and the parser eats them. It lives in a module of its own so
+# that tools which only need tokens do not load the parser, and
+# importing it does nothing but define names.
+#
+
+#
+# Exceptions
+#
+# These are raised by the token stream, while lexing and while the
+# parser eats tokens. parser.py exports them too.
+#
+class ParseError(Exception):
+    pass
+
+class SyntaxError(Exception):
+    pass
+
+class LexError(Exception):
+    pass
+
+
+#
+# Keywords, primitives, unary operations, and binary operations.
+#
+# The code below defines several strings or string lists used by
+# the lexical analyzer (housed as class TokenStream, below).
+#
+
+RESERVED = ['fn', 'import', ':=',')']
+
+# Characters that separate expressions.
+DELIMITERS = '();'
+
+# Characters that make up unary and binary operations.
+OPERATORS = ':=>'
+
+# Token kinds. The lexer records the kind of each token once, when it
+# issues it, so that the parser can classify the next token without
+# looking at its characters.
+(TK_NAME, TK_RESERVED, TK_DELIMITER, TK_OPERATOR, TK_INT, TK_STRING, TK_EOF) = range(7)
+
+
+#
+# LEXICAL ANALYSIS / TOKENIZER
+#
+# The code below converts ML source code text into a sequence
+# of tokens (a list of strings).  It does so by defining the
+#
+#    class TokenStream
+#
+# which describes the methods of an object that supports this
+# lexical conversion.  The key method is "analyze" which provides
+# the conversion.  It is the lexical analyzer for ML source code.
+#
+# The lexical analyzer works by CHOMP methods that processes the
+# individual characters of the source code's string, packaging
+# them into a list of token strings.
+#
+# The class also provides a series of methods that can be used
+# to consume (or EAT) the tokens of the token stream.  These are
+# used by the parser.
+#
+
+
+class TokenStream:
+
+    def __init__(self,src,filename="STDIN",line=1,column=1):
+        """
+        Builds a new TokenStream object from a source code string,
+        which starts at the given line and column of its file.
+        """
+        self.sourcename = filename
+        self.source = src # The char sequence that gets 'chomped' by the lexical analyzer.
+        self.tokens = []  # The list of tokens constructed by the lexical analyzer.
+        self.extents = []
+        # The kind, line and column of each token, parallel to tokens.
+        self.kinds = array.array('B')
+        self.lines = array.array('I')
+        self.columns = array.array('I')
+        self.pos = 0      # The position of the unchomped token at the front.
+
+        # Sets up and then runs the lexical analyzer.
+        self.initIssue(line,column)
+        self.analyze()
+        self.issue("eof", TK_EOF)
+
+    #
+    # PARSING helper functions
+    #
+
+    def lexassert(self,c):
+        if not c:
+            self.raiseLex("Unrecognized character.")
+
+    def raiseLex(self,msg):
+        s = self.sourcename + " line "+str(self.line)+" column "+str(self.column)
+        s += ": " + msg
+        raise LexError(s)
+
+    def next(self):
+        """
+        Returns the unchomped token at the front of the stream of tokens.
+        """
+        return self.tokens[self.pos]
+
+    def numTokens(self):
+        return len(self.tokens) - self.pos
+
+    def advance(self):
+        """
+        Advances the token stream to the next token, giving back the
+        one at the front.
+        """
+        tk = self.tokens[self.pos]
+        self.pos += 1
+        return tk
+
+    def report(self):
+        """
+        Helper function used to report the location of errors in the
+        source code.
+        """
+        lnum = self.lines[self.pos]
+        cnum = self.columns[self.pos]
+        return self.sourcename + " line "+str(lnum)+" column "+str(cnum)
+
+    def eat(self,tk):
+        """
+        Eats a specified token, making sure that it is the next token
+        in the stream.
+        """
+        if tk == self.next():
+            return self.advance()
+        else:
+            where = self.report()
+            err1 = "Unexpected token. "
+            err2 = "Saw: '"+self.next()+"'. "
+            err3 = "Expected: '"+tk+"'. "
+            raise SyntaxError(err1 + err2 + err3)
+
+
+    def eatName(self):
+        """
+        Eats a name token, making sure that such a token is next in the stream.
+        """
+        if self.nextIsName():
+            return self.advance()
+        else:
+            where = self.report()
+            err1 = "Unexpected token. "
+            err2 = "Saw: '"+self.next()+"'. "
+            err3 = "Expected a name. "
+            raise SyntaxError(err1 + err2 + err3)
+
+
+    def checkEOF(self):
+        """
+        Checks that every token has been consumed.
+        """
+        if self.nextKind() != TK_EOF:
+            raise ParseError("Parsing failed to consume tokens "+str(self.tokens[self.pos:-1])+".")
+
+
+    def nextIsName(self):
+        """
+        Checks if next token is a name.
+        """
+        return self.kinds[self.pos] == TK_NAME
+
+    def nextKind(self):
+        """
+        Returns the kind (TK_NAME, TK_STRING, ...) of the next token.
+        """
+        return self.kinds[self.pos]
+
+
+    #
+    # TOKENIZER helper functions
+    #
+    # These are used by the 'analysis' method defined below them.
+    #
+    # The parsing functions EAT the token stream, whereas
+    # the lexcial analysis functions CHOMP the source text
+    # and ISSUE the individual tokens that form the stream.
+    #
+
+    def initIssue(self,line=1,column=1):
+        self.line = line
+        self.column = column
+        self.markIssue()
+
+    def markIssue(self):
+        self.mark = (self.line,self.column)
+
+    def issue(self,token,kind):
+        self.tokens.append(token)
+        self.kinds.append(kind)
+        self.lines.append(self.mark[0])
+        self.columns.append(self.mark[1])
+        self.markIssue()
+
+    def nxt(self,lookahead=1):
+        if len(self.source) == 0:
+            return ''
+        else:
+            return self.source[lookahead-1]
+
+    def chompSelector(self):
+        self.lexassert(self.nxt() == '#' and self.nxt(2).isdigit())
+        token = self.chompChar()
+        token = '#'
+        while self.nxt().isdigit():
+            token += self.chompChar()
+        self.issue(token, TK_OPERATOR)
+
+    def chompWord(self):
+        self.lexassert(self.nxt().isalpha() or self.nxt() == '_')
+        token = self.chompChar()
+        while self.nxt().isalnum() or self.nxt() == '_':
+            token += self.chompChar()
+        if token in RESERVED:
+            self.issue(token, TK_RESERVED)
+        else:
+            self.issue(token, TK_NAME)
+        
+    def chompInt(self):
+        ck = self.nxt().isdigit()
+        self.lexassert(ck)
+        token = ""
+        token += self.chompChar()     # first digit
+        while self.nxt().isdigit():
+            token += self.chompChar() # remaining digits=
+        self.issue(token, TK_INT)
+        
+    def chompString(self):
+        self.lexassert(self.nxt() == '"')
+        self.chompChar() # eat quote
+        token = ""
+        while self.nxt() != '' and self.nxt() != '"':
+            if self.nxt() == '\\':
+                self.chompChar()
+                if self.nxt() == '\n':
+                    self.chompWhitespace(True)
+                elif self.nxt() == '\\':
+                    token += self.chompChar()
+                elif self.nxt() == 'n':
+                    self.chompChar()
+                    token += '\n'
+                elif self.nxt() == 't':
+                    self.chompChar()
+                    token += '\t'
+                elif self.nxt() == '"':
+                    self.chompChar()
+                    token += '"'
+                else:
+                    self.raiseLex("Bad string escape character")
+            elif self.nxt() == '\n':
+                self.raiseLex("End of line encountered within string")
+            elif self.nxt() == '\t':
+                self.raiseLex("Tab encountered within string")
+            else:
+                token += self.chompChar()
+
+        if self.nxt() == '':
+            self.raiseLex("EOF encountered within string")
+        else:
+            self.chompChar() # eat endquote
+            self.issue('"'+token+'"', TK_STRING)
+
+    def chompComment(self):
+        self.lexassert(len(self.source)>1 and self.source[0:2] == '(*')
+        self.chompChar() # eat (*
+        self.chompChar() #
+        while len(self.source) >= 2 and self.source[0:2] != '*)':
+            self.chomp()
+        if len(self.source) < 2:
+            self.raiseLex("EOF encountered within comment")
+        else:
+            self.chompChar() # eat *)
+            self.chompChar() #
+            self.markIssue()
+
+    def chomp(self):
+        if self.nxt() in "\n\t\r ":
+            self.chompWhitespace()
+        else:
+            self.chompChar()
+
+    def chompChar(self):
+        self.lexassert(len(self.source) > 0)
+        c = self.source[0]
+        self.source = self.source[1:]
+        self.column += 1
+        return c
+
+    def chompWhitespace(self,withinToken=False):
+        self.lexassert(len(self.source) > 0)
+        c = self.source[0]
+        self.source = self.source[1:]
+        if c == ' ':
+            self.column += 1
+        elif c == '\t':
+            self.column += 4
+        elif c == '\n':
+            self.line += 1
+            self.column = 1
+        if not withinToken:
+            self.markIssue()
+        
+    def chompOperator(self):
+        token = ''
+        while self.nxt() in OPERATORS:
+            token += self.chompChar()
+        self.issue(token, TK_OPERATOR)
+
+    #
+    # TOKENIZER
+    #
+    # This method defines the main loop of the
+    # lexical analysis algorithm, one that converts
+    # the source text into a list of token strings.
+
+    def analyze(self):
+        while self.source != '':
+            # CHOMP a string literal
+            if self.source[0] == '"':
+                self.chompString()
+            # CHOMP a comment
+            elif self.source[0:2] == '(*':
+                self.chompComment()
+            # CHOMP whitespace
+            elif self.source[0] in ' \t\n\r':
+                self.chompWhitespace()
+            # CHOMP an integer literal
+            elif self.source[0].isdigit():
+                self.chompInt()
+            # CHOMP a single "delimiter" character
+            elif self.source[0] in DELIMITERS:
+                self.issue(self.chompChar(), TK_DELIMITER)
+            # CHOMP an operator
+            elif self.source[0] in OPERATORS:
+                self.chompOperator()
+            # CHOMP a reserved word or a name.
+            else:
+                self.chompWord()
+
+
+#
+# A FASTER TOKENIZER
+#
+# RegexTokenStream gives the same tokens, kinds, lines and columns as
+# TokenStream, but finds them with one compiled pattern, SOURCE, whose
+# named groups are the kinds of token, so that the characters of a
+# token are scanned by the re module rather than chomped one at a time.
+# The line and column of each token are worked out from the text of
+# the matches before it, counting as chompWhitespace does: a tab is
+# four columns and a carriage return none.
+#
+# Anything the pattern does not lex cleanly (a bad character, an open
+# string or comment) matches the group bad, and TokenStream.analyze
+# takes over from there, so errors are reported exactly as before. An
+# operator at the very end of the text is one such error, since
+# chompOperator reads past the end looking for more of it. Source text
+# that is not ASCII goes to TokenStream.analyze from the start, since
+# isalpha and isdigit accept letters and digits that the pattern does
+# not.
+#
+# The pattern is compiled on first use (see patterns): importing re
+# costs more at start-up than lexing a small file the slow way.
+MASTER = None
+ESCAPE = None
+
+SOURCE = r"""
+    (?P<space>   [ \t\n\r]+ )
+  | (?P<comment> \(\*.*?\*\) )
+  | (?P<string>  "(?:[^"\\\n\t]|\\[\\nt"\n])*" )
+  | (?P<int>     [0-9]+ )
+  | (?P<word>    [A-Za-z_][A-Za-z0-9_]* )
+  | (?P<op>      [:=>]+ (?![:=>]|\Z) )
+  | (?P<delim>   \((?!\*) | [);] )
+  | (?P<bad>     \(\* | " | . )
+"""
+
+ESCAPES = {'\n': '', '\\': '\\', 'n': '\n', 't': '\t', '"': '"'}
+
+
+def patterns():
+    global MASTER, ESCAPE
+    if MASTER is None:
+        import re
+        MASTER = re.compile(SOURCE, re.VERBOSE | re.DOTALL)
+        ESCAPE = re.compile(r"\\(.)", re.DOTALL)
+    return (MASTER, ESCAPE)
+
+
+def scan(src, line, column, tokens, kinds, lines, columns):
+    """
+    Lexes the ASCII text src, which starts at the given line and column,
+    with the master pattern, appending each token and its kind, line
+    and column to the four lists. Stops at the end of src or at the
+    first match of the group bad. Returns (stop, line, column, last):
+    the offset where it stopped and the line and column there, and for
+    the last ';' token, None if there is none, the offset just past it,
+    the line and column there and the number of tokens up to it.
+    """
+    (master, escape) = patterns()
+    last = None
+    for m in master.finditer(src):
+        group = m.lastgroup
+        text = m.group()
+        if group == 'space' or group == 'comment':
+            n = text.count('\n')
+            if n:
+                line += n
+                text = text[text.rindex('\n')+1:]
+                column = 1
+            column += len(text) + 3 * text.count('\t') - text.count('\r')
+            continue
+        if group == 'bad':
+            return (m.start(), line, column, last)
+        tokens.append(text)
+        lines.append(line)
+        columns.append(column)
+        if group == 'word':
+            kinds.append(TK_RESERVED if text in RESERVED else TK_NAME)
+        elif group == 'string':
+            kinds.append(TK_STRING)
+            if '\\' in text:
+                tokens[-1] = '"' + escape.sub(lambda e: ESCAPES[e.group(1)], text[1:-1]) + '"'
+                if '\n' in text:
+                    # An escaped newline: the string goes on on the next line.
+                    line += text.count('\n')
+                    column = len(text) - text.rindex('\n')
+                    continue
+        elif group == 'int':
+            kinds.append(TK_INT)
+        elif group == 'op':
+            kinds.append(TK_OPERATOR)
+        else:
+            kinds.append(TK_DELIMITER)
+            if text == ';':
+                last = (m.end(), line, column + 1, len(tokens))
+        column += len(text)
+    return (len(src), line, column, last)
+
+
+class RegexTokenStream(TokenStream):
+
+    def analyze(self):
+        src = self.source
+        if not src.isascii():
+            return TokenStream.analyze(self)
+        (stop, self.line, self.column, last) = scan(src, self.line, self.column, self.tokens, self.kinds, self.lines, self.columns)
+        self.source = src[stop:]
+        self.markIssue()
+        if self.source != '':
+            TokenStream.analyze(self)
+
+
+#
+# STREAMING
+#
+# lexChunks lexes a program whose text arrives in pieces, from
+# readChunks (a file object, such as a pipe) or mapChunks (a file
+# mapped into memory), and yields a token stream for each run of whole
+# statements as soon as the ';' that ends the run has arrived. Only the
+# text after the last ';' seen so far is kept between pieces, so the
+# whole source and the whole token list never exist at once. The
+# tokens, lines and columns are those that TokenStream gives for the
+# whole text. Errors are raised as TokenStream raises them, but only
+# when the run that holds them is reached, so a syntax error in an
+# earlier statement is reported before a bad character in a later one.
+#
+# Text that is not ASCII turns streaming off: the rest of the source is
+# gathered and lexed at the end, by RegexTokenStream.
+#
+
+# The number of characters read at a time.
+CHUNK = 1 << 16
+
+
+def readChunks(f, size=CHUNK):
+    """
+    Yields the text of an open file object size characters at a time.
+    """
+    while True:
+        s = f.read(size)
+        if not s:
+            return
+        yield s
+
+
+def mapChunks(path, size=CHUNK):
+    """
+    Yields the text of a UTF-8 file, mapped into memory, size bytes at
+    a time, with line endings read as open(path, "r") reads them.
+    """
+    import mmap
+    import codecs
+    f = open(path, "rb")
+    try:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), True)
+            for i in range(0, len(m), size):
+                s = decoder.decode(m[i:i+size])
+                if s:
+                    yield s
+            s = decoder.decode(b'', True)
+            if s:
+                yield s
+        finally:
+            m.close()
+    finally:
+        f.close()
+
+
+class TokenList(TokenStream):
+
+    def __init__(self,tokens,kinds,lines,columns,line,column,filename="STDIN"):
+        """
+        Builds a TokenStream over tokens that are already lexed, with
+        their kinds, lines and columns. The eof token is put at the
+        given line and column.
+        """
+        self.sourcename = filename
+        self.source = ''
+        self.tokens = tokens
+        self.extents = []
+        self.kinds = kinds
+        self.lines = lines
+        self.columns = columns
+        self.pos = 0
+        self.initIssue(line,column)
+        self.issue("eof", TK_EOF)
+
+
+def lexChunks(chunks, filename="STDIN"):
+    """
+    Yields a TokenStream for each run of whole statements in the text
+    made of chunks, and one for whatever follows the last ';'.
+    """
+    line = 1
+    column = 1
+    rest = ''
+    streaming = True
+    for chunk in chunks:
+        if not streaming or ';' not in chunk:
+            rest += chunk
+            continue
+        src = rest + chunk
+        if not src.isascii():
+            streaming = False
+            rest = src
+            continue
+        tokens = []
+        kinds = array.array('B')
+        lines = array.array('I')
+        columns = array.array('I')
+        last = scan(src, line, column, tokens, kinds, lines, columns)[3]
+        if last is None:
+            rest = src
+            continue
+        (end, line, column, n) = last
+        del tokens[n:]
+        del kinds[n:]
+        del lines[n:]
+        del columns[n:]
+        yield TokenList(tokens, kinds, lines, columns, line, column, filename)
+        rest = src[end:]
+    yield RegexTokenStream(rest, filename, line, column)
@@ -0,0 +1,149 @@
+import os
+import sys
+
+import parser
+
+#
+# Programs spread over several files.
+#
+# A file pulls in the definitions of another with an import statement:
+#
+#    import "prelude.lc";
+#    main := pred two;
+#
+# The path is relative to the directory of the importing file. The
+# program of a file is the definitions of everything it imports,
+# directly or not, followed by its own; each file comes once, after
+# the files it imports, in the order of the import statements. All the
+# files of a program share one set of names, so a name defined in two
+# of them is an error. pruneFunctions then drops what main does not use.
+#
+# A Loader lexes and parses each file once, and keeps the result under
+# its absolute path together with the file's modification time. Loading
+# a program again only parses the files that changed since.
+#
+#    python3 modules.py <file>     prints the definitions of a program,
+#                                  one per line, with the file of each
+#
+
+
+class ModuleError(Exception):
+    pass
+
+
+# Files at least this long are mapped into memory and parsed as they
+# are lexed, a piece at a time (see parser.streamDefinitions), with the
+# master pattern of RegexTokenStream. For smaller ones, importing re
+# takes longer than TokenStream does.
+FAST_LEX = 8192
+
+
+class Module:
+
+    def __init__(self, path, mtime, functions, imports):
+        self.path = path            # absolute path of the file
+        self.mtime = mtime          # its modification time when parsed
+        self.functions = functions  # its own (name, term) definitions
+        self.imports = imports      # absolute paths of the files it imports
+
+
+class Loader:
+
+    def __init__(self):
+        self.modules = {}    # absolute path -> Module
+        self.parses = 0
+
+    def module(self, path):
+        """
+        Returns the parsed Module of a file, parsing it only if it is
+        not cached or changed on disk since.
+        """
+        path = os.path.abspath(path)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            raise ModuleError("Cannot open '" + path + "'.")
+        m = self.modules.get(path)
+        if m is not None and m.mtime == mtime:
+            return m
+        functions = []
+        imports = []
+        if os.path.getsize(path) >= FAST_LEX:
+            functions.extend(parser.streamDefinitions(parser.mapChunks(path), path, imports))
+        else:
+            f = open(path, "r")
+            src = f.read()
+            f.close()
+            tks = parser.TokenStream(src, filename=path)
+            parser.parseTerm(tks, functions, imports)
+            tks.checkEOF()
+        here = os.path.dirname(path)
+        imports = [os.path.abspath(os.path.join(here, p)) for p in imports]
+        m = Module(path, mtime, functions, imports)
+        self.modules[path] = m
+        self.parses += 1
+        return m
+
+    def modulesOf(self, path):
+        """
+        Returns the Modules of the program of a file, each after the
+        ones it imports, the file itself last.
+        """
+        order = []
+        done = set()
+        # Files whose imports are being visited, and the position of the
+        # next import to visit in each.
+        stack = [(self.module(path), 0)]
+        open_ = [stack[0][0].path]
+        while stack:
+            (m, i) = stack.pop()
+            if i == len(m.imports):
+                open_.pop()
+                done.add(m.path)
+                order.append(m)
+                continue
+            stack.append((m, i + 1))
+            p = m.imports[i]
+            if p in done:
+                continue
+            if p in open_:
+                cycle = open_[open_.index(p):] + [p]
+                raise ModuleError("Import cycle: " + " -> ".join(cycle) + ".")
+            stack.append((self.module(p), 0))
+            open_.append(p)
+        return order
+
+    def load(self, path):
+        """
+        Returns the (name, term) definitions of the program of a file.
+        """
+        functions = []
+        table = {}
+        for m in self.modulesOf(path):
+            for (x, e) in m.functions:
+                if x in table and table[x] != m.path:
+                    raise ModuleError("'" + x + "' is defined in both " + table[x] + " and " + m.path + ".")
+                table[x] = m.path
+                functions.append((x, e))
+        return functions
+
+
+LOADER = Loader()
+
+
+def load(path):
+    """
+    Returns the definitions of the program of a file, using the
+    process-wide cache of parsed files.
+    """
+    return LOADER.load(path)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("usage: python3 modules.py <file>")
+    else:
+        loader = Loader()
+        for m in loader.modulesOf(sys.argv[1]):
+            for (x, e) in m.functions:
+                print(x + " := " + parser.toString(e) + "   (" + os.path.relpath(m.path) + ")")
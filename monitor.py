@@ -0,0 +1,247 @@
+import sys
+import json
+
+import parser
+import modules
+import reducer
+
+#
+# Growth monitoring for reductions.
+#
+# norReduce here reduces a term the way reducer.norReduce does, while
+# a Monitor keeps the size (number of nodes) and the depth of the term
+# up to date. Nothing walks the whole term to find them: the size and
+# depth of each node are worked out from those of its parts as the
+# sweep builds it, and each contraction changes the running size by
+#
+#    size(contractum) - size(redex)
+#
+# which replace finds while it copies the body. replace does not walk
+# the argument of the redex, so the size and depth of an argument are
+# noted when the sweep that forms the redex builds it; an argument
+# without a note (one in the term given to norReduce, say) is measured.
+# The depth is known exactly at the end of each sweep, and in between
+# from below, as the depth of a contractum plus the depth at which it
+# sits.
+#
+# A Monitor can be given limits on the size, the depth and the number
+# of steps. When one is passed the monitor calls onLimit(monitor, what),
+# with what one of 'size', 'depth' or 'steps', once for that limit; if
+# there is no onLimit, or it returns False, the reduction stops with
+# GrowthLimit. summary() gives the figures of the reduction as a
+# dictionary that json.dumps can write out.
+#
+#    python3 monitor.py <file> [--max-size N] [--max-depth N] [--max-steps N]
+#
+#        reduces the program of the file, printing its normal form and
+#        then the summary as one line of JSON
+#
+
+
+class GrowthLimit(Exception):
+    pass
+
+
+def measure(t):
+    """
+    Returns the number of nodes and the depth of t.
+    """
+    size = 0
+    depth = 0
+    work = [(t, 1)]
+    while work:
+        (t, d) = work.pop()
+        size += 1
+        if d > depth:
+            depth = d
+        if t[0] == 'AP':
+            work.append((t[1], d+1))
+            work.append((t[2], d+1))
+        elif t[0] == 'LM':
+            work.append((t[2], d+1))
+    return (size, depth)
+
+
+class Monitor:
+
+    def __init__(self, maxSize=None, maxDepth=None, maxSteps=None, onLimit=None):
+        """
+        Builds a monitor with the given limits; None means no limit.
+        """
+        self.limits = {'size': maxSize, 'depth': maxDepth, 'steps': maxSteps}
+        self.onLimit = onLimit
+        self.passed = set()
+        self.size = 0
+        self.depth = 0
+        self.maxSize = 0
+        self.maxDepth = 0
+        self.steps = 0
+        self.sweeps = 0
+        self.fresh = 0
+        self.aborted = None
+        # id(r) -> (r, size, depth) for the arguments of the redexes
+        # that earlier sweeps built, and for those of this sweep.
+        self.args = {}
+        self.built = {}
+
+    def check(self, what, value):
+        limit = self.limits[what]
+        if limit is None or value <= limit or what in self.passed:
+            return
+        self.passed.add(what)
+        if self.onLimit is None or self.onLimit(self, what) is False:
+            self.aborted = what
+            raise GrowthLimit("The " + what + " of the reduction passed " + str(limit) + ".")
+
+    def measure(self, r):
+        """
+        Returns the size and depth of the argument r of a redex. The
+        sweep that built the redex noted them; others are measured.
+        """
+        m = self.args.get(id(r))
+        if m is None or m[0] is not r:
+            return measure(r)
+        return (m[1], m[2])
+
+    def start(self, size, depth):
+        self.size = size
+        self.depth = depth
+        self.maxSize = max(self.maxSize, size)
+        self.maxDepth = max(self.maxDepth, depth)
+        self.check('size', size)
+        self.check('depth', depth)
+
+    def contracted(self, delta, depth):
+        """
+        Records a contraction that changed the size of the term by
+        delta and left it at least depth deep.
+        """
+        self.steps += 1
+        self.size += delta
+        if self.size > self.maxSize:
+            self.maxSize = self.size
+        if depth > self.maxDepth:
+            self.maxDepth = depth
+        self.check('steps', self.steps)
+        self.check('size', self.size)
+        self.check('depth', depth)
+
+    def swept(self, size, depth):
+        """
+        Records the end of a sweep, with the exact size and depth of
+        the term it built.
+        """
+        # A redex can wait many sweeps inside an argument. Keep the
+        # notes of earlier sweeps while there are not many more of them
+        # than nodes in the term; they keep their nodes alive.
+        if len(self.args) + len(self.built) > 2 * size + 1024:
+            self.args = {}
+        self.args.update(self.built)
+        self.built = {}
+        self.sweeps += 1
+        self.size = size
+        self.depth = depth
+        if depth > self.maxDepth:
+            self.maxDepth = depth
+        self.check('depth', depth)
+
+    def summary(self):
+        return {'steps': self.steps, 'sweeps': self.sweeps,
+                'size': self.size, 'depth': self.depth,
+                'maxSize': self.maxSize, 'maxDepth': self.maxDepth,
+                'fresh': self.fresh, 'aborted': self.aborted}
+
+
+def replace(y, r, rsize, rdepth, t, monitor, names):
+    """
+    reducer.replace, also returning the size and depth of the result
+    and the size of t. rsize and rdepth are those of r.
+    """
+    label = t[0]
+    if label == 'AP':
+        (u1, s1, d1, o1) = replace(y, r, rsize, rdepth, t[1], monitor, names)
+        (u2, s2, d2, o2) = replace(y, r, rsize, rdepth, t[2], monitor, names)
+        if u1[0] == 'LM':
+            monitor.built[id(u2)] = (u2, s2, d2)
+        return (['AP', u1, u2], s1 + s2 + 1, (d1 if d1 > d2 else d2) + 1, o1 + o2 + 1)
+    elif label == 'LM':
+        x = t[1]
+        if y == x:
+            (s, d) = measure(t)
+            return (t, s, d, s)
+        z = names.fresh(x)
+        (b, s, d, old) = replace(y, r, rsize, rdepth, reducer.rename(x, ['VA', z], t[2]), monitor, names)
+        return (['LM', z, b], s + 1, d + 1, old + 1)
+    elif t[1] == y:
+        return (r, rsize, rdepth, 1)
+    return (t, 1, 1, 1)
+
+
+def reduce(t, monitor, names, at=1):
+    """
+    reducer.reduce, also returning the size and depth of the result.
+    at is the depth at which t sits in the whole term.
+    """
+    label = t[0]
+    if label == 'AP':
+        if t[1][0] == 'LM':
+            (rsize, rdepth) = monitor.measure(t[2])
+            (u, s, d, old) = replace(t[1][1], t[2], rsize, rdepth, t[1][2], monitor, names)
+            monitor.contracted(s - (old + rsize + 2), at + d - 1)
+            return (u, s, d)
+        (u1, s1, d1) = reduce(t[1], monitor, names, at + 1)
+        (u2, s2, d2) = reduce(t[2], monitor, names, at + 1)
+        if u1[0] == 'LM':
+            monitor.built[id(u2)] = (u2, s2, d2)
+        return (['AP', u1, u2], s1 + s2 + 1, (d1 if d1 > d2 else d2) + 1)
+    elif label == 'LM':
+        (u, s, d) = reduce(t[2], monitor, names, at + 1)
+        return (['LM', t[1], u], s + 1, d + 1)
+    return (t, 1, 1)
+
+
+def norReduce(t, monitor):
+    """
+    Reduces t to normal form like reducer.norReduce, keeping monitor
+    up to date. Raises GrowthLimit if the monitor stops the reduction;
+    monitor.term then holds the term reached, unrendered.
+    """
+    names = reducer.Names()
+    (size, depth) = measure(t)
+    monitor.term = t
+    monitor.start(size, depth)
+    while reducer.isR(t):
+        try:
+            (t, size, depth) = reduce(t, monitor, names)
+        finally:
+            monitor.fresh = names.counter
+        monitor.term = t
+        monitor.swept(size, depth)
+    return reducer.render(t)
+
+
+def main(args):
+    limits = {'--max-size': None, '--max-depth': None, '--max-steps': None}
+    fname = None
+    i = 0
+    while i < len(args):
+        if args[i] in limits:
+            limits[args[i]] = int(args[i+1])
+            i += 2
+        else:
+            fname = args[i]
+            i += 1
+    if fname is None:
+        print("usage: python3 monitor.py <file> [--max-size N] [--max-depth N] [--max-steps N]")
+        return
+    t = reducer.buildTerm(parser.pruneFunctions(modules.load(fname)))
+    monitor = Monitor(limits['--max-size'], limits['--max-depth'], limits['--max-steps'])
+    try:
+        print(reducer.pretty(norReduce(t, monitor)))
+    except GrowthLimit as e:
+        print(e.args[0])
+    print(json.dumps(monitor.summary()))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,429 @@
+import time
+
+#
+# Experimental optimal reduction backend.
+#
+# A term is translated into an interaction net (Lamping's abstract
+# algorithm, without the bracket/croissant oracle) and reduced there.
+# Duplication is done incrementally by DUP ("fan") nodes, so a redex
+# that is shared by several copies of a subterm is contracted once for
+# all of them, where norReduce would contract it in every copy.
+#
+# Without the oracle the algorithm is only known to be sound for terms
+# that are stratified (typable in elementary affine logic), which
+# includes Church numeral arithmetic such as exponent towers. Other
+# terms can leave a net that does not read back as a term: a variable
+# outside its lambda, or a DUP reached from its shared side with no
+# copy to match. decode raises Unsound when it meets one, rather than
+# making a term up. A net that reads back cleanly can in principle
+# still be wrong, so results should be checked against norReduce; see
+# benchmarks/bench_optimal.py.
+#
+
+#
+# Node kinds. Every node has three ports: the principal port (0) and
+# two auxiliary ports (1 and 2). Port p of node n is numbered 3*n+p.
+#
+#    LAM   0: the lambda itself    1: the bound variable   2: the body
+#    APP   0: the function         1: the argument         2: the result
+#    DUP   0: the shared value     1, 2: the two copies
+#    ERA   0: the erased value
+#    FREE  0: a free variable (its name is kept in Net.names)
+#    ROOT  1: the result of the whole net
+#
+ROOT = 0
+LAM = 1
+APP = 2
+DUP = 3
+ERA = 4
+FREE = 5
+
+KINDS = ['ROOT', 'LAM', 'APP', 'DUP', 'ERA', 'FREE']
+
+
+class ReductionLimit(Exception):
+    pass
+
+
+class Unsound(ReductionLimit):
+    """
+    Raised when a net does not read back as a term: the term is outside
+    the fragment the algorithm handles without the oracle.
+    """
+    pass
+
+
+class Net:
+
+    def __init__(self, limit=None):
+        """
+        Builds an empty interaction net. If limit is given, reduction
+        raises ReductionLimit after that many interactions.
+        """
+        self.kind = []
+        self.label = []
+        self.ports = []
+        self.names = {}
+        self.labels = 0
+        self.limit = limit
+        self.stats = {'beta': 0, 'annihilate': 0, 'commute': 0, 'erase': 0}
+
+    #
+    # NET construction helpers
+    #
+
+    def new(self, kind, label=0):
+        n = len(self.kind)
+        self.kind.append(kind)
+        self.label.append(label)
+        self.ports.extend([-1, -1, -1])
+        return n
+
+    def delete(self, n):
+        # Deleted nodes are not reused: normalize may still hold ports
+        # of a node that a later interaction removed, and must be able
+        # to tell that it is gone.
+        self.kind[n] = None
+
+    def freshLabel(self):
+        self.labels += 1
+        return self.labels
+
+    def link(self, a, b):
+        self.ports[a] = b
+        self.ports[b] = a
+
+    def interactions(self):
+        s = self.stats
+        return s['beta'] + s['annihilate'] + s['commute'] + s['erase']
+
+    #
+    # INTERACTION rules
+    #
+
+    def interact(self, a, b):
+        """
+        Rewrites the active pair formed by the principal ports of
+        nodes a and b. Returns False if the pair has no rule (a stuck
+        application of a free variable, say).
+        """
+        ka = self.kind[a]
+        kb = self.kind[b]
+        if ka > kb:
+            (a, b, ka, kb) = (b, a, kb, ka)
+        if self.limit is not None and self.interactions() >= self.limit:
+            raise ReductionLimit("Gave up after " + str(self.limit) + " interactions.")
+
+        if ka == LAM and kb == APP:
+            self.stats['beta'] += 1
+            self.annihilate(a, b)
+        elif ka == DUP and kb == DUP:
+            if self.label[a] == self.label[b]:
+                self.stats['annihilate'] += 1
+                self.annihilate(a, b)
+            else:
+                self.stats['commute'] += 1
+                self.commute(a, b)
+        elif kb == DUP and ka in (LAM, APP):
+            self.stats['commute'] += 1
+            self.commute(a, b)
+        elif ka == DUP and kb == FREE:
+            self.stats['commute'] += 1
+            ports = self.ports
+            for i in (1, 2):
+                f = self.new(FREE)
+                self.names[f] = self.names[b]
+                self.link(3*f, ports[3*a+i])
+            self.delete(a)
+            self.delete(b)
+        elif kb == ERA:
+            self.stats['erase'] += 1
+            self.erase(a, b)
+        else:
+            return False
+        return True
+
+    def annihilate(self, a, b):
+        ports = self.ports
+        # The partners are re-read after each link so that a wire from
+        # one auxiliary port of a node to another is followed through.
+        self.link(ports[3*a+1], ports[3*b+1])
+        self.link(ports[3*a+2], ports[3*b+2])
+        self.delete(a)
+        self.delete(b)
+
+    def commute(self, a, b):
+        ports = self.ports
+        pa = [ports[3*a+1], ports[3*a+2]]
+        pb = [ports[3*b+1], ports[3*b+2]]
+        a1 = self.new(self.kind[a], self.label[a])
+        a2 = self.new(self.kind[a], self.label[a])
+        b1 = self.new(self.kind[b], self.label[b])
+        b2 = self.new(self.kind[b], self.label[b])
+        # An auxiliary port of a or b may be wired to another one of
+        # them (the variable and body of fn x => x, say). Its place is
+        # taken by the principal port of the copy that replaces it.
+        moved = {3*a+1: 3*b1, 3*a+2: 3*b2, 3*b+1: 3*a1, 3*b+2: 3*a2}
+        pa = [moved.get(p, p) for p in pa]
+        pb = [moved.get(p, p) for p in pb]
+        self.link(3*a1, pb[0])
+        self.link(3*a2, pb[1])
+        self.link(3*b1, pa[0])
+        self.link(3*b2, pa[1])
+        self.link(3*a1+1, 3*b1+1)
+        self.link(3*a1+2, 3*b2+1)
+        self.link(3*a2+1, 3*b1+2)
+        self.link(3*a2+2, 3*b2+2)
+        self.delete(a)
+        self.delete(b)
+
+    def erase(self, a, e):
+        ports = self.ports
+        if self.kind[a] in (LAM, APP, DUP):
+            for i in (1, 2):
+                n = self.new(ERA)
+                self.link(3*n, ports[3*a+i])
+        self.delete(a)
+        self.delete(e)
+
+    #
+    # REDUCTION
+    #
+    # whnf walks from a port towards the value connected to it, going
+    # through the principal port of every node it enters by an
+    # auxiliary port, until it meets a principal port facing it. If
+    # that is an active pair it is rewritten and the walk backs up one
+    # node. This reduces only the redexes the result actually needs.
+    #
+
+    def whnf(self, host):
+        """
+        Returns the port facing host once no more interaction can be
+        done along the walk, or None if the node host belongs to was
+        itself consumed by an interaction.
+        """
+        ports = self.ports
+        kind = self.kind
+        stack = []
+        while True:
+            if kind[host // 3] is None:
+                # An interaction removed the node we were standing on;
+                # its wires now lead elsewhere, so back up further.
+                if not stack:
+                    return None
+                host = stack.pop()
+                continue
+            t = ports[host]
+            n = t // 3
+            if t % 3 != 0:
+                # Entering a lambda by its variable port is a variable
+                # occurrence; there is nothing to reduce behind it.
+                if kind[n] == LAM and t % 3 == 1:
+                    break
+                stack.append(host)
+                if len(stack) > len(kind):
+                    raise ReductionLimit("The net contains a cycle.")
+                host = 3*n
+            elif host % 3 == 0 and self.interact(host // 3, n):
+                if not stack:
+                    return None
+                host = stack.pop()
+            else:
+                break
+        # Report what now faces the port the walk started from, not the
+        # one it got stuck at.
+        if stack:
+            return ports[stack[0]]
+        return t
+
+    def normalize(self):
+        """
+        Reduces the whole net reachable from the root to normal form.
+        Passes are repeated until one of them performs no interaction,
+        since a rewrite deep in the net can create a new active pair
+        in a part that was already visited.
+        """
+        while True:
+            before = self.interactions()
+            seen = set()
+            todo = [3*self.root+1]
+            while todo:
+                host = todo.pop()
+                if host in seen or self.kind[host // 3] is None:
+                    continue
+                seen.add(host)
+                t = self.whnf(host)
+                if t is None:
+                    continue
+                n = t // 3
+                k = self.kind[n]
+                p = t % 3
+                if k == LAM and p == 0:
+                    todo.append(3*n+2)
+                elif k == APP and p == 2:
+                    todo.append(3*n+1)
+                    todo.append(3*n)
+                elif k == DUP and p == 0:
+                    todo.append(3*n+2)
+                    todo.append(3*n+1)
+                elif k == DUP:
+                    todo.append(3*n)
+            if self.interactions() == before:
+                return
+
+
+#
+# TRANSLATION between terms and nets
+#
+
+def encode(term, limit=None):
+    """
+    Builds the interaction net of a term (in the list form of
+    reducer.py). Every bound variable used more than once is shared
+    through a tree of DUP nodes, each with its own label; an unused
+    variable is connected to an eraser.
+    """
+    net = Net(limit)
+    net.root = net.new(ROOT)
+    env = {}
+    uses = {}
+
+    def build(t, consumer):
+        label = t[0]
+        if label == 'LM':
+            lam = net.new(LAM)
+            net.link(3*lam, consumer)
+            x = t[1]
+            env.setdefault(x, []).append(lam)
+            uses[lam] = []
+            build(t[2], 3*lam+2)
+            env[x].pop()
+            share(3*lam+1, uses.pop(lam))
+        elif label == 'AP':
+            app = net.new(APP)
+            net.link(3*app+2, consumer)
+            build(t[1], 3*app)
+            build(t[2], 3*app+1)
+        elif env.get(t[1]):
+            uses[env[t[1]][-1]].append(consumer)
+        else:
+            f = net.new(FREE)
+            net.names[f] = t[1]
+            net.link(3*f, consumer)
+
+    def share(var, sites):
+        while len(sites) > 1:
+            d = net.new(DUP, net.freshLabel())
+            net.link(var, 3*d)
+            net.link(3*d+1, sites[0])
+            var = 3*d+2
+            sites = sites[1:]
+        if sites:
+            net.link(var, sites[0])
+        else:
+            e = net.new(ERA)
+            net.link(var, 3*e)
+
+    build(term, 3*net.root+1)
+    return net
+
+
+def decode(net, limit=None):
+    """
+    Reads the term connected to the root back out of a normal net.
+    Going through a DUP node by one of its copies pushes that copy on
+    a stack kept per label; coming back through the shared side of a
+    node with the same label pops it to pick the matching copy. Raises
+    Unsound if the net does not read back as a term, and, if limit is
+    given, ReductionLimit after reading that many nodes: the read-back
+    of an unsound net can go round for ever.
+
+    The walk keeps its own work list rather than recursing, since the
+    normal forms of numeral towers are far deeper than Python's stack.
+    """
+    ports = net.ports
+    kind = net.kind
+    stacks = {}
+    binders = {}
+    count = 0
+    reads = 0
+    work = [('read', 3*net.root+1)]
+    out = []
+    while work:
+        op = work.pop()
+        if op[0] == 'read':
+            reads += 1
+            if limit is not None and reads > limit:
+                raise ReductionLimit("Gave up reading back after " + str(limit) + " nodes.")
+            t = ports[op[1]]
+            n = t // 3
+            p = t % 3
+            k = kind[n]
+            if k == LAM and p == 0:
+                count += 1
+                x = 'x' + str(count)
+                binders.setdefault(n, []).append(x)
+                work.append(('lam', n, x))
+                work.append(('read', 3*n+2))
+            elif k == LAM and p == 1:
+                if not binders.get(n):
+                    raise Unsound("A variable reads back outside its lambda.")
+                out.append(['VA', binders[n][-1]])
+            elif k == APP:
+                work.append(('app',))
+                work.append(('read', 3*n+1))
+                work.append(('read', 3*n))
+            elif k == DUP and p != 0:
+                stacks.setdefault(net.label[n], []).append(p)
+                work.append(('pop', net.label[n]))
+                work.append(('read', 3*n))
+            elif k == DUP:
+                s = stacks.setdefault(net.label[n], [])
+                if not s:
+                    raise Unsound("A DUP node reads back with no copy to match.")
+                q = s.pop()
+                work.append(('push', net.label[n], q))
+                work.append(('read', 3*n+q))
+            elif k == FREE:
+                out.append(['VA', net.names[n]])
+            else:
+                raise Unsound("The read-back reached a node that is no part of a term.")
+        elif op[0] == 'lam':
+            binders[op[1]].pop()
+            out.append(['LM', op[2], out.pop()])
+        elif op[0] == 'app':
+            a = out.pop()
+            out.append(['AP', out.pop(), a])
+        elif op[0] == 'pop':
+            stacks[op[1]].pop()
+        else:
+            stacks[op[1]].append(op[2])
+    return out[0]
+
+
+def optReduce(term, stats=None, limit=None):
+    """
+    Reduces a term to normal form through an interaction net. If stats
+    is a dictionary it receives the interaction counts by rule, the
+    total, the time spent reducing and reading back, and the number of
+    interactions per second of reduction. Raises ReductionLimit after
+    limit interactions, or limit nodes read back, and Unsound if the
+    net does not read back as a term (see decode).
+    """
+    start = time.perf_counter()
+    net = encode(term, limit)
+    net.normalize()
+    reduced = time.perf_counter()
+    result = decode(net, limit)
+    if stats is not None:
+        elapsed = reduced - start
+        stats.update(net.stats)
+        stats['interactions'] = net.interactions()
+        stats['nodes'] = len(net.kind)
+        stats['seconds'] = elapsed
+        stats['readback'] = time.perf_counter() - reduced
+        if elapsed > 0:
+            stats['rate'] = net.interactions() / elapsed
+        else:
+            stats['rate'] = 0.0
+    return result
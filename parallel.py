@@ -0,0 +1,229 @@
+import os
+import multiprocessing
+
+import reducer
+
+#
+# Multi-core normal order reduction.
+#
+# A term is split into pieces that cannot interact with each other or
+# with the part of the term above them: the bodies of lambdas, and the
+# arguments of an application whose head is a variable. Nothing that
+# happens inside such a piece can create a redex outside it, so each
+# piece can be reduced to normal form on its own, in another process.
+#
+# While the term has no such structure (its top is a redex, as with
+# the definitions that buildTerm wraps around main) it is reduced one
+# sweep at a time here, exactly as norReduce does.
+#
+# Pieces travel to the workers as flat prefix codes (see flatten),
+# which pickle without recursion however deep the term is.
+#
+
+
+def flatten(t):
+    """
+    Encodes a term as a flat list in prefix order: 'A' for an
+    application, 'L' followed by the bound name for a lambda, and 'V'
+    followed by the name for a variable.
+    """
+    code = []
+    todo = [t]
+    while todo:
+        t = todo.pop()
+        label = t[0]
+        if label == 'AP':
+            code.append('A')
+            todo.append(t[2])
+            todo.append(t[1])
+        elif label == 'LM':
+            code.append('L')
+            code.append(t[1])
+            todo.append(t[2])
+        else:
+            code.append('V')
+            code.append(t[1])
+    return code
+
+
+def unflatten(code):
+    """
+    Rebuilds the term encoded by flatten. Nodes are built from the
+    front, with a stack of the slots still waiting for a subterm.
+    """
+    root = [None]
+    stack = [(root, 0)]
+    i = 0
+    while i < len(code):
+        (parent, slot) = stack.pop()
+        if code[i] == 'A':
+            t = ['AP', None, None]
+            stack.append((t, 2))
+            stack.append((t, 1))
+            i += 1
+        elif code[i] == 'L':
+            t = ['LM', code[i+1], None]
+            stack.append((t, 2))
+            i += 2
+        else:
+            t = ['VA', code[i+1]]
+            i += 2
+        parent[slot] = t
+    return root[0]
+
+
+def split(t, want):
+    """
+    Breaks t into independent pieces. Returns a context, which is t
+    with each piece that still has a redex replaced by ['HOLE', i],
+    and the list of those pieces. Pieces are split further, largest
+    first, until there are at least want of them or none can be.
+    """
+    pieces = []
+    sizes = []
+
+    def expand(t):
+        # Returns the context of t one level down, queueing its
+        # stable subterms as new pieces.
+        if t[0] == 'LM':
+            return ['LM', t[1], hole(t[2])]
+        spine = []
+        head = t
+        while head[0] == 'AP':
+            spine.append(head[2])
+            head = head[1]
+        if head[0] != 'VA':
+            return None
+        c = head
+        for arg in reversed(spine):
+            c = ['AP', c, hole(arg)]
+        return c
+
+    def hole(t):
+        if not reducer.isR(t):
+            return t
+        pieces.append(t)
+        sizes.append(size(t))
+        return ['HOLE', len(pieces)-1]
+
+    context = hole(t)
+    contexts = {}
+    stuck = set()
+    while len(pieces) - len(contexts) - len(stuck) < want:
+        best = None
+        for i in range(len(pieces)):
+            if i not in contexts and i not in stuck:
+                if best is None or sizes[i] > sizes[best]:
+                    best = i
+        if best is None:
+            break
+        c = expand(pieces[best])
+        if c is None:
+            stuck.add(best)
+        else:
+            contexts[best] = c
+
+    # Splice the expanded pieces back into the context, and number the
+    # remaining ones from zero.
+    numbers = {}
+    kept = []
+    for i in range(len(pieces)):
+        if i not in contexts:
+            numbers[i] = len(kept)
+            kept.append(pieces[i])
+
+    def splice(c):
+        if c[0] == 'HOLE':
+            if c[1] in contexts:
+                return splice(contexts[c[1]])
+            return ['HOLE', numbers[c[1]]]
+        elif c[0] == 'AP':
+            return ['AP', splice(c[1]), splice(c[2])]
+        elif c[0] == 'LM':
+            return ['LM', c[1], splice(c[2])]
+        return c
+
+    return (splice(context), kept)
+
+
+def size(t):
+    n = 0
+    todo = [t]
+    while todo:
+        t = todo.pop()
+        n += 1
+        if t[0] == 'AP':
+            todo.append(t[1])
+            todo.append(t[2])
+        elif t[0] == 'LM':
+            todo.append(t[2])
+    return n
+
+
+def fill(context, results):
+    if context[0] == 'HOLE':
+        return results[context[1]]
+    elif context[0] == 'AP':
+        return ['AP', fill(context[1], results), fill(context[2], results)]
+    elif context[0] == 'LM':
+        return ['LM', context[1], fill(context[2], results)]
+    return context
+
+
+def _work(task):
+    # Runs in a worker. Fresh variables are tagged base+k, base+k+n,
+    # base+k+2n, ... so that no two pieces can pick the same one. The
+    # piece is not rendered: its free variables are bound in the
+    # context it goes back into.
+    (code, base, k, n) = task
+    names = reducer.Names(base + k - n, n)
+    stats = {}
+    t = unflatten(code)
+    while reducer.isR(t):
+        stats['sweeps'] = stats.get('sweeps', 0) + 1
+        t = reducer.reduce(t, stats, None, names)
+    return (flatten(t), names.counter, stats.get('steps', 0), stats.get('sweeps', 0))
+
+
+def parNorReduce(t, processes=None, stats=None, pool=None):
+    """
+    Reduces t to normal form like norReduce, normalizing independent
+    subterms concurrently on a pool of processes (by default one per
+    core). An existing multiprocessing pool can be passed in to avoid
+    starting one per call. If stats is a dictionary it receives the
+    'steps' and 'sweeps' of norReduce, counted over all processes, and
+    the number of 'pieces' handed to workers.
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if stats is None:
+        stats = {}
+    if processes == 1:
+        return reducer.norReduce(t, stats)
+    own = pool is None
+    if own:
+        pool = multiprocessing.Pool(processes)
+    names = reducer.Names()
+    try:
+        while reducer.isR(t):
+            (context, pieces) = split(t, processes)
+            if len(pieces) < 2 or context[0] == 'HOLE':
+                stats['sweeps'] = stats.get('sweeps', 0) + 1
+                t = reducer.reduce(t, stats, None, names)
+                continue
+            n = len(pieces)
+            base = names.counter
+            tasks = [(flatten(pieces[k]), base, k+1, n) for k in range(n)]
+            results = []
+            for (code, counter, steps, sweeps) in pool.map(_work, tasks):
+                results.append(unflatten(code))
+                names.counter = max(names.counter, counter)
+                stats['steps'] = stats.get('steps', 0) + steps
+                stats['sweeps'] = stats.get('sweeps', 0) + sweeps
+            stats['pieces'] = stats.get('pieces', 0) + n
+            t = fill(context, results)
+    finally:
+        if own:
+            pool.close()
+            pool.join()
+    return reducer.render(t)
@@ -1,23 +1,40 @@
 import sys
-import os
-import time
 
-test1 = 'two := fn f => fn x => f (f x);succ := fn n => (fn f => fn x => f (n f x));plus := fn n => (n succ);main := plus two two;'
-test2 = '(zero := fn f => fn x => x);succ := fn n => (fn f => fn x => f (n f x));plus := fn n => fn m => (n succ m);times := fn n => fn m => (fn f => fn x => n (m f) x);two := succ (succ zero);main := plus (succ two) two;'
-test3 = 'zz := fn f => fn x => x; zf := fn y => zz;main := zf zz;'
+from lexer import TokenStream, RegexTokenStream, ParseError, SyntaxError, LexError
+from lexer import lexChunks, readChunks, mapChunks
+from lexer import RESERVED, DELIMITERS, OPERATORS
+from lexer import TK_NAME, TK_RESERVED, TK_DELIMITER, TK_OPERATOR, TK_INT, TK_STRING, TK_EOF
+import codegen
+from codegen import toString, buildSmlStr, buildMain
+
+#
+# The parser, and the command line that turns .lc files into SML for
+# scripter.py. The lexer is in lexer.py and the SML code generation in
+# codegen.py; their names are exported here as well. Importing any of
+# them only defines names: the command line runs only when parser.py
+# is the script, and modules.py is imported only when files are read.
+#
 
 def interpret(tks):
     functions = []
     fs = parseTerm(tks,functions)                # Parse the entry.
     tks.checkEOF()                      # Check if everything was consumed by the parse
+    generate(functions)
+
+def generate(functions, sml=False):
+    functions = pruneFunctions(functions)
     # newfs = functions
     # replaceAll(functions, newfs)
+    if sml:
+        # Pipe the code straight into sml instead (see codegen.runSml).
+        codegen.runSml(functions)
+        return
+    s = buildSmlStr(functions)
     f = open("reducable.txt", 'a')
     f.truncate(0)
-    f.write(buildSmlStr(functions))
+    f.write(s)
     f.close()
-    print (buildSmlStr(functions))
-
+    print (s)
 
 def lookUpVar(x,env,err):
     for (y,v) in env:
@@ -25,31 +42,56 @@ def lookUpVar(x,env,err):
             return v
     raise RunTimeError("Use of variable '"+x+"'. "+err)
 
-def buildSmlStr(functions):
-    s = 'let\n'
-    for i in range(0,len(functions)-1):
-        s += 'val x' + str(i+1) + ' = ' + toString(functions[i][0]) + '\n'
-        s += 'val t' + str(i+1) + ' = ' + toString(functions[i][1]) + '\n'
-    s += 'val t = ' + toString(functions[len(functions)-1][1]) + '\n'
-    s += 'val main = ' + buildMain(functions,0) +'\n'
-    s += 'val value = norReduce main\nin\n   print (pretty value)\nend;'
-    return s
-
-def buildMain(functions, i):
-    if functions[i][0] == 'main':
-        if len(functions) != 1:
-            return 't)'
+def freeNames(ast, bound=()):
+    """
+    Returns the set of names used free in a parsed term. The parser
+    can wrap a whole application in a VA node, so a VA may hold a term
+    instead of a name.
+    """
+    free = set()
+    work = [(ast, frozenset(bound))]
+    while work:
+        (ast, bound) = work.pop()
+        if type(ast) != type([]):
+            if ast not in bound:
+                free.add(ast)
+        elif ast[0] == 'LM':
+            work.append((ast[2], bound | {ast[1]}))
+        elif ast[0] == 'AP':
+            work.append((ast[1], bound))
+            work.append((ast[2], bound))
         else:
-            return "t"
-    s = 'AP(LM(x' + str(i+1) + ','
-    e = buildMain(functions, i+1) 
-    s += e + ',t' + str(i+1)
-    if i == 0:
-        s += ')'
-    else:
-        s += '))' 
-    return s
-
+            work.append((ast[1], bound))
+    return free
+
+def pruneFunctions(functions):
+    """
+    Drops the definitions that main does not use, directly or through
+    other definitions, keeping the rest in source order. Definitions
+    are bound around main in that order (see buildMain), so a name
+    used before its definition, or in its own, is free there: only
+    uses of earlier definitions count. Main stays last.
+    """
+    if len(functions) == 0 or functions[-1][0] != 'main':
+        return functions
+    index = {}
+    for i in range(len(functions)):
+        index[functions[i][0]] = i
+    if len(index) != len(functions):
+        # A name is defined twice; which one a use refers to depends
+        # on the order, so leave the program as it is.
+        return functions
+
+    # Keep what main reaches. Every definition comes after the ones it
+    # uses, so source order is already a valid order.
+    live = set()
+    todo = [len(functions)-1]
+    while todo:
+        i = todo.pop()
+        if i not in live:
+            live.add(i)
+            todo.extend(index[y] for y in freeNames(functions[i][1]) if index.get(y, i) < i)
+    return [functions[i] for i in sorted(live)]
 
 #
 # ------------------------------------------------------------
@@ -66,14 +108,7 @@ class TypeError(Exception):
 class RunTimeError(Exception):
     pass
 
-class ParseError(Exception):
-    pass
-
-class SyntaxError(Exception):
-    pass
 
-class LexError(Exception):
-    pass
 def replace(ast,target,x):
     if type(ast) == type(''):
         pass
@@ -91,397 +126,153 @@ def replaceAll(functions, changes):
         for f in functions:
             replace(change[1], f[0], f[1])
 
-def toString(ast):
-    if type(ast) != type([]):
-        return '"' + str(ast) + '"'
-    label = ast[0]
-    if label in ['LM','AP']:
-        e = toString(ast[1])
-        ep = toString(ast[2])
-        return label + "(" + e + ',' + ep + ')'
-    else:
-        e = toString(ast[1])
-        return label + e
-    
-
-
-
-
 
+# <program> ::= <name> := <term> ; <program>
+# <program> ::= import <string> ; <program>
+# <program> ::=
+#
 # <term> ::= fn <name> => <term>
 # <term> ::= <term> <term>
 # <term> ::= <name>
-
-def parseTerm(tokens, functions):
-    if tokens.nextIsName():
-        x = tokens.eatName()
-        if tokens.next() == '(':
-            tokens.eat('(')
-            e = parseTerm(tokens, functions)
-            tokens.eat(')')
-            x = ['AP', ['VA',x], e]
-
-        elif tokens.nextIsName():
-            x = ['VA', x]
-            while tokens.nextIsName():
-                e = tokens.eatName()
-                x = ['AP', x, ['VA', e]]
-            if tokens.next() not in [')', ';', 'eof']:
-                x = ['AP', ['VA', x], parseTerm(tokens, functions)]
-
-        elif tokens.next() == ':=':
-            tokens.eat(':=')
-            e = parseTerm(tokens, functions)
-            functions.append((x,e))
-            tokens.eat(';')
-            if tokens.next() != 'eof':
-                parseTerm(tokens, functions)
-            x = None
-
-        elif tokens.next() in [')',";"]:
-            if tokens.next() == ')':
-                tokens.eat(')')
-            x = ['VA', x]
-        return x
-
-    elif tokens.next() == '(':
-        tokens.eat('(')
-        e = parseTerm(tokens,functions)
-        if tokens.next() == ')':
-            tokens.eat(')')
-        else:
-            parseTerm(tokens, functions)
-        if tokens.next() != ';' and tokens.next() != ')':
-            return ['AP', e,parseTerm(tokens, functions)]
-        return e
-        
-
-        
-    elif tokens.next() == "fn":
-        tokens.eat('fn')
-        name = tokens.eatName()
-        tokens.eat('=>')
-        e = parseTerm(tokens, functions)
-        return ['LM', name, e]
-
-
-#
-# Keywords, primitives, unary operations, and binary operations.
+# <term> ::= ( <term> )
 #
-# The code below defines several strings or string lists used by
-# the lexical analyzer (housed as class TokenStream, below).
-#
-
-RESERVED = ['fn', ':=',')']
-
-# Characters that separate expressions.
-DELIMITERS = '();'
-
-# Characters that make up unary and binary operations.
-OPERATORS = ':=>'
-
-
+# Application is left associative and extends as far right as it can,
+# so a "fn" inside an application takes the rest of it as its body:
 #
-# LEXICAL ANALYSIS / TOKENIZER
+#    f a fn x => b c     is     f a (fn x => (b c))
 #
-# The code below converts ML source code text into a sequence
-# of tokens (a list of strings).  It does so by defining the
-#
-#    class TokenStream
-#
-# which describes the methods of an object that supports this
-# lexical conversion.  The key method is "analyze" which provides
-# the conversion.  It is the lexical analyzer for ML source code.
-#
-# The lexical analyzer works by CHOMP methods that processes the
-# individual characters of the source code's string, packaging
-# them into a list of token strings.
-#
-# The class also provides a series of methods that can be used
-# to consume (or EAT) the tokens of the token stream.  These are
-# used by the parser.
-#
-
-
-class TokenStream:
-
-    def __init__(self,src,filename="STDIN"):
-        """
-        Builds a new TokenStream object from a source code string.
-        """
-        self.sourcename = filename
-        self.source = src # The char sequence that gets 'chomped' by the lexical analyzer.
-        self.tokens = []  # The list of tokens constructed by the lexical analyzer.
-        self.extents = []
-        self.starts = []
-
-        # Sets up and then runs the lexical analyzer.
-        self.initIssue()
-        self.analyze()
-        self.tokens.append("eof")
-
-    #
-    # PARSING helper functions
-    #
-
-    def lexassert(self,c):
-        if not c:
-            self.raiseLex("Unrecognized character.")
 
-    def raiseLex(self,msg):
-        s = self.sourcename + " line "+str(self.line)+" column "+str(self.column)
-        s += ": " + msg
-        raise LexError(s)
-
-    def next(self):
-        """
-        Returns the unchomped token at the front of the stream of tokens.
-        """
-        return self.tokens[0]
-
-    def numTokens(self):
-        return len(self.tokens)
-
-    def advance(self):
-        """
-        Advances the token stream to the next token, giving back the
-        one at the front.
-        """
-        tk = self.next()
-        del self.tokens[0]
-        # del self.starts[0]
-        return tk
-
-    def report(self):
-        """
-        Helper function used to report the location of errors in the
-        source code.
-        """
-        lnum = self.starts[0][0]
-        cnum = self.starts[0][1]
-        return self.sourcename + " line "+str(lnum)+" column "+str(cnum)
-
-    def eat(self,tk):
-        """
-        Eats a specified token, making sure that it is the next token
-        in the stream.
-        """
-        if tk == self.next():
-            return self.advance()
-        else:
-            where = self.report()
-            err1 = "Unexpected token. "
-            err2 = "Saw: '"+self.next()+"'. "
-            err3 = "Expected: '"+tk+"'. "
-            raise SyntaxError(err1 + err2 + err3)
-
-
-    def eatName(self):
-        """
-        Eats a name token, making sure that such a token is next in the stream.
-        """
-        if self.nextIsName():
-            return self.advance()
-        else:
-            where = self.report()
-            err1 = "Unexpected token. "
-            err2 = "Saw: '"+self.next()+"'. "
-            err3 = "Expected a name. "
-            raise SyntaxError(err1 + err2 + err3)
-
-
-    def checkEOF(self):
-        """
-        Checks if next token is an integer literal token.
-        """
-        if self.next() != 'eof':
-            raise ParseError("Parsing failed to consume tokens "+str(self.tokens[:-1])+".")
-
-
-    def nextIsName(self):
-        """
-        Checks if next token is a name.
-        """
-        tk = self.next()
-        isname = tk[0].isalpha() or tk[0] =='_'
-        for c in tk[1:]:
-            isname = isname and (c.isalnum() or c == '_')
-        return isname and (tk not in RESERVED)
-
-
-    #
-    # TOKENIZER helper functions
-    #
-    # These are used by the 'analysis' method defined below them.
-    #
-    # The parsing functions EAT the token stream, whereas
-    # the lexcial analysis functions CHOMP the source text
-    # and ISSUE the individual tokens that form the stream.
-    #
-
-    def initIssue(self):
-        self.line = 1
-        self.column = 1
-        self.markIssue()
-
-    def markIssue(self):
-        self.mark = (self.line,self.column)
-
-    def issue(self,token):
-        self.tokens.append(token)
-        self.starts.append(self.mark)
-        self.markIssue()
-
-    def nxt(self,lookahead=1):
-        if len(self.source) == 0:
-            return ''
-        else:
-            return self.source[lookahead-1]
-
-    def chompSelector(self):
-        self.lexassert(self.nxt() == '#' and self.nxt(2).isdigit())
-        token = self.chompChar()
-        token = '#'
-        while self.nxt().isdigit():
-            token += self.chompChar()
-        self.issue(token)
-
-    def chompWord(self):
-        self.lexassert(self.nxt().isalpha() or self.nxt() == '_')
-        token = self.chompChar()
-        while self.nxt().isalnum() or self.nxt() == '_':
-            token += self.chompChar()
-        self.issue(token)
-        
-    def chompInt(self):
-        ck = self.nxt().isdigit()
-        self.lexassert(ck)
-        token = ""
-        token += self.chompChar()     # first digit
-        while self.nxt().isdigit():
-            token += self.chompChar() # remaining digits=
-        self.issue(token)
-        
-    def chompString(self):
-        self.lexassert(self.nxt() == '"')
-        self.chompChar() # eat quote
-        token = ""
-        while self.nxt() != '' and self.nxt() != '"':
-            if self.nxt() == '\\':
-                self.chompChar()
-                if self.nxt() == '\n':
-                    self.chompWhitespace(True)
-                elif self.nxt() == '\\':
-                    token += self.chompChar()
-                elif self.nxt() == 'n':
-                    self.chompChar()
-                    token += '\n'
-                elif self.nxt() == 't':
-                    self.chompChar()
-                    token += '\t'
-                elif self.nxt() == '"':
-                    self.chompChar()
-                    token += '"'
-                else:
-                    self.raiseLex("Bad string escape character")
-            elif self.nxt() == '\n':
-                self.raiseLex("End of line encountered within string")
-            elif self.nxt() == '\t':
-                self.raiseLex("Tab encountered within string")
-            else:
-                token += self.chompChar()
-
-        if self.nxt() == '':
-            self.raiseLex("EOF encountered within string")
-        else:
-            self.chompChar() # eat endquote
-            self.issue('"'+token+'"')
-
-    def chompComment(self):
-        self.lexassert(len(self.source)>1 and self.source[0:1] == '(*')
-        self.chompChar() # eat (*
-        self.chompChar() #
-        while len(self.source) >= 2 and self.source[0:1] != '*)':
-            self.chomp()
-        if len(self.source) < 2:
-            self.raiseLex("EOF encountered within comment")
-        else:
-            self.chompChar() # eat *)
-            self.chompChar() #
-
-    def chomp(self):
-        if self.nxt() in "\n\t\r ":
-            self.chompWhitespace()
+def parseTerm(tokens, functions, imports=None):
+    """
+    Parses a program, appending each of its definitions to functions
+    as a (name, term) pair. The path of each import is appended to
+    imports; without an imports list, an import is a syntax error.
+    """
+    while tokens.nextKind() != TK_EOF:
+        if tokens.next() == 'import':
+            tokens.advance()
+            if tokens.nextKind() != TK_STRING:
+                raise SyntaxError("Unexpected token. Saw: '"+tokens.next()+"'. Expected a file name string. ")
+            path = tokens.advance()[1:-1]
+            tokens.eat(';')
+            if imports is None:
+                raise SyntaxError("Unexpected import of '"+path+"'. Imports are only allowed in files. ")
+            imports.append(path)
+            continue
+        x = tokens.eatName()
+        tokens.eat(':=')
+        e = parseExpr(tokens)
+        tokens.eat(';')
+        functions.append((x,e))
+    return None
+
+def streamDefinitions(chunks, filename="STDIN", imports=None):
+    """
+    Parses a program whose text arrives in pieces (see readChunks and
+    mapChunks), yielding its (name, term) definitions in order. Each
+    comes as soon as the piece holding its ';' has been read. Imports
+    are handled as in parseTerm.
+    """
+    for tokens in lexChunks(chunks, filename):
+        functions = []
+        parseTerm(tokens, functions, imports)
+        tokens.checkEOF()
+        for f in functions:
+            yield f
+
+def parseExpr(tokens):
+    """
+    Parses a term, stopping before the ')', ';' or end of input that
+    ends it.
+    An integer literal stands for its Church numeral (see numeral).
+
+    Each application spine is built in a single loop: every atom is
+    applied to the spine read so far. Parentheses and lambda bodies
+    open a new frame on an explicit stack instead of recursing, so a
+    long spine or deep nesting costs no Python stack. A frame is
+    [kind, binder, spine] where kind is '(' or 'fn'.
+    """
+    frames = [['', None, None]]
+    while True:
+        if tokens.nextIsName():
+            term = ['VA', tokens.advance()]
+        elif tokens.nextKind() == TK_INT:
+            term = numeral(int(tokens.advance()))
+        elif tokens.next() == '(':
+            tokens.advance()
+            frames.append(['(', None, None])
+            continue
+        elif tokens.next() == 'fn':
+            tokens.advance()
+            name = tokens.eatName()
+            tokens.eat('=>')
+            frames.append(['fn', name, None])
+            continue
+        elif tokens.nextKind() == TK_EOF or tokens.next() in [')', ';']:
+            # The end of a group closes every lambda body in it.
+            while frames[-1][0] == 'fn':
+                term = closeFrame(tokens, frames)
+                frames[-1][2] = applyTo(frames[-1][2], term)
+            if tokens.next() != ')' or len(frames) == 1:
+                if len(frames) != 1:
+                    tokens.eat(')')
+                return closeFrame(tokens, frames)
+            term = closeFrame(tokens, frames)
+            tokens.advance()
         else:
-            self.chompChar()
-
-    def chompChar(self):
-        self.lexassert(len(self.source) > 0)
-        c = self.source[0]
-        self.source = self.source[1:]
-        self.column += 1
-        return c
-
-    def chompWhitespace(self,withinToken=False):
-        self.lexassert(len(self.source) > 0)
-        c = self.source[0]
-        self.source = self.source[1:]
-        if c == ' ':
-            self.column += 1
-        elif c == '\t':
-            self.column += 4
-        elif c == '\n':
-            self.line += 1
-            self.column = 1
-        if not withinToken:
-            self.markIssue()
-        
-    def chompOperator(self):
-        token = ''
-        while self.nxt() in OPERATORS:
-            token += self.chompChar()
-        self.issue(token)
-
-    #
-    # TOKENIZER
-    #
-    # This method defines the main loop of the
-    # lexical analysis algorithm, one that converts
-    # the source text into a list of token strings.
-
-    def analyze(self):
-        while self.source != '':
-            # CHOMP a string literal
-            if self.source[0] == '"':
-                self.chompString()
-            # CHOMP a comment
-            elif self.source[0:1] == '(*':
-                self.chompComment()
-            # CHOMP whitespace
-            elif self.source[0] in ' \t\n\r':
-                self.chompWhitespace()
-            # CHOMP an integer literal
-            elif self.source[0].isdigit():
-                self.chompInt()
-            # CHOMP a single "delimiter" character
-            elif self.source[0] in DELIMITERS:
-                self.issue(self.chompChar())
-            # CHOMP an operator
-            elif self.source[0] in OPERATORS:
-                self.chompOperator()
-            # CHOMP a reserved word or a name.
-            else:
-                self.chompWord()
-
-def evalAll(files):
+            raise SyntaxError("Unexpected token. Saw: '"+tokens.next()+"'. ")
+        frames[-1][2] = applyTo(frames[-1][2], term)
+
+def numeral(n):
+    """
+    Returns the Church numeral of the integer n >= 0, the term an
+    integer literal n stands for: fn f => fn x => f (... (f x)).
+    """
+    body = ['VA', 'x']
+    for i in range(n):
+        body = ['AP', ['VA', 'f'], body]
+    return ['LM', 'f', ['LM', 'x', body]]
+
+def tower(n, height):
+    """
+    Returns the application n n ... n of height numerals of n, the term
+    of a line of height integer literals n (see numeral).
+    """
+    t = numeral(n)
+    for i in range(height-1):
+        t = ['AP', t, numeral(n)]
+    return t
+
+def applyTo(spine, term):
+    if spine is None:
+        return term
+    return ['AP', spine, term]
+
+def closeFrame(tokens, frames):
+    (kind, binder, spine) = frames[-1]
+    if spine is None:
+        raise SyntaxError("Unexpected token. Saw: '"+tokens.next()+"'. Expected a term. ")
+    frames.pop()
+    if kind == 'fn':
+        return ['LM', binder, spine]
+    return spine
+
+
+def evalAll(files, sml=False):
+    import modules
     try:
-        # Load definitions from the specified source files.
+        # Load definitions from the specified source files, and the
+        # files they import.
         for fname in files:
             print("[opening "+fname+"]")
-            f = open(fname,"r")
-            src = f.read()
-            tks = TokenStream(src,filename=fname)
-            interpret(tks)
+            if fname == '-':
+                generate(list(streamDefinitions(readChunks(sys.stdin))), sml)
+            else:
+                generate(modules.load(fname), sml)
+    except modules.ModuleError as e:
+        print("Error loading modules.")
+        print(e.args[0])
+        print("Bailing command-line loading.")
     except RunTimeError as e:
         print("Error during evaluation.")
         print(e.args[0])
@@ -502,27 +293,49 @@ def evalAll(files):
         print("Bad token reached.")
         print(e.args[0])
         print("Bailing command-line loading.")
+    except OSError as e:
+        print("Cannot run sml.")
+        print(e)
+        print("Bailing command-line loading.")
 
 #
 #  usage #1:
-#    python3 miniml.py
+#    python3 parser.py
 #
-#      - Waits for a MiniML expression after the prompt
-#        evaluates it, and prints the resulting value
+#      - generates the SML of a small built-in test program
 #
 #
 #  usage #2:
-#    python3 miniml.py <file 1> ... <file n>
+#    python3 parser.py <file 1> ... <file n>
 #
-#      - this runs the interpreter on each of the listed
-#        source .mml files
+#      - this generates the SML of each of the listed
+#        source .lc files; a file named - is the standard
+#        input, read and parsed a piece at a time
 #
-mtime = str(time.ctime(os.path.getmtime("./parser.py")))
-if len(sys.argv) > 1:
-    evalAll(sys.argv[1:])
-else:
-    test = test3
-    print("Enter an expression:")
-    print (test)
-    interpret(TokenStream(test))
-
+#
+#  usage #3:
+#    python3 parser.py --sml <file 1> ... <file n>
+#
+#      - runs each program through sml, writing its SML code
+#        straight to the standard input of sml after reduc.sml
+#
+def main(args):
+    if len(args) > 0 and args[0] == '--sml':
+        evalAll(args[1:], True)
+    elif len(args) > 0:
+        evalAll(args)
+    else:
+        tests = ['two := fn f => fn x => f (f x);succ := fn n => (fn f => fn x => f (n f x));plus := fn n => (n succ);main := plus two two;',
+                 '(zero := fn f => fn x => x);succ := fn n => (fn f => fn x => f (n f x));plus := fn n => fn m => (n succ m);times := fn n => fn m => (fn f => fn x => n (m f) x);two := succ (succ zero);main := plus (succ two) two;',
+                 'zz := fn f => fn x => x; zf := fn y => zz;main := zf zz;']
+        test = tests[2]
+        print("Enter an expression:")
+        print (test)
+        interpret(TokenStream(test))
+
+if __name__ == '__main__':
+    # Run the imported module rather than __main__, so that the errors
+    # raised through modules.py, which imports parser, are the classes
+    # that evalAll catches.
+    import parser
+    parser.main(sys.argv[1:])
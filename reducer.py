@@ -0,0 +1,629 @@
+import sys
+import threading
+
+#
+# A Python port of the reducer in reduc.sml.
+#
+# Terms are the nested lists produced by parser.py:
+#
+#    ['LM', x, t]      fn x => t
+#    ['AP', t1, t2]    t1 t2
+#    ['VA', x]         x
+#
+# The functions below follow their SML counterparts, so that a program
+# reduced here gives the same normal form (up to the choice of fresh
+# names) as one reduced by scripter.py through SML. Terms are never
+# mutated; every step builds a new term.
+#
+# Like replace in reduc.sml, substitution renames every binder it
+# crosses, but the new name is not a string. It is a tagged variable:
+# a pair (x, k) of the binder's name x and an integer k that no other
+# fresh variable of the same reduction has. The tags come from a Names
+# supply of the reduction's own, so reductions can run side by side
+# without sharing any state. Tagged variables become names again, x'
+# x'' and so on, only when a term is printed or handed back by
+# norReduce (see render).
+#
+# whnf and hnf stop early, at weak head normal form (a lambda, or a
+# variable applied to arguments) or at head normal form. They hand back
+# a Lazy, whose parts are reduced only when something forces them: a
+# query that needs only the head, such as whether  equal two two  is
+# true or false, never reduces the rest. Lazy.pretty prints the term
+# forcing it as deep as asked.
+#
+
+
+class Names:
+    """
+    A supply of fresh variables. Tags are counted up from start by
+    stride, so that processes sharing out a reduction (see parallel.py)
+    can each take their own residue class.
+    """
+    __slots__ = ('counter', 'stride')
+
+    def __init__(self, start=0, stride=1):
+        self.counter = start
+        self.stride = stride
+
+    def fresh(self, x):
+        """
+        Returns a fresh variable made from the name or variable x.
+        """
+        self.counter += self.stride
+        if type(x) == tuple:
+            x = x[0]
+        return (x, self.counter)
+
+
+# The supply of reductions that are not given one of their own.
+shared = Names()
+
+
+def fromParser(ast):
+    """
+    Cleans up a term built by parseTerm. The parser can wrap a whole
+    application in a VA node (['VA', ['AP', ...]]); this unwraps it.
+    """
+    label = ast[0]
+    if label == 'VA':
+        if type(ast[1]) == type([]):
+            return fromParser(ast[1])
+        return ast
+    elif label == 'LM':
+        return ['LM', ast[1], fromParser(ast[2])]
+    else:
+        return ['AP', fromParser(ast[1]), fromParser(ast[2])]
+
+
+def buildTerm(functions):
+    """
+    Builds the main term for a list of (name, term) definitions, the
+    same way buildMain does for the SML source: each definition is
+    bound around main by a redex.
+    """
+    t = fromParser(functions[len(functions)-1][1])
+    for i in range(len(functions)-2, -1, -1):
+        (x, ti) = functions[i]
+        t = ['AP', ['LM', x, t], fromParser(ti)]
+    return t
+
+
+def freeVars(t):
+    """
+    Returns the set of names that occur free in t.
+    """
+    free = set()
+    work = [(t, frozenset())]
+    while work:
+        (t, bound) = work.pop()
+        label = t[0]
+        if label == 'AP':
+            work.append((t[1], bound))
+            work.append((t[2], bound))
+        elif label == 'LM':
+            work.append((t[2], bound | {t[1]}))
+        elif t[1] not in bound:
+            free.add(t[1])
+    return free
+
+
+def toString(t):
+    return _toString(render(t))
+
+
+def _toString(t):
+    label = t[0]
+    if label == 'AP':
+        return "AP(" + _toString(t[1]) + "," + _toString(t[2]) + ")"
+    elif label == 'LM':
+        return "LM(" + t[1] + "," + _toString(t[2]) + ")"
+    else:
+        return "VA'" + t[1] + "'"
+
+
+def isR(t):
+    label = t[0]
+    if label == 'AP':
+        return t[1][0] == 'LM' or isR(t[1]) or isR(t[2])
+    elif label == 'LM':
+        return isR(t[2])
+    else:
+        return False
+
+
+def replace(y, r, t, names=shared):
+    """
+    Substitutes r for the free occurrences of y in t. Every binder
+    crossed is renamed to a fresh variable from names before r goes
+    under it, so that it cannot capture a free variable of r.
+    """
+    label = t[0]
+    if label == 'AP':
+        return ['AP', replace(y, r, t[1], names), replace(y, r, t[2], names)]
+    elif label == 'LM':
+        x = t[1]
+        if y == x:
+            return t
+        z = names.fresh(x)
+        return ['LM', z, replace(y, r, rename(x, ['VA', z], t[2]), names)]
+    else:
+        if t[1] == y:
+            return r
+        return t
+
+
+def rename(x, v, t):
+    """
+    Substitutes the variable node v, whose name is fresh, for the free
+    occurrences of x in t. No binder can capture a fresh name, so none
+    is renamed.
+    """
+    label = t[0]
+    if label == 'AP':
+        return ['AP', rename(x, v, t[1]), rename(x, v, t[2])]
+    elif label == 'LM':
+        if t[1] == x:
+            return t
+        return ['LM', t[1], rename(x, v, t[2])]
+    elif t[1] == x:
+        return v
+    return t
+
+
+def reduce(t, stats=None, log=None, names=shared):
+    """
+    Contracts the redexes of t in one parallel sweep. If stats is a
+    dictionary, the number of contractions is added to stats['steps'].
+    If log is a list, each contraction appends its (variable, argument)
+    pair to it, in the order reduceV prints them. Fresh variables come
+    from names; the sweeps of one reduction must share a supply.
+    """
+    label = t[0]
+    if label == 'AP':
+        if t[1][0] == 'LM':
+            if stats is not None:
+                stats['steps'] = stats.get('steps', 0) + 1
+            if log is not None:
+                log.append((t[1][1], t[2]))
+            return replace(t[1][1], t[2], t[1][2], names)
+        return ['AP', reduce(t[1], stats, log, names), reduce(t[2], stats, log, names)]
+    elif label == 'LM':
+        return ['LM', t[1], reduce(t[2], stats, log, names)]
+    else:
+        return t
+
+
+def norReduce(t, stats=None, eta=False):
+    """
+    Reduces t until no redex is left, with a supply of fresh variables
+    of its own, and returns the normal form rendered. If stats is a
+    dictionary, it receives the number of contractions ('steps') and
+    of sweeps over the term ('sweeps'). If eta is true the result is
+    the beta-eta normal form, and stats['eta'] counts eta steps.
+    """
+    names = Names()
+    while isR(t):
+        if stats is not None:
+            stats['sweeps'] = stats.get('sweeps', 0) + 1
+        t = reduce(t, stats, None, names)
+    if eta:
+        t = etaReduce(t, stats)
+    return render(t)
+
+
+def etaReduce(t, stats=None, log=None):
+    """
+    Contracts every eta redex  fn x => M x, with x not free in M, of a
+    term in beta normal form, giving its beta-eta normal form. Eta
+    steps never make a beta redex there, and are all found in one pass:
+    the free variables of each subterm are worked out from those of its
+    parts on the way up, so each candidate is checked without a scan of
+    its own. Subterms with nothing to contract are shared, not copied.
+    If log is a list, each step appends the variable x to it.
+    """
+    # Entries of out are (term, free, head) where free holds the free
+    # variables of term and, for an application, head is the entry of
+    # its function.
+    out = []
+    work = [(t, False)]
+    while work:
+        (t, done) = work.pop()
+        label = t[0]
+        if label == 'VA':
+            out.append((t, frozenset([t[1]]), None))
+        elif not done:
+            work.append((t, True))
+            work.append((t[2], False))
+            if label == 'AP':
+                work.append((t[1], False))
+        elif label == 'AP':
+            arg = out.pop()
+            head = out.pop()
+            if head[0] is not t[1] or arg[0] is not t[2]:
+                t = ['AP', head[0], arg[0]]
+            out.append((t, head[1] | arg[1], head))
+        else:
+            x = t[1]
+            (b, fb, head) = out.pop()
+            if b[0] == 'AP' and b[2][0] == 'VA' and b[2][1] == x and x not in head[1]:
+                if stats is not None:
+                    stats['eta'] = stats.get('eta', 0) + 1
+                if log is not None:
+                    log.append(x)
+                out.append(head)
+                continue
+            if b is not t[2]:
+                t = ['LM', x, b]
+            out.append((t, fb - {x}, None))
+    return out[0][0]
+
+
+def headReduce(t, names=shared, stats=None):
+    """
+    Reduces t by leftmost outermost steps until it is in head normal
+    form,  fn x1 => ... fn xn => h M1 ... Mk  with h a variable, and
+    returns that. The arguments are left as they are. Loops forever if
+    t has no head normal form. If stats is a dictionary the steps are
+    counted in stats['steps'].
+    """
+    binders = []
+    while True:
+        while t[0] == 'LM':
+            binders.append(t[1])
+            t = t[2]
+        args = []
+        h = t
+        while h[0] == 'AP':
+            args.append(h[2])
+            h = h[1]
+        if h[0] == 'VA':
+            break
+        if stats is not None:
+            stats['steps'] = stats.get('steps', 0) + 1
+        t = replace(h[1], args.pop(), h[2], names)
+        while args:
+            t = ['AP', t, args.pop()]
+    for x in reversed(binders):
+        t = ['LM', x, t]
+    return t
+
+
+def whnfReduce(t, names=shared, stats=None):
+    """
+    Reduces t by leftmost outermost steps until it is in weak head
+    normal form: a lambda, whose body is left alone, or a variable
+    applied to arguments. Counts steps as headReduce does.
+    """
+    while t[0] == 'AP':
+        args = []
+        h = t
+        while h[0] == 'AP':
+            args.append(h[2])
+            h = h[1]
+        if h[0] == 'VA':
+            break
+        if stats is not None:
+            stats['steps'] = stats.get('steps', 0) + 1
+        t = replace(h[1], args.pop(), h[2], names)
+        while args:
+            t = ['AP', t, args.pop()]
+    return t
+
+
+class Lazy:
+    """
+    A term reduced no further than asked. force() brings it to head
+    normal form, or to weak head normal form if weak is true, and
+    splits it into parts that are Lazy in their turn:
+
+       binders  the names bound at the top, outermost first
+       head     the head variable, or None for a weak lambda
+       args     the arguments of the head, first first
+       body     the body of a weak lambda, or None
+
+    A part is reduced only when it is forced itself, for example by
+    term() or pretty() as they go down into it. All the parts of a
+    term share its supply of fresh variables.
+    """
+    __slots__ = ('source', 'weak', 'names', 'stats', 'forced', 'binders', 'head', 'args', 'body')
+
+    def __init__(self, t, weak=False, names=None, stats=None):
+        self.source = t
+        self.weak = weak
+        self.names = names if names is not None else Names()
+        self.stats = stats
+        self.forced = False
+
+    def part(self, t):
+        return Lazy(t, self.weak, self.names, self.stats)
+
+    def force(self):
+        if self.forced:
+            return self
+        if self.weak:
+            t = whnfReduce(self.source, self.names, self.stats)
+            if t[0] == 'LM':
+                (self.binders, self.head, self.args, self.body) = ([t[1]], None, [], self.part(t[2]))
+                self.forced = True
+                return self
+        else:
+            t = headReduce(self.source, self.names, self.stats)
+        binders = []
+        while t[0] == 'LM':
+            binders.append(t[1])
+            t = t[2]
+        args = []
+        while t[0] == 'AP':
+            args.append(self.part(t[2]))
+            t = t[1]
+        args.reverse()
+        (self.binders, self.head, self.args, self.body) = (binders, t[1], args, None)
+        self.forced = True
+        return self
+
+    def term(self, depth=None):
+        """
+        Returns the term, forced depth levels deep (all the way if
+        depth is None), with the parts below that as they stand. The
+        variables are not rendered.
+        """
+        if depth == 0:
+            return self.source
+        self.force()
+        inner = None if depth is None else depth - 1
+        if self.body is not None:
+            return ['LM', self.binders[0], self.body.term(inner)]
+        t = ['VA', self.head]
+        for a in self.args:
+            t = ['AP', t, a.term(inner)]
+        for x in reversed(self.binders):
+            t = ['LM', x, t]
+        return t
+
+    def pretty(self, depth=None):
+        return pretty(self.term(depth))
+
+
+def whnf(t, stats=None):
+    """
+    Returns t as a Lazy in weak head normal form.
+    """
+    return Lazy(t, True, None, stats).force()
+
+
+def hnf(t, stats=None):
+    """
+    Returns t as a Lazy in head normal form.
+    """
+    return Lazy(t, False, None, stats).force()
+
+
+class Step:
+    """
+    One contraction of a reduction, as yielded by trace. Nothing is
+    rendered until asked for: substitution() gives the line reduceV
+    prints, and term() the whole term after the sweep the contraction
+    belongs to. An eta step has no argument.
+    """
+    __slots__ = ('number', 'sweep', 'var', 'arg', 'after')
+
+    def __init__(self, number, sweep, var, arg, after):
+        self.number = number
+        self.sweep = sweep
+        self.var = var
+        self.arg = arg
+        self.after = after
+
+    def substitution(self):
+        if self.arg is None:
+            return "[eta " + render(['VA', self.var])[1] + "]"
+        # Render the variable and the argument together, so that a
+        # tagged variable gets the same name in both.
+        t = render(['AP', ['VA', self.var], self.arg])
+        return "[" + t[1][1] + "/" + _toString(t[2]) + "]"
+
+    def term(self):
+        return render(self.after)
+
+    def pretty(self):
+        return pretty(self.after)
+
+
+def trace(t, every=1, stats=None, eta=False):
+    """
+    Reduces t like norReduce, yielding a Step for every every-th
+    contraction, eta steps (in a last sweep of their own) included.
+    The reduction goes no further than the consumer reads, so it can
+    stop early by breaking out of the loop. Only the current sweep's
+    contractions are held at any time. If stats is a dictionary it is
+    kept up to date as for norReduce, and its 'term' entry holds the
+    latest term, unrendered.
+    """
+    if stats is None:
+        stats = {}
+    names = Names()
+    number = 0
+    sweep = 0
+    while isR(t):
+        sweep += 1
+        stats['sweeps'] = stats.get('sweeps', 0) + 1
+        log = []
+        t = reduce(t, stats, log, names)
+        stats['term'] = t
+        for (x, s) in log:
+            number += 1
+            if number % every == 0:
+                yield Step(number, sweep, x, s, t)
+    if eta:
+        log = []
+        t = etaReduce(t, stats, log)
+        stats['term'] = t
+        for x in log:
+            number += 1
+            if number % every == 0:
+                yield Step(number, sweep + 1, x, None, t)
+
+
+def norReduceVerbose(t, out=None, eta=False):
+    """
+    Reduces t to normal form, writing each substitution the way reduceV
+    does. Lines go to out (a file) or, by default, are printed.
+    """
+    stats = {'term': t}
+    for step in trace(t, 1, stats, eta):
+        if out is None:
+            print(step.substitution())
+        else:
+            out.write(step.substitution() + "\n")
+    return render(stats['term'])
+
+
+class Namer:
+    """
+    Chooses the names of tagged variables while a term is walked: a
+    tagged variable (x, k) is named x followed by the fewest primes
+    that make a name different from every name in taken and from the
+    names of the tagged binders in scope.
+    """
+
+    def __init__(self, taken):
+        self.taken = taken
+        self.scope = {}     # tagged variable -> its names, innermost last
+        self.inUse = {}     # name -> number of binders in scope using it
+
+    def bind(self, x):
+        """
+        Enters the scope of a binder, returning the name it prints as.
+        """
+        if type(x) != tuple:
+            return x
+        name = x[0] + "'"
+        while name in self.taken or name in self.inUse:
+            name += "'"
+        self.scope.setdefault(x, []).append(name)
+        self.inUse[name] = self.inUse.get(name, 0) + 1
+        return name
+
+    def unbind(self, x):
+        """
+        Leaves the scope of a binder.
+        """
+        if type(x) != tuple:
+            return
+        name = self.scope[x].pop()
+        self.inUse[name] -= 1
+        if self.inUse[name] == 0:
+            del self.inUse[name]
+
+    def name(self, x):
+        """
+        Returns the name a variable prints as. A tagged variable that
+        is not in scope is free, and keeps one name everywhere.
+        """
+        if type(x) != tuple:
+            return x
+        if not self.scope.get(x):
+            name = self.bind(x)
+            self.taken.add(name)
+        return self.scope[x][-1]
+
+
+def render(t):
+    """
+    Returns t with its tagged variables named by a Namer, or t itself
+    if it has none.
+    """
+    taken = set()
+    tagged = False
+    work = [t]
+    while work:
+        u = work.pop()
+        if type(u[1]) == tuple:
+            tagged = True
+        else:
+            if u[0] == 'AP':
+                work.append(u[1])
+            else:
+                taken.add(u[1])
+        if u[0] != 'VA':
+            work.append(u[2])
+    if not tagged:
+        return t
+
+    namer = Namer(taken)
+    out = []
+    # Entries are (term, state): state 0 to visit, 1 for an AP whose
+    # subterms are done, 2 for a lambda whose body is done.
+    work = [(t, 0)]
+    while work:
+        (t, state) = work.pop()
+        label = t[0]
+        if state == 1:
+            b = out.pop()
+            out.append(['AP', out.pop(), b])
+        elif state == 2:
+            out.append(['LM', namer.name(t[1]), out.pop()])
+            namer.unbind(t[1])
+        elif label == 'VA':
+            out.append(['VA', namer.name(t[1])])
+        elif label == 'AP':
+            work.append((t, 1))
+            work.append((t[2], 0))
+            work.append((t[1], 0))
+        else:
+            namer.bind(t[1])
+            work.append((t, 2))
+            work.append((t[2], 0))
+    return out[0]
+
+
+def pretty(t):
+    return _pretty(render(t))
+
+
+def _pretty(t):
+    label = t[0]
+    if label == 'LM':
+        return "fn " + t[1] + " => " + _pretty(t[2])
+    elif label == 'AP':
+        return _pretty(t[1]) + "(" + _pretty(t[2]) + ")"
+    else:
+        return t[1]
+
+
+# The recursion limit deep runs a call under, and a thread stack size
+# that holds that many nested calls with room to spare.
+DEPTH = 200000
+STACK = 512 * 1024 * 1024
+
+
+def deep(f, *args):
+    """
+    Calls f(*args) in a thread with a stack of STACK bytes and the
+    recursion limit raised to DEPTH, and returns what it returns or
+    raises what it raises. reduce, replace and pretty recurse once per
+    level of a term; run this way, a term too deep for them raises
+    RecursionError instead of overflowing the C stack.
+    """
+    outcome = []
+
+    def run():
+        try:
+            outcome.append((True, f(*args)))
+        except BaseException as e:
+            outcome.append((False, e))
+
+    limit = sys.getrecursionlimit()
+    size = threading.stack_size(STACK)
+    sys.setrecursionlimit(max(limit, DEPTH))
+    try:
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+    finally:
+        threading.stack_size(size)
+        sys.setrecursionlimit(limit)
+    (ok, value) = outcome[0]
+    if not ok:
+        raise value
+    return value
@@ -0,0 +1,341 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import multiprocessing
+
+import parser
+import reducer
+
+#
+# Reduction service.
+#
+# Listens on a Unix socket or a TCP port and speaks JSON lines. A
+# client sends requests, one JSON object per line:
+#
+#    {"id": 1, "op": "reduce", "source": "<.lc program>", "deadline": 5}
+#    {"id": 1, "op": "cancel"}
+#
+# The deadline, in seconds, is optional. The server answers with
+# events, one JSON object per line, each carrying the request's id:
+#
+#    {"id": 1, "event": "accepted"}
+#    {"id": 1, "event": "progress", "sweeps": 40, "steps": 212}
+#    {"id": 1, "event": "result", "value": "fn x => ...", "sweeps": .., "steps": ..}
+#    {"id": 1, "event": "error", "message": "..."}
+#    {"id": 1, "event": "cancelled"}
+#    {"id": 1, "event": "deadline"}
+#
+# Exactly one of the last four ends each request. Requests from one
+# connection run concurrently, on a pool of worker processes. A worker
+# reduces one sweep at a time (see reducer.norReduce) and checks for a
+# cancel and for the deadline between sweeps; a worker that does not
+# stop within GRACE seconds is killed and replaced.
+#
+#    python3 server.py [--socket PATH | --port N] [--workers N]
+#
+
+GRACE = 1.0
+PROGRESS = 0.25
+
+# The longest request line read, in bytes; a program is sent on one
+# line. A longer one is answered with an error and ends the connection.
+LIMIT = 64 * 1024 * 1024
+
+
+def evaluate(src):
+    """
+    Parses a program and builds its main term, the way interpret does
+    before generating SML.
+    """
+    functions = []
+    tks = parser.TokenStream(src)
+    parser.parseTerm(tks, functions)
+    tks.checkEOF()
+    if len(functions) == 0:
+        raise parser.ParseError("The program has no definitions.")
+    return reducer.buildTerm(parser.pruneFunctions(functions))
+
+
+def work(conn):
+    """
+    The loop of a worker process: receives ('job', id, source, deadline)
+    jobs on conn, and sends back the events of each. A ('cancel', id)
+    message stops the job of that id.
+    """
+    while True:
+        job = conn.recv()
+        if job is None:
+            return
+        if job[0] != 'job':
+            # A cancel meant for a job that finished before it arrived.
+            continue
+        (tag, rid, src, deadline) = job
+        try:
+            t = evaluate(src)
+            stats = {'sweeps': 0, 'steps': 0}
+            names = reducer.Names()
+            last = time.time()
+            outcome = None
+            while reducer.isR(t):
+                if conn.poll():
+                    msg = conn.recv()
+                    if msg == ('cancel', rid):
+                        outcome = {'event': 'cancelled'}
+                        break
+                now = time.time()
+                if deadline is not None and now > deadline:
+                    outcome = {'event': 'deadline'}
+                    break
+                if now - last >= PROGRESS:
+                    last = now
+                    conn.send({'event': 'progress', 'sweeps': stats['sweeps'], 'steps': stats['steps']})
+                stats['sweeps'] += 1
+                t = reducer.reduce(t, stats, None, names)
+            if outcome is None:
+                outcome = {'event': 'result', 'value': reducer.pretty(t)}
+                outcome.update(stats)
+        except (parser.SyntaxError, parser.ParseError, parser.LexError) as e:
+            outcome = {'event': 'error', 'message': e.args[0]}
+        except RecursionError:
+            outcome = {'event': 'error', 'message': "The term is too deep to reduce."}
+        except Exception as e:
+            # parseTerm gives up on some malformed input without raising
+            # one of its own exceptions; report it rather than dying.
+            outcome = {'event': 'error', 'message': "Malformed program (" + type(e).__name__ + ")."}
+        conn.send(outcome)
+
+
+class Worker:
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.start()
+
+    def start(self):
+        (self.conn, child) = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=work, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.events = asyncio.Queue()
+        self.loop.add_reader(self.conn.fileno(), self.ready)
+
+    def ready(self):
+        try:
+            while self.conn.poll():
+                self.events.put_nowait(self.conn.recv())
+        except (EOFError, OSError):
+            self.loop.remove_reader(self.conn.fileno())
+            self.events.put_nowait({'event': 'error', 'message': "The worker died."})
+
+    def restart(self):
+        self.loop.remove_reader(self.conn.fileno())
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self.start()
+
+    def stop(self):
+        self.loop.remove_reader(self.conn.fileno())
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(GRACE)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class Service:
+
+    def __init__(self, workers=None):
+        """
+        Builds a service with a pool of worker processes, by default
+        one per core. Call start() from within the event loop.
+        """
+        self.size = workers or os.cpu_count() or 1
+        self.pool = []
+        self.idle = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.idle = asyncio.Queue()
+        for i in range(self.size):
+            w = Worker(loop)
+            self.pool.append(w)
+            self.idle.put_nowait(w)
+
+    def stop(self):
+        for w in self.pool:
+            w.stop()
+
+    async def run(self, rid, src, deadline, send, cancel):
+        """
+        Runs one request. send is called with each event; cancel is an
+        asyncio.Event that the connection sets on a cancel request.
+        """
+        send({'event': 'accepted'})
+        waiter = asyncio.ensure_future(self.idle.get())
+        stop = asyncio.ensure_future(cancel.wait())
+        timeout = None if deadline is None else max(0.0, deadline - time.time())
+        (done, pending) = await asyncio.wait([waiter, stop], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if waiter not in done:
+            waiter.cancel()
+            stop.cancel()
+            if waiter.done() and not waiter.cancelled():
+                self.idle.put_nowait(waiter.result())
+            send({'event': 'cancelled' if cancel.is_set() else 'deadline'})
+            return
+        worker = waiter.result()
+        try:
+            worker.conn.send(('job', rid, src, deadline))
+            while True:
+                getter = asyncio.ensure_future(worker.events.get())
+                # The worker watches the deadline itself; this only
+                # catches one stuck in a single long sweep.
+                timeout = None if deadline is None else max(0.0, deadline + GRACE - time.time())
+                (done, pending) = await asyncio.wait([getter, stop], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    getter.cancel()
+                    worker.restart()
+                    send({'event': 'deadline'})
+                    return
+                if getter not in done:
+                    getter.cancel()
+                    # Ask the worker to stop; kill it if it does not.
+                    worker.conn.send(('cancel', rid))
+                    try:
+                        event = await asyncio.wait_for(worker.events.get(), GRACE)
+                        while event['event'] == 'progress':
+                            event = await asyncio.wait_for(worker.events.get(), GRACE)
+                    except asyncio.TimeoutError:
+                        worker.restart()
+                        event = {'event': 'cancelled'}
+                    send(event)
+                    return
+                event = getter.result()
+                send(event)
+                if event['event'] != 'progress':
+                    return
+        finally:
+            stop.cancel()
+            if not worker.process.is_alive():
+                worker.restart()
+            self.idle.put_nowait(worker)
+
+    async def serve(self, reader, writer):
+        """
+        Handles one client connection.
+        """
+        jobs = {}
+
+        def send(rid, event):
+            event = dict(event)
+            event['id'] = rid
+            writer.write((json.dumps(event) + '\n').encode('utf-8'))
+
+        async def job(rid, src, deadline, cancel):
+            try:
+                await self.run(rid, src, deadline, lambda e: send(rid, e), cancel)
+            finally:
+                del jobs[rid]
+
+        try:
+            await self.read(reader, writer, jobs, send, job)
+        except ConnectionError:
+            pass
+        finally:
+            # The client went away, or the connection failed: stop what
+            # it left running.
+            for (task, cancel) in list(jobs.values()):
+                cancel.set()
+            for (task, cancel) in list(jobs.values()):
+                await task
+            writer.close()
+
+    async def read(self, reader, writer, jobs, send, job):
+        """
+        Reads the requests of a connection until it ends, starting and
+        cancelling jobs (see serve).
+        """
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # Past LIMIT; the rest of the line cannot be told from
+                # the next request, so the connection ends here.
+                send(None, {'event': 'error', 'message': "Request line too long."})
+                await writer.drain()
+                return
+            if not line:
+                return
+            try:
+                req = json.loads(line)
+                rid = req['id']
+                op = req.get('op', 'reduce')
+                # An id must be usable as a key of jobs, and a deadline
+                # must be a number of seconds.
+                running = rid in jobs
+                deadline = req.get('deadline')
+                if deadline is not None:
+                    deadline = time.time() + float(deadline)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                send(None, {'event': 'error', 'message': "Bad request."})
+                await writer.drain()
+                continue
+            if op == 'cancel':
+                if running:
+                    jobs[rid][1].set()
+            elif op == 'reduce':
+                if running:
+                    send(rid, {'event': 'error', 'message': "Request id is in use."})
+                    continue
+                cancel = asyncio.Event()
+                jobs[rid] = (asyncio.ensure_future(job(rid, req.get('source', ''), deadline, cancel)), cancel)
+            else:
+                send(rid, {'event': 'error', 'message': "Unknown op '" + str(op) + "'."})
+            await writer.drain()
+
+
+async def listen(service, path=None, port=None, host='127.0.0.1'):
+    """
+    Starts the service and a server for it on a Unix socket (path) or
+    a TCP port. Returns the asyncio server.
+    """
+    await service.start()
+    if path is not None:
+        return await asyncio.start_unix_server(service.serve, path, limit=LIMIT)
+    return await asyncio.start_server(service.serve, host, port, limit=LIMIT)
+
+
+async def main(args):
+    path = None
+    port = None
+    workers = None
+    i = 0
+    while i < len(args):
+        if args[i] == '--socket':
+            path = args[i+1]
+        elif args[i] == '--port':
+            port = int(args[i+1])
+        elif args[i] == '--workers':
+            workers = int(args[i+1])
+        i += 2
+    if path is None and port is None:
+        path = 'reduction.sock'
+    service = Service(workers)
+    server = await listen(service, path, port)
+    print("[listening on " + (path if path is not None else "port " + str(port)) + "]")
+    try:
+        await server.serve_forever()
+    finally:
+        service.stop()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main(sys.argv[1:]))
+    except KeyboardInterrupt:
+        pass
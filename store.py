@@ -0,0 +1,482 @@
+import os
+import mmap
+import array
+import tempfile
+
+import reducer
+
+#
+# Array-backed term store.
+#
+# Nodes live in three parallel arrays, each in its own mmap'd file:
+#
+#    tag    one byte:  VA, LM or AP
+#    left   int32:     VA  the id of its name
+#                      LM  the id of its bound name
+#                      AP  the node of the function
+#    right  int32:     LM  the node of the body
+#                      AP  the node of the argument
+#
+# so a node costs 9 bytes instead of the 100 or so of a nested list.
+# Names are interned in a small table kept in Python.
+#
+# Nodes are never changed once written, so a subterm can be shared by
+# any number of parents; substitution puts the argument in place once
+# rather than copying it at every occurrence. The functions here
+# follow those of reducer.py, but walk the term with explicit stacks,
+# since normal forms are far deeper than Python's recursion allows.
+#
+# Reduction leaves the nodes of earlier terms behind. norReduce copies
+# the live term into fresh files whenever the store has grown to
+# several times its last live size (see compact).
+#
+
+VA = 0
+LM = 1
+AP = 2
+
+
+class TermStore:
+
+    def __init__(self, capacity=1024, path=None):
+        """
+        Builds an empty store with room for capacity nodes. If path is
+        given the arrays are kept in path.tag, path.left and
+        path.right; otherwise in anonymous temporary files.
+        """
+        self.path = path
+        self.names = []
+        self.ids = {}
+        self.supply = reducer.Names()
+        self.count = 0
+        self.capacity = 0
+        self.files = []
+        self.maps = []
+        self.open(max(capacity, 16))
+
+    #
+    # STORAGE helpers
+    #
+
+    def open(self, capacity):
+        self.files = []
+        for (suffix, width) in (('.tag', 1), ('.left', 4), ('.right', 4)):
+            if self.path is None:
+                f = tempfile.TemporaryFile()
+            else:
+                f = open(self.path + suffix, 'w+b')
+            f.truncate(capacity * width)
+            self.files.append(f)
+        self.capacity = capacity
+        self.map()
+
+    def map(self):
+        self.maps = [mmap.mmap(f.fileno(), 0) for f in self.files]
+        self.views = [memoryview(m) for m in self.maps]
+        self.tag = self.views[0].cast('B')
+        self.left = self.views[1].cast('i')
+        self.right = self.views[2].cast('i')
+
+    def unmap(self):
+        for v in [self.tag, self.left, self.right] + self.views:
+            v.release()
+        for m in self.maps:
+            m.close()
+
+    def grow(self):
+        self.unmap()
+        self.capacity *= 2
+        for (f, width) in zip(self.files, (1, 4, 4)):
+            f.truncate(self.capacity * width)
+        self.map()
+
+    def close(self):
+        """
+        Unmaps and closes the files behind the store.
+        """
+        self.unmap()
+        for f in self.files:
+            f.close()
+
+    def nbytes(self):
+        """
+        The number of bytes the node arrays take.
+        """
+        return 9 * self.capacity
+
+    #
+    # NODE constructors
+    #
+
+    def intern(self, x):
+        k = self.ids.get(x)
+        if k is None:
+            k = len(self.names)
+            self.ids[x] = k
+            self.names.append(x)
+        return k
+
+    def new(self, tag, left, right):
+        if self.count == self.capacity:
+            self.grow()
+        n = self.count
+        self.tag[n] = tag
+        self.left[n] = left
+        self.right[n] = right
+        self.count += 1
+        return n
+
+    def va(self, x):
+        return self.new(VA, self.intern(x), 0)
+
+    def lm(self, x, t):
+        return self.new(LM, self.intern(x), t)
+
+    def ap(self, t1, t2):
+        return self.new(AP, t1, t2)
+
+    def name(self, n):
+        return self.names[self.left[n]]
+
+    #
+    # TRANSLATION from and to the list form of reducer.py
+    #
+
+    def load(self, term):
+        """
+        Writes a term given in list form into the store and returns
+        its node.
+        """
+        out = []
+        work = [(term, False)]
+        while work:
+            (t, done) = work.pop()
+            while t[0] == 'VA' and type(t[1]) == type([]):
+                t = t[1]
+            if t[0] == 'VA':
+                out.append(self.va(t[1]))
+            elif done and t[0] == 'LM':
+                out.append(self.lm(t[1], out.pop()))
+            elif done:
+                t2 = out.pop()
+                out.append(self.ap(out.pop(), t2))
+            elif t[0] == 'LM':
+                work.append((t, True))
+                work.append((t[2], False))
+            else:
+                work.append((t, True))
+                work.append((t[2], False))
+                work.append((t[1], False))
+        return out[0]
+
+    def toTerm(self, n):
+        """
+        Reads the term at node n back into list form. Shared nodes
+        are read once and their list shared as well.
+        """
+        root = n
+        built = {}
+        work = [n]
+        while work:
+            n = work[-1]
+            if n in built:
+                work.pop()
+                continue
+            tag = self.tag[n]
+            if tag == VA:
+                built[n] = ['VA', self.name(n)]
+                work.pop()
+            elif tag == LM:
+                body = self.right[n]
+                if body in built:
+                    built[n] = ['LM', self.name(n), built[body]]
+                    work.pop()
+                else:
+                    work.append(body)
+            else:
+                t1 = self.left[n]
+                t2 = self.right[n]
+                if t1 in built and t2 in built:
+                    built[n] = ['AP', built[t1], built[t2]]
+                    work.pop()
+                else:
+                    work.append(t2)
+                    work.append(t1)
+        return built[root]
+
+    #
+    # REDUCTION, following reducer.py
+    #
+
+    def isR(self, n):
+        tag = self.tag
+        left = self.left
+        right = self.right
+        seen = bytearray(self.count)
+        work = [n]
+        while work:
+            n = work.pop()
+            if seen[n]:
+                continue
+            seen[n] = 1
+            if tag[n] == AP:
+                if tag[left[n]] == LM:
+                    return True
+                work.append(right[n])
+                work.append(left[n])
+            elif tag[n] == LM:
+                work.append(right[n])
+        return False
+
+    def subst(self, n, env):
+        """
+        Applies env, a dictionary from names to nodes, to the term at
+        n. Every binder crossed is renamed to a fresh variable from
+        the store's own supply; where env is empty the node is shared
+        as it is, and a node met twice under the same binders is
+        rewritten once.
+        """
+        # The arrays are looked up on self at each use: writing a node
+        # can grow the store, which maps them anew.
+        out = []
+        # (node, scope) -> its rewrite. A scope is a number given to
+        # each crossing of a binder, so the nodes under one crossing
+        # share their rewrites.
+        done = {}
+        # One dictionary serves every scope: a binder's entry is set on
+        # the way into its body and put back on the way out.
+        env = dict(env)
+        scopes = 0
+        # Entries are (node, scope, state): state 0 for a node still to
+        # visit, 1 for an AP whose subterms are done, or, for a lambda
+        # whose body is done, [fresh name, name, what the name meant
+        # outside, or None].
+        work = [(n, 0, 0)]
+        while work:
+            (n, scope, state) = work.pop()
+            if state == 1:
+                t2 = out.pop()
+                out.append(self.ap(out.pop(), t2))
+                done[(n, scope)] = out[-1]
+            elif state != 0:
+                (z, x, old) = state
+                out.append(self.lm(z, out.pop()))
+                done[(n, scope)] = out[-1]
+                if old is None:
+                    del env[x]
+                else:
+                    env[x] = old
+            elif not env:
+                out.append(n)
+            elif (n, scope) in done:
+                out.append(done[(n, scope)])
+            elif self.tag[n] == VA:
+                out.append(env.get(self.name(n), n))
+            elif self.tag[n] == LM:
+                x = self.name(n)
+                z = self.supply.fresh(x)
+                work.append((n, scope, [z, x, env.get(x)]))
+                env[x] = self.va(z)
+                scopes += 1
+                work.append((self.right[n], scopes, 0))
+            else:
+                work.append((n, scope, 1))
+                work.append((self.right[n], scope, 0))
+                work.append((self.left[n], scope, 0))
+        return out[0]
+
+    def reduce(self, n, stats=None):
+        """
+        Contracts the redexes of the term at n in one parallel sweep,
+        as reducer.reduce does. A shared subterm is reduced once, so
+        'steps' counts fewer contractions than reducer does when
+        sharing pays off. Subterms without a redex are kept as they
+        are, so the node returned is n itself exactly when there was
+        nothing to contract.
+        """
+        out = []
+        # The result for each node, or -1, kept in a typed array rather
+        # than a dictionary to keep the sweep's own memory small.
+        done = array.array('i', [-1]) * self.count
+        work = [(n, False)]
+        while work:
+            (n, after) = work.pop()
+            tag = self.tag[n]
+            if after:
+                if tag == LM:
+                    t = out.pop()
+                    if t == self.right[n]:
+                        t = n
+                    else:
+                        t = self.new(LM, self.left[n], t)
+                else:
+                    t2 = out.pop()
+                    t1 = out.pop()
+                    if t1 == self.left[n] and t2 == self.right[n]:
+                        t = n
+                    else:
+                        t = self.ap(t1, t2)
+                done[n] = t
+                out.append(t)
+            elif done[n] >= 0:
+                out.append(done[n])
+            elif tag == VA:
+                out.append(n)
+            elif tag == AP and self.tag[self.left[n]] == LM:
+                if stats is not None:
+                    stats['steps'] = stats.get('steps', 0) + 1
+                f = self.left[n]
+                done[n] = self.subst(self.right[f], {self.name(f): self.right[n]})
+                out.append(done[n])
+            elif tag == LM:
+                work.append((n, True))
+                work.append((self.right[n], False))
+            else:
+                work.append((n, True))
+                work.append((self.right[n], False))
+                work.append((self.left[n], False))
+        return out[0]
+
+    def norReduce(self, n, stats=None, slack=2):
+        """
+        Reduces the term at n to normal form and returns its node.
+        When the store holds more than slack times the nodes of the
+        last compaction, the live term is compacted. If stats is a
+        dictionary it receives 'steps' and 'sweeps' as for reducer,
+        and the number of 'compactions'.
+        """
+        live = self.count
+        while True:
+            m = self.reduce(n, stats)
+            if m == n:
+                return n
+            n = m
+            if stats is not None:
+                stats['sweeps'] = stats.get('sweeps', 0) + 1
+            if self.count > slack * max(live, 1024):
+                n = self.compact(n)
+                live = self.count
+                if stats is not None:
+                    stats['compactions'] = stats.get('compactions', 0) + 1
+
+    def compact(self, n):
+        """
+        Copies the term at n, keeping its sharing, into new files and
+        drops everything else. Returns the new node of the term.
+        """
+        tag = self.tag
+        left = self.left
+        right = self.right
+        if self.path is None:
+            new = TermStore(max(16, self.count // 2))
+        else:
+            new = TermStore(max(16, self.count // 2), self.path + '.compact')
+        new.names = self.names
+        new.ids = self.ids
+        moved = array.array('i', [-1]) * self.count
+        work = [n]
+        while work:
+            m = work[-1]
+            if moved[m] >= 0:
+                work.pop()
+                continue
+            t = tag[m]
+            if t == VA:
+                moved[m] = new.new(VA, left[m], 0)
+                work.pop()
+            elif t == LM:
+                if moved[right[m]] >= 0:
+                    moved[m] = new.new(LM, left[m], moved[right[m]])
+                    work.pop()
+                else:
+                    work.append(right[m])
+            elif moved[left[m]] >= 0 and moved[right[m]] >= 0:
+                moved[m] = new.new(AP, moved[left[m]], moved[right[m]])
+                work.pop()
+            else:
+                work.append(right[m])
+                work.append(left[m])
+        root = moved[n]
+        self.close()
+        if self.path is not None:
+            # The new files take the place of the old ones; the open
+            # maps are not affected by the rename.
+            for suffix in ('.tag', '.left', '.right'):
+                os.replace(self.path + '.compact' + suffix, self.path + suffix)
+        self.files = new.files
+        self.maps = new.maps
+        self.views = new.views
+        self.tag = new.tag
+        self.left = new.left
+        self.right = new.right
+        self.capacity = new.capacity
+        self.count = new.count
+        return root
+
+    def size(self, n):
+        """
+        The number of nodes of the term at n written out as a tree,
+        that is with every shared subterm counted at each use.
+        """
+        sizes = {}
+        work = [n]
+        while work:
+            m = work[-1]
+            if m in sizes:
+                work.pop()
+                continue
+            tag = self.tag[m]
+            if tag == VA:
+                sizes[m] = 1
+            elif tag == LM and self.right[m] in sizes:
+                sizes[m] = 1 + sizes[self.right[m]]
+            elif tag == AP and self.left[m] in sizes and self.right[m] in sizes:
+                sizes[m] = 1 + sizes[self.left[m]] + sizes[self.right[m]]
+            else:
+                work.append(self.right[m])
+                if tag == AP:
+                    work.append(self.left[m])
+                continue
+            work.pop()
+        return sizes[n]
+
+    #
+    # PRINTING
+    #
+
+    def pretty(self, n, out=None):
+        """
+        Renders the term at n the way reducer.pretty does. If out is
+        a file the text is written to it piece by piece and None is
+        returned; otherwise the text is returned.
+        """
+        tag = self.tag
+        left = self.left
+        right = self.right
+        namer = reducer.Namer(set(x for x in self.names if type(x) != tuple))
+        parts = []
+        work = [n]
+        while work:
+            n = work.pop()
+            if type(n) == type(''):
+                parts.append(n)
+            elif type(n) == type([]):
+                # The end of the body of the lambda binding n[0].
+                namer.unbind(n[0])
+            elif tag[n] == VA:
+                parts.append(namer.name(self.name(n)))
+            elif tag[n] == LM:
+                parts.append("fn " + namer.bind(self.name(n)) + " => ")
+                work.append([self.name(n)])
+                work.append(right[n])
+            else:
+                work.append(")")
+                work.append(right[n])
+                work.append("(")
+                work.append(left[n])
+            if out is not None and len(parts) >= 4096:
+                out.write(''.join(parts))
+                parts = []
+        if out is None:
+            return ''.join(parts)
+        out.write(''.join(parts))